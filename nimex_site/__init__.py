@@ -0,0 +1,3 @@
+"""Build and serving tooling for the Nimex Terminals landing page."""
+
+__version__ = "0.1.0"
@@ -0,0 +1,13 @@
+"""Static build pipeline for the landing page.
+
+``build(BuildConfig(...))`` parses ``index.html``, runs the enabled stages
+and writes a ``dist/`` tree whose assets are content-hashed so they can be
+served with year-long immutable caching.
+"""
+
+from .config import BuildConfig
+from .context import Asset, BuildContext
+from .errors import BuildError
+from .pipeline import STAGES, Stage, build
+
+__all__ = ["Asset", "BuildConfig", "BuildContext", "BuildError", "STAGES", "Stage", "build"]
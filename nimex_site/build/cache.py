@@ -0,0 +1,129 @@
+"""Content-addressed cache for expensive build outputs.
+
+Entries are keyed by a hash of the input bytes plus the transform
+parameters, so renaming a source image or moving it between directories
+still hits, while changing a single pixel or the encoder quality misses.
+Each entry is stored as ``<key>.bin`` next to a ``<key>.json`` sidecar
+recording how long it took to produce, which is what ``--stats`` reports
+as time saved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from .config import BuildConfig
+
+# Bump when an encoder change makes old entries wrong.
+CACHE_VERSION = 1
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(source_digest: str, params: dict[str, Any]) -> str:
+    payload = json.dumps({"v": CACHE_VERSION, "source": source_digest, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    seconds_saved: float = 0.0
+    evicted: int = 0
+    evicted_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class BuildCache:
+    def __init__(self, root: Path, *, max_bytes: int, max_age: float) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = CacheStats()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        directory = self.root / key[:2]
+        return directory / f"{key}.bin", directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[bytes]:
+        data_path, meta_path = self._paths(key)
+        try:
+            data = data_path.read_bytes()
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        try:
+            self.stats.seconds_saved += json.loads(meta_path.read_text())["seconds"]
+        except (OSError, ValueError, KeyError):
+            pass
+        # Refresh the timestamp so eviction is least-recently-used.
+        now = time.time()
+        os.utime(data_path, (now, now))
+        self.stats.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes, *, seconds: float) -> None:
+        data_path, meta_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(data_path, data)
+        _atomic_write(meta_path, json.dumps({"seconds": seconds, "size": len(data)}).encode())
+
+    def evict(self) -> None:
+        """Drop entries older than ``max_age``, then the oldest until under ``max_bytes``."""
+        if not self.root.is_dir():
+            return
+        entries = []
+        for data_path in self.root.glob("*/*.bin"):
+            try:
+                stat = data_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, data_path))
+        entries.sort()
+        cutoff = time.time() - self.max_age
+        total = sum(size for _mtime, size, _path in entries)
+        for mtime, size, data_path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            data_path.unlink(missing_ok=True)
+            data_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            self.stats.evicted += 1
+            self.stats.evicted_bytes += size
+
+
+def open_cache(config: BuildConfig) -> Optional[BuildCache]:
+    """The build's cache, or ``None`` when caching is disabled."""
+    if config.cache_dir is None:
+        return None
+    return BuildCache(config.cache_dir, max_bytes=config.cache_max_bytes, max_age=config.cache_max_age)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(handle, "wb") as out:
+            out.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,82 @@
+"""Approximate computed values for a single CSS property.
+
+Good enough to answer questions like "which font weights does the page
+render text in?": rules are ordered by importance, specificity and source
+order, inline ``style`` attributes win over the stylesheet, and inherited
+properties flow down the tree. Media queries are assumed to apply, and
+rules that only match in a runtime state (``:hover``) contribute extra
+possible values rather than overriding the static one.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from . import css, selectors
+from .html import Element
+
+
+def _candidates(element: Element, rules: list[tuple[int, css.StyleRule]], prop: str):
+    for order, rule in rules:
+        declaration = next((d for d in reversed(rule.declarations) if d.name == prop), None)
+        if declaration is None:
+            continue
+        for selector in rule.selectors:
+            if selectors.pseudo_element(selector) or not selectors.matches(element, selector):
+                continue
+            yield (declaration.important, selectors.specificity(selector), order), declaration.value, selectors.has_state(selector)
+
+
+def possible_values(
+    root: Element,
+    sheet: css.Stylesheet,
+    prop: str,
+    *,
+    inherited: bool = True,
+    initial: str = "",
+    defaults: Optional[dict[str, str]] = None,
+    states: bool = True,
+) -> dict[Element, set[str]]:
+    """Map every element below ``root`` to the values ``prop`` may compute to.
+
+    ``defaults`` are user-agent values keyed by tag name (``{"h1": "bold"}``).
+    With ``states=False`` only the static value is returned, so each set has
+    exactly one member.
+    """
+    defaults = defaults or {}
+    rules = [
+        (order, rule)
+        for order, (rule, parents) in enumerate(sheet.walk())
+        if isinstance(rule, css.StyleRule) and not any(p.name == "keyframes" for p in parents)
+    ]
+    result: dict[Element, set[str]] = {}
+
+    def visit(element: Element, parent_values: set[str]) -> None:
+        winner: Optional[tuple] = None
+        state_values: set[str] = set()
+        for key, value, state in _candidates(element, rules, prop):
+            if state:
+                if states:
+                    state_values.add(value)
+            elif winner is None or key > winner[0]:
+                winner = (key, value)
+        inline = [d for d in css.parse_declarations(element.get("style") or "") if d.name == prop]
+        if inline and (winner is None or not winner[0][0] or inline[-1].important):
+            values = {inline[-1].value}
+        elif winner is not None:
+            values = {winner[1]}
+        elif element.tag in defaults:
+            values = {defaults[element.tag]}
+        elif inherited:
+            values = set(parent_values)
+        else:
+            values = {initial}
+        values |= state_values
+        if "inherit" in values:
+            values = (values - {"inherit"}) | parent_values
+        result[element] = values
+        for child in element.element_children:
+            visit(child, values)
+
+    visit(root, {initial})
+    return result
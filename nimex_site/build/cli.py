@@ -0,0 +1,218 @@
+"""``nimex-build``: turn ``index.html`` into a deployable ``dist/`` tree."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .config import DEFAULT_CRITICAL_ROOTS, DEFAULT_DYNAMIC_CLASSES, DEFAULT_GOVERNOR_THRESHOLDS, BuildConfig
+from .errors import BuildError
+from .pipeline import build
+from .stages.background import ENGINES
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nimex-build", description=__doc__)
+    parser.add_argument("source", nargs="?", type=Path, default=Path("index.html"), help="page to build (default: index.html)")
+    parser.add_argument("-o", "--out-dir", type=Path, default=Path("dist"), help="output directory (default: dist)")
+    parser.add_argument("--no-minify", dest="minify", action="store_false", help="keep HTML/CSS/JS formatting")
+    parser.add_argument("--no-clean", dest="clean", action="store_false", help="do not empty the output directory first")
+    parser.add_argument("--no-prune", dest="prune_css", action="store_false", help="keep CSS rules that match nothing")
+    parser.add_argument(
+        "--keep-class",
+        dest="dynamic_classes",
+        action="append",
+        metavar="NAME",
+        help=f"class added at runtime that pruning must assume present (repeatable; default: {', '.join(DEFAULT_DYNAMIC_CLASSES)})",
+    )
+    parser.add_argument("--prune-history", type=Path, metavar="FILE", help="append a JSON line with pruning stats to FILE")
+    parser.add_argument("--no-extract-data-uris", dest="extract_data_uris", action="store_false", help="leave data: URIs inline in the stylesheet")
+    parser.add_argument("--no-cursor-png", dest="cursor_png", action="store_false", help="do not render PNG fallbacks for SVG cursors")
+    parser.add_argument("--vendor", action="store_true", help="mirror hot-linked remote assets and serve them from dist/")
+    parser.add_argument("--vendor-dir", type=Path, metavar="DIR", help="mirror directory (default: vendor/ next to the page)")
+    parser.add_argument("--vendor-refresh", action="store_true", help="refetch every remote asset even if it is mirrored")
+    parser.add_argument(
+        "--vendor-upstream",
+        metavar="URL",
+        help="fetch from this stand-in origin instead, as URL/<host><path> (offline builds and tests)",
+    )
+    parser.add_argument("--vendor-concurrency", type=int, default=8, metavar="N", help="pooled connections (default: 8)")
+    parser.add_argument("--no-gif-video", dest="gif_video", action="store_false", help="keep animated GIFs instead of transcoding them to video")
+    parser.add_argument("--ffmpeg", metavar="PATH", help="ffmpeg binary (default: ffmpeg on PATH, then imageio-ffmpeg's)")
+    parser.add_argument(
+        "--background-video",
+        default=BuildConfig.background_video,
+        metavar="SELECTOR",
+        help="video to encode adaptive renditions for (default: %(default)s)",
+    )
+    parser.add_argument("--no-background-video", dest="background_video", action="store_const", const=None, help="leave the background video alone")
+    parser.add_argument(
+        "--video-poster-below",
+        type=int,
+        default=BuildConfig.video_poster_below,
+        metavar="PX",
+        help="viewports narrower than this show only the poster (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fonts-dir",
+        type=Path,
+        metavar="DIR",
+        help="self-host and subset the web font from the files in DIR (default: fonts/ next to the page, if present)",
+    )
+    parser.add_argument("--no-fonts", dest="self_host_fonts", action="store_false", help="keep the Google Fonts stylesheet")
+    parser.add_argument(
+        "--images-dir",
+        type=Path,
+        metavar="DIR",
+        help="source images for responsive renditions (default: images/ next to the page, if present)",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=lambda text: tuple(sorted(int(w) for w in text.split(","))),
+        default=BuildConfig.image_widths,
+        metavar="W,W,...",
+        help="rendition widths in pixels",
+    )
+    parser.add_argument("--no-images", dest="responsive_images", action="store_false", help="leave <img> elements untouched")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N", help="encoder processes (default: one per available core)")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        metavar="DIR",
+        help="content-addressed cache for encoded outputs (default: .build-cache/ next to the page)",
+    )
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="re-encode everything and leave the cache alone")
+    parser.add_argument("--cache-max-size", type=int, default=1024, metavar="MB", help="evict least recently used entries beyond this (default: 1024)")
+    parser.add_argument("--cache-max-age", type=float, default=30, metavar="DAYS", help="evict entries unused for this long (default: 30)")
+    parser.add_argument("--no-critical", dest="critical_css", action="store_false", help="ship the whole stylesheet render-blocking")
+    parser.add_argument(
+        "--critical-root",
+        dest="critical_roots",
+        action="append",
+        metavar="SELECTOR",
+        help=f"above-the-fold root element (repeatable; default: {', '.join(DEFAULT_CRITICAL_ROOTS)})",
+    )
+    parser.add_argument("--critical-budget", type=int, default=10_000, metavar="BYTES", help="fail if inline critical CSS exceeds this (0 disables)")
+    parser.add_argument("--no-precompress", dest="precompress", action="store_false", help="do not write .br/.gz/.zst siblings")
+    parser.add_argument("--no-preload", dest="preload_hints", action="store_false", help="add no preload tags or Early Hints")
+    parser.add_argument(
+        "--lcp",
+        dest="lcp_selector",
+        default=BuildConfig.lcp_selector,
+        metavar="SELECTOR",
+        help=f"the LCP image, preloaded with fetchpriority=high (default: {BuildConfig.lcp_selector})",
+    )
+    parser.add_argument(
+        "--background-engine",
+        choices=ENGINES,
+        default=BuildConfig.background_engine,
+        help="how to animate the gradient backdrop: a translated layer, a small canvas, or as authored (default: transform)",
+    )
+    parser.add_argument(
+        "--eager-slides", dest="defer_slides", action="store_false", help="load every hero slide image with the page"
+    )
+    parser.add_argument(
+        "--no-service-worker", dest="service_worker", action="store_false", help="generate no sw.js and register none"
+    )
+    parser.add_argument(
+        "--no-governor", dest="quality_governor", action="store_false", help="never shed effects on slow devices"
+    )
+    parser.add_argument(
+        "--governor-threshold",
+        dest="governor_thresholds",
+        action="append",
+        type=_threshold,
+        metavar="NAME=VALUE",
+        help=f"override a quality governor threshold (repeatable; names: {', '.join(DEFAULT_GOVERNOR_THRESHOLDS)})",
+    )
+    parser.add_argument("--rum-endpoint", metavar="URL", help="report the quality governor's downgrades to URL")
+    parser.add_argument("--timings", action="store_true", help="print per-stage timings")
+    parser.add_argument("--stats", action="store_true", help="print encoder and cache statistics (hit rate, time saved)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def _threshold(text: str) -> tuple[str, float]:
+    name, _, value = text.partition("=")
+    if name not in DEFAULT_GOVERNOR_THRESHOLDS:
+        raise argparse.ArgumentTypeError(f"unknown threshold {name!r}")
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{name}: {value!r} is not a number") from None
+
+
+def _input_dir(explicit: Optional[Path], source: Path, default_name: str) -> Optional[Path]:
+    """An explicit directory, or ``<page dir>/<default_name>`` when it exists."""
+    if explicit is not None:
+        if not explicit.is_dir():
+            raise BuildError(f"{explicit} is not a directory")
+        return explicit.resolve()
+    candidate = source.parent / default_name
+    return candidate if candidate.is_dir() else None
+
+
+def config_from_args(args: argparse.Namespace) -> BuildConfig:
+    source = args.source.resolve()
+    fonts_dir = _input_dir(args.fonts_dir, source, "fonts") if args.self_host_fonts else None
+    images_dir = _input_dir(args.images_dir, source, "images") if args.responsive_images else None
+    vendor_dir = None
+    if args.vendor or args.vendor_dir is not None:
+        vendor_dir = args.vendor_dir.resolve() if args.vendor_dir is not None else source.parent / "vendor"
+    cache_dir = None
+    if args.use_cache:
+        cache_dir = args.cache_dir.resolve() if args.cache_dir is not None else source.parent / ".build-cache"
+    return BuildConfig(
+        source=source,
+        out_dir=args.out_dir.resolve(),
+        minify=args.minify,
+        clean=args.clean,
+        prune_css=args.prune_css,
+        dynamic_classes=DEFAULT_DYNAMIC_CLASSES + tuple(args.dynamic_classes or ()),
+        prune_history=args.prune_history,
+        extract_data_uris=args.extract_data_uris,
+        cursor_png=args.cursor_png,
+        vendor_dir=vendor_dir,
+        vendor_refresh=args.vendor_refresh,
+        vendor_upstream=args.vendor_upstream,
+        vendor_concurrency=args.vendor_concurrency,
+        gif_video=args.gif_video,
+        ffmpeg=args.ffmpeg,
+        background_video=args.background_video,
+        video_poster_below=args.video_poster_below,
+        fonts_dir=fonts_dir,
+        responsive_images=args.responsive_images,
+        images_dir=images_dir,
+        image_widths=args.image_widths,
+        jobs=args.jobs,
+        cache_dir=cache_dir,
+        cache_max_bytes=args.cache_max_size * 1024 * 1024,
+        cache_max_age=args.cache_max_age * 86400,
+        precompress=args.precompress,
+        preload_hints=args.preload_hints,
+        lcp_selector=args.lcp_selector,
+        background_engine=args.background_engine,
+        defer_slides=args.defer_slides,
+        service_worker=args.service_worker,
+        quality_governor=args.quality_governor,
+        governor_thresholds={**DEFAULT_GOVERNOR_THRESHOLDS, **dict(args.governor_thresholds or ())},
+        rum_endpoint=args.rum_endpoint,
+        critical_css=args.critical_css,
+        critical_roots=tuple(args.critical_roots or DEFAULT_CRITICAL_ROOTS),
+        critical_budget=args.critical_budget,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s: %(message)s")
+    try:
+        ctx = build(config_from_args(args))
+    except BuildError as exc:
+        print(f"nimex-build: error: {exc}", file=sys.stderr)
+        return 1
+    print(ctx.report.format(timings=args.timings, stats=args.stats))
+    return 0
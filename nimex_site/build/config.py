@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# Elements that make up the hero viewport on first paint. The background
+# video container is included because an unstyled <video> would push the
+# page content down until the deferred stylesheet arrives.
+DEFAULT_CRITICAL_ROOTS = ("header", ".hero", ".background-video")
+
+# The largest-contentful-paint candidate: the hero slide shown on load.
+DEFAULT_LCP_SELECTOR = ".slideshow .slide.is-active img"
+
+# Other above-the-fold images worth a (low priority) preload.
+DEFAULT_HINT_IMAGES = ("header img.brand-logo", ".background-video video")
+
+# The hero slides; all but the LCP image load only when the slideshow needs them.
+DEFAULT_SLIDE_IMAGES = ".slideshow .slide img"
+
+# Images the service worker precaches with the page shell.
+DEFAULT_SW_PRECACHE = ("header img.brand-logo",)
+
+# Images the service worker serves stale-while-revalidate.
+DEFAULT_SW_RUNTIME = (".gallery img", ".image-block img")
+
+# What the quality governor sheds after the header blur: the bubbles, then the video.
+DEFAULT_GOVERNOR_BUBBLES = ".bubble-layer"
+DEFAULT_GOVERNOR_VIDEO = ".background-video video"
+
+# When the quality governor steps down. Frames are judged in windows of
+# windowMs; a window is bad when more than slowRatio of its frames took
+# longer than slowFrameMs, or long animation frames blocked for more than
+# blockingMs. After `windows` bad windows in a row it sheds one effect, then
+# waits settleMs (also after load) before judging again.
+DEFAULT_GOVERNOR_THRESHOLDS = {
+    "slowFrameMs": 25,
+    "slowRatio": 0.25,
+    "blockingMs": 150,
+    "windowMs": 2000,
+    "windows": 2,
+    "settleMs": 3000,
+}
+
+# Classes the slideshow toggles at runtime; never pruned.
+DEFAULT_DYNAMIC_CLASSES = ("is-active", "active")
+
+
+@dataclass
+class BuildConfig:
+    """Inputs and switches for a single build.
+
+    Paths are resolved relative to the current working directory by the CLI;
+    library callers should pass absolute paths.
+    """
+
+    source: Path = Path("index.html")
+    out_dir: Path = Path("dist")
+    assets_dir: str = "assets"
+    minify: bool = True
+    clean: bool = True
+    prune_css: bool = True
+    dynamic_classes: tuple[str, ...] = DEFAULT_DYNAMIC_CLASSES
+    prune_history: Optional[Path] = None
+    extract_data_uris: bool = True
+    datauri_min_bytes: int = 256
+    cursor_png: bool = True
+    # Local mirror for hot-linked remote assets; None leaves them remote.
+    vendor_dir: Optional[Path] = None
+    vendor_refresh: bool = False
+    # Stand-in origin for offline builds: requests go to <upstream>/<host><path>.
+    vendor_upstream: Optional[str] = None
+    vendor_concurrency: int = 8
+    vendor_timeout: float = 30.0
+    gif_video: bool = True
+    video_crf: dict[str, int] = field(default_factory=lambda: {"webm": 38, "mp4": 26})
+    # ffmpeg binary; None looks on PATH, then for imageio-ffmpeg.
+    ffmpeg: Optional[str] = None
+    # Selector of the video to serve adaptively; None leaves it alone.
+    background_video: Optional[str] = ".background-video video"
+    # (width, kbps) per rendition; WebM and MP4 are encoded for each.
+    video_renditions: tuple[tuple[int, int], ...] = ((640, 600), (960, 1100), (1280, 1800), (1920, 3200))
+    video_poster_width: int = 1280
+    # Viewports narrower than this get the poster and never the video.
+    video_poster_below: int = 768
+    fonts_dir: Optional[Path] = None
+    font_family: str = "Outfit"
+    # Characters scripts may insert at runtime (the footer year).
+    font_extra_text: str = "0123456789"
+    # Re-encode every local <img> (copied, vendored or found in images_dir).
+    responsive_images: bool = True
+    images_dir: Optional[Path] = None
+    image_widths: tuple[int, ...] = (320, 480, 640, 960, 1280, 1920)
+    image_quality: dict[str, int] = field(default_factory=lambda: {"avif": 50, "webp": 75, "jpeg": 78})
+    # Worker processes for encoding; None uses every core available to us.
+    jobs: Optional[int] = None
+    # Content-addressed cache of encoded outputs; None disables it.
+    cache_dir: Optional[Path] = None
+    cache_max_bytes: int = 1 << 30
+    cache_max_age: float = 30 * 86400
+    precompress: bool = True
+    # Keep a precompressed sibling only at or below this fraction of the original.
+    precompress_max_ratio: float = 0.9
+    # Preload the critical resources and record them as Early Hints.
+    preload_hints: bool = True
+    lcp_selector: str = DEFAULT_LCP_SELECTOR
+    hint_images: tuple[str, ...] = DEFAULT_HINT_IMAGES
+    # How to animate gradient backdrops: "transform", "canvas" or "css" (as authored).
+    background_engine: str = "transform"
+    defer_slides: bool = True
+    slide_images: str = DEFAULT_SLIDE_IMAGES
+    # Generate /sw.js: a versioned precache of the shell plus cached images.
+    service_worker: bool = True
+    service_worker_precache: tuple[str, ...] = DEFAULT_SW_PRECACHE
+    service_worker_runtime: tuple[str, ...] = DEFAULT_SW_RUNTIME
+    # Shed the header blur, the bubbles, then the video when frames keep dropping.
+    quality_governor: bool = True
+    governor_bubbles: str = DEFAULT_GOVERNOR_BUBBLES
+    governor_video: str = DEFAULT_GOVERNOR_VIDEO
+    governor_thresholds: dict[str, float] = field(default_factory=lambda: dict(DEFAULT_GOVERNOR_THRESHOLDS))
+    # Where the governor reports its downgrades (sendBeacon); None reports nowhere.
+    rum_endpoint: Optional[str] = None
+    critical_css: bool = True
+    critical_roots: tuple[str, ...] = DEFAULT_CRITICAL_ROOTS
+    critical_budget: int = 10_000
+
+    @property
+    def source_dir(self) -> Path:
+        return self.source.parent
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+import mimetypes
+import posixpath
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from . import css, html, urls
+from .config import BuildConfig
+from .hashing import content_hash, hashed_name
+from .report import BuildReport
+
+log = logging.getLogger("nimex_site.build")
+
+
+@dataclass
+class Asset:
+    """A file that will be written below ``dist/``."""
+
+    path: str
+    data: bytes
+    content_type: str
+    hashed: bool = True
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def hash(self) -> str:
+        return content_hash(self.data)
+
+
+class BuildContext:
+    """Mutable state threaded through every stage of a build.
+
+    Stages read and rewrite :attr:`document` and :attr:`stylesheet` in place
+    and register output files through :meth:`emit`, which takes care of
+    content hashing, de-duplication and size accounting.
+    """
+
+    def __init__(self, config: BuildConfig) -> None:
+        self.config = config
+        self.source_text = ""
+        self.document: Optional[html.Document] = None
+        self.style_element: Optional[html.Element] = None
+        self.stylesheet: Optional[css.Stylesheet] = None
+        # Set by the critical stage: rules loaded after first paint.
+        self.deferred_stylesheet: Optional[css.Stylesheet] = None
+        self.assets: dict[str, Asset] = {}
+        # Source file behind each emitted URL, for stages that re-encode them.
+        self.sources: dict[str, Path] = {}
+        self.manifest: dict[str, Any] = {"assets": {}}
+        self.report = BuildReport()
+
+    def emit(
+        self,
+        name: str,
+        data: bytes,
+        *,
+        original_size: Optional[int] = None,
+        content_type: Optional[str] = None,
+        hashed: bool = True,
+        report: bool = True,
+        **meta: Any,
+    ) -> str:
+        """Register ``data`` as an output file and return its URL relative to ``dist/``.
+
+        ``name`` is the logical name (``site.css``); hashed assets land in the
+        configured assets directory as ``site.<hash>.css``. Emitting identical
+        bytes under the same logical name twice is a no-op. ``report=False``
+        keeps the file out of the per-asset size table, for stages that
+        summarise many generated files themselves.
+        """
+        if hashed:
+            path = posixpath.join(self.config.assets_dir, hashed_name(name, data))
+        else:
+            path = name
+        if content_type is None:
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        existing = self.assets.get(path)
+        if existing is None:
+            self.assets[path] = Asset(path, data, content_type, hashed, dict(meta))
+            if report:
+                self.report.record(path, len(data) if original_size is None else original_size, len(data))
+            self.manifest["assets"][name] = {
+                "path": path,
+                "size": len(data),
+                "hash": content_hash(data),
+                "content_type": content_type,
+                **meta,
+            }
+        return path
+
+    def discard(self, url: str) -> None:
+        """Drop an emitted file a later stage replaced, unless the page still references it."""
+        path = url.lstrip("/")
+        if path not in self.assets or self.document is None:
+            return
+        if any(element.get(attr) == url for element, attr in urls.url_attributes(self.document)):
+            return
+        del self.assets[path]
+        self.manifest["assets"] = {
+            name: entry for name, entry in self.manifest["assets"].items() if entry["path"] != path
+        }
+        self.report.assets = [stat for stat in self.report.assets if stat.name != path]
+        self.sources.pop(url, None)
+
+    def url(self, path: str) -> str:
+        """Absolute URL path for an emitted file, as referenced from HTML."""
+        return "/" + path.lstrip("/")
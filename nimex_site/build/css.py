@@ -0,0 +1,350 @@
+"""Small CSS parser and serializer.
+
+Only what the site's stylesheet actually uses is modelled: style rules,
+declarations, and at-rules that either wrap further rules (``@media``,
+``@supports``, ``@keyframes``) or carry declarations (``@font-face``).
+Values are kept as text; the minifier rewrites whitespace and a handful of
+safe numeric forms but never reorders anything.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Union
+
+# At-rules whose block holds declarations rather than nested rules.
+DECLARATION_AT_RULES = frozenset({"font-face", "page", "property", "counter-style", "viewport"})
+
+
+@dataclass
+class Declaration:
+    name: str
+    value: str
+    important: bool = False
+
+
+@dataclass
+class StyleRule:
+    selectors: list[str]
+    declarations: list[Declaration] = field(default_factory=list)
+
+
+@dataclass
+class AtRule:
+    name: str
+    prelude: str = ""
+    rules: Optional[list["Node"]] = None
+    declarations: Optional[list[Declaration]] = None
+
+
+Node = Union[StyleRule, AtRule]
+
+
+@dataclass
+class Stylesheet:
+    rules: list[Node] = field(default_factory=list)
+
+    def walk(self) -> Iterator[tuple[Node, list[AtRule]]]:
+        """Yield every rule with the chain of at-rules that encloses it."""
+        yield from _walk(self.rules, [])
+
+
+def _walk(rules: list[Node], parents: list[AtRule]) -> Iterator[tuple[Node, list[AtRule]]]:
+    for rule in rules:
+        yield rule, parents
+        if isinstance(rule, AtRule) and rule.rules is not None:
+            yield from _walk(rule.rules, parents + [rule])
+
+
+class CSSSyntaxError(ValueError):
+    pass
+
+
+_ANIMATION_NAME = re.compile(r"-?[_a-zA-Z][\w-]*")
+_ANIMATION_KEYWORDS = frozenset(
+    {
+        "none", "infinite", "linear", "ease", "ease-in", "ease-out", "ease-in-out",
+        "step-start", "step-end", "normal", "reverse", "alternate", "alternate-reverse",
+        "forwards", "backwards", "both", "running", "paused", "initial", "inherit", "unset",
+    }
+)
+_VAR_REFERENCE = re.compile(r"var\(\s*(--[\w-]+)")
+
+
+def animation_names(rules: list[Node]) -> set[str]:
+    """Keyframe names referenced by ``animation``/``animation-name`` declarations."""
+    names: set[str] = set()
+    for rule, _parents in _walk(rules, []):
+        if isinstance(rule, StyleRule):
+            for decl in rule.declarations:
+                if decl.name in ("animation", "animation-name"):
+                    names.update(n for n in _ANIMATION_NAME.findall(decl.value) if n not in _ANIMATION_KEYWORDS)
+    return names
+
+
+def var_references(text: str) -> set[str]:
+    """Custom property names used through ``var()`` in ``text``."""
+    return set(_VAR_REFERENCE.findall(text))
+
+
+# -- scanning ------------------------------------------------------------------
+
+
+def _skip_string(text: str, pos: int) -> int:
+    quote = text[pos]
+    pos += 1
+    while pos < len(text):
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == quote:
+            return pos + 1
+        pos += 1
+    raise CSSSyntaxError("unterminated string")
+
+
+def _skip_comment(text: str, pos: int) -> int:
+    end = text.find("*/", pos + 2)
+    if end == -1:
+        raise CSSSyntaxError("unterminated comment")
+    return end + 2
+
+
+def _scan_until(text: str, pos: int, stops: str) -> int:
+    """Return the index of the first top-level character in ``stops``."""
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in "\"'":
+            pos = _skip_string(text, pos)
+            continue
+        if text.startswith("/*", pos):
+            pos = _skip_comment(text, pos)
+            continue
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif depth == 0 and char in stops:
+            return pos
+        pos += 1
+    return pos
+
+
+def _matching_brace(text: str, pos: int) -> int:
+    """``pos`` points at ``{``; return the index of its closing ``}``."""
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in "\"'":
+            pos = _skip_string(text, pos)
+            continue
+        if text.startswith("/*", pos):
+            pos = _skip_comment(text, pos)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+        pos += 1
+    raise CSSSyntaxError("unbalanced braces")
+
+
+def strip_comments(text: str) -> str:
+    out = []
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in "\"'":
+            end = _skip_string(text, pos)
+            out.append(text[pos:end])
+            pos = end
+        elif text.startswith("/*", pos):
+            pos = _skip_comment(text, pos)
+            out.append(" ")
+        else:
+            out.append(char)
+            pos += 1
+    return "".join(out)
+
+
+def split_top_level(text: str, separator: str) -> list[str]:
+    parts = []
+    pos = 0
+    while pos <= len(text):
+        end = _scan_until(text, pos, separator)
+        parts.append(text[pos:end])
+        pos = end + 1
+    return parts
+
+
+# -- parsing -------------------------------------------------------------------
+
+
+def parse_declarations(text: str) -> list[Declaration]:
+    declarations = []
+    for chunk in split_top_level(strip_comments(text), ";"):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        name, sep, value = chunk.partition(":")
+        if not sep:
+            raise CSSSyntaxError(f"malformed declaration: {chunk!r}")
+        name = name.strip()
+        value = value.strip()
+        important = False
+        match = re.search(r"!\s*important\s*$", value, re.IGNORECASE)
+        if match:
+            important = True
+            value = value[: match.start()].rstrip()
+        if not name.startswith("--"):
+            name = name.lower()
+        declarations.append(Declaration(name, value, important))
+    return declarations
+
+
+def _parse_rules(text: str) -> list[Node]:
+    rules: list[Node] = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        while pos < length and (text[pos].isspace() or text.startswith("/*", pos)):
+            pos = _skip_comment(text, pos) if text[pos] == "/" else pos + 1
+        if pos >= length:
+            break
+        if text[pos] == "@":
+            match = re.compile(r"@([-\w]+)").match(text, pos)
+            if not match:
+                raise CSSSyntaxError(f"bad at-rule at offset {pos}")
+            name = match.group(1).lower()
+            stop = _scan_until(text, match.end(), "{;")
+            prelude = " ".join(strip_comments(text[match.end() : stop]).split())
+            if stop >= length or text[stop] == ";":
+                rules.append(AtRule(name, prelude))
+                pos = stop + 1
+                continue
+            close = _matching_brace(text, stop)
+            body = text[stop + 1 : close]
+            if name in DECLARATION_AT_RULES:
+                rules.append(AtRule(name, prelude, declarations=parse_declarations(body)))
+            else:
+                rules.append(AtRule(name, prelude, rules=_parse_rules(body)))
+            pos = close + 1
+            continue
+        stop = _scan_until(text, pos, "{")
+        if stop >= length:
+            raise CSSSyntaxError(f"rule without block at offset {pos}")
+        close = _matching_brace(text, stop)
+        prelude = strip_comments(text[pos:stop])
+        selectors = [" ".join(s.split()) for s in split_top_level(prelude, ",")]
+        rules.append(StyleRule([s for s in selectors if s], parse_declarations(text[stop + 1 : close])))
+        pos = close + 1
+    return rules
+
+
+def parse(text: str) -> Stylesheet:
+    return Stylesheet(_parse_rules(text))
+
+
+# -- serialization -------------------------------------------------------------
+
+_VALUE_TOKEN = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|url\([^)\"']*\)", re.IGNORECASE)
+_LEADING_ZERO = re.compile(r"(?<![\w.#-])0+\.(\d)")
+_AROUND_COMMA = re.compile(r"\s*,\s*")
+_INSIDE_PARENS = re.compile(r"\(\s+|\s+\)")
+_SELECTOR_COMBINATOR = re.compile(r"\s*([>+~])\s*")
+
+
+def minify_value(value: str) -> str:
+    """Collapse whitespace and shorten numbers outside strings and ``url()``."""
+    out = []
+    pos = 0
+    for match in _VALUE_TOKEN.finditer(value):
+        out.append(_minify_plain(value[pos : match.start()]))
+        out.append(match.group(0))
+        pos = match.end()
+    out.append(_minify_plain(value[pos:]))
+    return "".join(out).strip()
+
+
+def _minify_plain(text: str) -> str:
+    if not text:
+        return ""
+    core = " ".join(text.split())
+    if not core:
+        return " "
+    # Keep one space where the chunk touched a string or url() token.
+    text = (" " if text[0].isspace() else "") + core + (" " if text[-1].isspace() else "")
+    text = _AROUND_COMMA.sub(",", text)
+    text = _INSIDE_PARENS.sub(lambda m: m.group(0).strip(), text)
+    return _LEADING_ZERO.sub(r".\1", text)
+
+
+def minify_selector(selector: str) -> str:
+    selector = " ".join(selector.split())
+    # Keep ``+`` inside functional pseudo-classes such as ``:nth-child(2n + 1)`` intact.
+    parts = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(selector):
+        if char == "(":
+            if depth == 0:
+                parts.append(_SELECTOR_COMBINATOR.sub(r"\1", selector[start:index]))
+                start = index
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                parts.append(selector[start : index + 1])
+                start = index + 1
+    parts.append(_SELECTOR_COMBINATOR.sub(r"\1", selector[start:]))
+    return "".join(parts)
+
+
+def _declarations(declarations: list[Declaration], minify: bool, indent: str) -> str:
+    if minify:
+        return ";".join(
+            f"{d.name}:{minify_value(d.value)}{'!important' if d.important else ''}"
+            for d in declarations
+        )
+    return "".join(
+        f"{indent}  {d.name}: {d.value}{' !important' if d.important else ''};\n" for d in declarations
+    )
+
+
+def _serialize(rules: list[Node], minify: bool, indent: str) -> str:
+    out = []
+    for rule in rules:
+        if isinstance(rule, StyleRule):
+            if minify:
+                selectors = ",".join(minify_selector(s) for s in rule.selectors)
+                out.append(f"{selectors}{{{_declarations(rule.declarations, True, indent)}}}")
+            else:
+                selectors = ", ".join(rule.selectors)
+                out.append(f"{indent}{selectors} {{\n{_declarations(rule.declarations, False, indent)}{indent}}}\n")
+            continue
+        prelude = f" {rule.prelude}" if rule.prelude else ""
+        if minify:
+            prelude = _AROUND_COMMA.sub(",", prelude.replace(": ", ":"))
+        if rule.rules is None and rule.declarations is None:
+            out.append(f"@{rule.name}{prelude};" if minify else f"{indent}@{rule.name}{prelude};\n")
+        elif rule.declarations is not None:
+            body = _declarations(rule.declarations, minify, indent)
+            out.append(f"@{rule.name}{prelude}{{{body}}}" if minify else f"{indent}@{rule.name}{prelude} {{\n{body}{indent}}}\n")
+        else:
+            body = _serialize(rule.rules, minify, indent + "  ")
+            out.append(f"@{rule.name}{prelude}{{{body}}}" if minify else f"{indent}@{rule.name}{prelude} {{\n{body}{indent}}}\n")
+    return "".join(out)
+
+
+def serialize(sheet: Stylesheet | list[Node], *, minify: bool = False) -> str:
+    rules = sheet.rules if isinstance(sheet, Stylesheet) else sheet
+    return _serialize(rules, minify, "")
+
+
+def minify(text: str) -> str:
+    return serialize(parse(text), minify=True)
@@ -0,0 +1,2 @@
+class BuildError(Exception):
+    """Raised when a build stage cannot produce a correct ``dist/`` tree."""
@@ -0,0 +1,28 @@
+"""Content hashing and hashed file naming."""
+
+from __future__ import annotations
+
+import hashlib
+import posixpath
+import re
+
+HASH_LENGTH = 10
+
+_UNSAFE = re.compile(r"[^a-z0-9._-]+")
+
+
+def content_hash(data: bytes, length: int = HASH_LENGTH) -> str:
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def slugify(name: str) -> str:
+    """``"Nimex Terminals Logo.jpg"`` -> ``"nimex-terminals-logo.jpg"``."""
+    slug = _UNSAFE.sub("-", name.strip().lower()).strip("-.")
+    return slug or "asset"
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    """Insert the content hash before the extension: ``site.css`` -> ``site.3f2a9c01de.css``."""
+    directory, filename = posixpath.split(name)
+    stem, ext = posixpath.splitext(slugify(filename))
+    return posixpath.join(directory, f"{stem}.{content_hash(data)}{ext}")
@@ -0,0 +1,302 @@
+"""Minimal HTML document model used by the build stages.
+
+The standard library parser is tolerant enough for the hand-written
+``index.html``; we only need a mutable tree, a few traversal helpers and a
+serializer that can either round-trip the markup or minify it.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from html.parser import HTMLParser
+from typing import Callable, Iterator, Optional
+
+VOID_ELEMENTS = frozenset(
+    {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+        "meta", "param", "source", "track", "wbr",
+    }
+)
+
+RAW_TEXT_ELEMENTS = frozenset({"script", "style"})
+PRESERVE_WHITESPACE = frozenset({"pre", "textarea", "script", "style"})
+
+# Whitespace-only text between two of these is never rendered.
+BLOCK_ELEMENTS = frozenset(
+    {
+        "html", "head", "body", "header", "footer", "main", "nav", "section",
+        "article", "aside", "div", "ul", "ol", "li", "p", "h1", "h2", "h3",
+        "h4", "h5", "h6", "picture", "video", "audio", "source", "meta",
+        "link", "title", "script", "style", "noscript", "template", "figure",
+    }
+)
+
+_WS = re.compile(r"[ \t\n\r\f]+")
+_UNQUOTED_ATTR = re.compile(r"^[^\s\"'=<>`]+$")
+
+
+class Node:
+    parent: Optional["Element"] = None
+
+    def remove(self) -> None:
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            self.parent = None
+
+    def replace_with(self, *nodes: "Node") -> None:
+        parent = self.parent
+        if parent is None:
+            raise ValueError("cannot replace a detached node")
+        index = parent.children.index(self)
+        self.remove()
+        for offset, node in enumerate(nodes):
+            parent.insert(index + offset, node)
+
+
+class Text(Node):
+    def __init__(self, data: str) -> None:
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"Text({self.data[:20]!r})"
+
+
+class Comment(Node):
+    def __init__(self, data: str) -> None:
+        self.data = data
+
+
+class Declaration(Node):
+    """``<!DOCTYPE ...>`` and friends, kept verbatim."""
+
+    def __init__(self, data: str) -> None:
+        self.data = data
+
+
+class Element(Node):
+    def __init__(self, tag: str, attrs: Optional[dict[str, Optional[str]]] = None) -> None:
+        self.tag = tag
+        self.attrs: dict[str, Optional[str]] = dict(attrs or {})
+        self.children: list[Node] = []
+
+    def __repr__(self) -> str:
+        return f"<{self.tag} {self.attrs!r}>"
+
+    # -- attributes -------------------------------------------------------
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.attrs.get(name, default)
+
+    def set(self, name: str, value: Optional[str] = None) -> None:
+        self.attrs[name] = value
+
+    @property
+    def classes(self) -> list[str]:
+        return (self.attrs.get("class") or "").split()
+
+    def has_class(self, name: str) -> bool:
+        return name in self.classes
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.attrs.get("id")
+
+    # -- tree -------------------------------------------------------------
+
+    def append(self, node: Node) -> Node:
+        node.remove()
+        node.parent = self
+        self.children.append(node)
+        return node
+
+    def insert(self, index: int, node: Node) -> Node:
+        node.remove()
+        node.parent = self
+        self.children.insert(index, node)
+        return node
+
+    def insert_before(self, reference: Node, node: Node) -> Node:
+        return self.insert(self.children.index(reference), node)
+
+    def insert_after(self, reference: Node, node: Node) -> Node:
+        return self.insert(self.children.index(reference) + 1, node)
+
+    @property
+    def element_children(self) -> list["Element"]:
+        return [child for child in self.children if isinstance(child, Element)]
+
+    def iter(self) -> Iterator["Element"]:
+        """Yield this element and every descendant element in document order."""
+        yield self
+        for child in self.children:
+            if isinstance(child, Element):
+                yield from child.iter()
+
+    def find_all(self, predicate: Callable[["Element"], bool] | str) -> list["Element"]:
+        if isinstance(predicate, str):
+            tag = predicate
+            predicate = lambda el: el.tag == tag  # noqa: E731
+        return [el for el in self.iter() if predicate(el)]
+
+    def find(self, predicate: Callable[["Element"], bool] | str) -> Optional["Element"]:
+        found = self.find_all(predicate)
+        return found[0] if found else None
+
+    def ancestors(self) -> Iterator["Element"]:
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    @property
+    def text(self) -> str:
+        parts = []
+        for child in self.children:
+            if isinstance(child, Text):
+                parts.append(child.data)
+            elif isinstance(child, Element):
+                parts.append(child.text)
+        return "".join(parts)
+
+    @text.setter
+    def text(self, value: str) -> None:
+        for child in list(self.children):
+            child.remove()
+        self.append(Text(value))
+
+
+class Document(Element):
+    """Root container; its children are the doctype and ``<html>``."""
+
+    def __init__(self) -> None:
+        super().__init__("#document")
+
+    @property
+    def html(self) -> Element:
+        found = self.find("html")
+        if found is None:
+            raise ValueError("document has no <html> element")
+        return found
+
+    @property
+    def head(self) -> Element:
+        found = self.find("head")
+        if found is None:
+            raise ValueError("document has no <head> element")
+        return found
+
+    @property
+    def body(self) -> Element:
+        found = self.find("body")
+        if found is None:
+            raise ValueError("document has no <body> element")
+        return found
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.document = Document()
+        self._stack: list[Element] = [self.document]
+
+    @property
+    def _current(self) -> Element:
+        return self._stack[-1]
+
+    def handle_decl(self, decl: str) -> None:
+        self._current.append(Declaration(decl))
+
+    def handle_comment(self, data: str) -> None:
+        self._current.append(Comment(data))
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        element = Element(tag, dict(attrs))
+        self._current.append(element)
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._current.append(Element(tag, dict(attrs)))
+
+    def handle_endtag(self, tag: str) -> None:
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth].tag == tag:
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data: str) -> None:
+        children = self._current.children
+        if children and isinstance(children[-1], Text):
+            children[-1].data += data
+        else:
+            self._current.append(Text(data))
+
+
+def parse(markup: str) -> Document:
+    builder = _TreeBuilder()
+    builder.feed(markup)
+    builder.close()
+    return builder.document
+
+
+# -- serialization -----------------------------------------------------------
+
+
+def _format_attr(name: str, value: Optional[str], minify: bool) -> str:
+    if value is None:
+        return name
+    if minify and value and _UNQUOTED_ATTR.match(value) and not value.endswith("/"):
+        return f"{name}={html.escape(value, quote=False)}"
+    value = value.replace("&", "&amp;")
+    if '"' in value and "'" not in value:
+        return f"{name}='{value}'"  # JSON in data attributes
+    return f'{name}="{value.replace(chr(34), "&quot;")}"'
+
+
+def _is_block(node: Optional[Node]) -> bool:
+    if node is None or isinstance(node, (Document, Declaration, Comment)):
+        return True
+    return isinstance(node, Element) and node.tag in BLOCK_ELEMENTS
+
+
+def _serialize(node: Node, out: list[str], minify: bool, preserve: bool) -> None:
+    if isinstance(node, Text):
+        parent = node.parent
+        if parent is not None and parent.tag in RAW_TEXT_ELEMENTS:
+            out.append(node.data)
+            return
+        data = html.escape(node.data, quote=False)
+        if minify and not preserve:
+            data = _WS.sub(" ", data)
+            if data == " " and parent is not None:
+                index = parent.children.index(node)
+                before = parent.children[index - 1] if index else None
+                after = parent.children[index + 1] if index + 1 < len(parent.children) else None
+                if _is_block(parent) and _is_block(before) and _is_block(after):
+                    return
+        out.append(data)
+    elif isinstance(node, Comment):
+        if not minify:
+            out.append(f"<!--{node.data}-->")
+    elif isinstance(node, Declaration):
+        out.append(f"<!{node.data}>")
+    elif isinstance(node, Document):
+        for child in node.children:
+            _serialize(child, out, minify, preserve)
+    elif isinstance(node, Element):
+        attrs = "".join(" " + _format_attr(k, v, minify) for k, v in node.attrs.items())
+        out.append(f"<{node.tag}{attrs}>")
+        if node.tag in VOID_ELEMENTS:
+            return
+        child_preserve = preserve or node.tag in PRESERVE_WHITESPACE
+        for child in node.children:
+            _serialize(child, out, minify, child_preserve)
+        out.append(f"</{node.tag}>")
+
+
+def serialize(node: Node, *, minify: bool = False) -> str:
+    out: list[str] = []
+    _serialize(node, out, minify, preserve=False)
+    text = "".join(out)
+    return text.strip() + "\n" if minify else text
@@ -0,0 +1,165 @@
+"""Static width model for deriving ``<img sizes>`` from the stylesheet.
+
+Widths are border-box pixels (the page sets ``box-sizing: border-box`` on
+everything). The model understands what the landing page uses for its
+image containers: block flow, ``max-width``, horizontal padding,
+``position: absolute/fixed`` with ``inset: 0``, and
+``grid-template-columns: repeat(auto-fit|auto-fill, minmax(<px>, 1fr))``
+grids with a column gap. Anything else is treated as full-width block
+flow, which errs towards larger images rather than blurry ones.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from . import cascade, css
+from .html import Element
+
+ROOT_FONT_SIZE = 16.0
+
+_LENGTH = re.compile(r"^(-?[\d.]+)(px|rem|em)?$")
+_AUTO_GRID = re.compile(r"repeat\(\s*auto-(fit|fill)\s*,\s*minmax\(\s*([^,]+?)\s*,\s*1fr\s*\)\s*\)")
+
+_PROPERTIES = (
+    "display", "position", "inset", "left", "right", "width", "max-width",
+    "padding", "padding-left", "padding-right", "grid-template-columns", "gap", "column-gap",
+)
+
+
+def length(value: Optional[str]) -> Optional[float]:
+    """Pixels for ``px``/``rem``/``em``/unitless zero; ``None`` for anything else."""
+    if not value:
+        return None
+    match = _LENGTH.match(value.strip())
+    if not match:
+        return None
+    number = float(match.group(1))
+    return number if match.group(2) in (None, "px") else number * ROOT_FONT_SIZE
+
+
+def _horizontal_padding(shorthand: str, left: str, right: str) -> float:
+    parts = shorthand.split() if shorthand else []
+    side_right = side_left = 0.0
+    if parts:
+        right_part = parts[1] if len(parts) > 1 else parts[0]
+        left_part = parts[3] if len(parts) > 3 else right_part
+        side_right = length(right_part) or 0.0
+        side_left = length(left_part) or 0.0
+    if left:
+        side_left = length(left) or 0.0
+    if right:
+        side_right = length(right) or 0.0
+    return side_left + side_right
+
+
+class Layout:
+    """Computed layout-relevant properties for every element of a page."""
+
+    def __init__(self, root: Element, sheet: css.Stylesheet) -> None:
+        self._values = {
+            prop: cascade.possible_values(root, sheet, prop, inherited=False, states=False)
+            for prop in _PROPERTIES
+        }
+
+    def value(self, element: Element, prop: str) -> str:
+        values = self._values[prop].get(element) or {""}
+        return next(iter(values))
+
+    def padding(self, element: Element) -> float:
+        return _horizontal_padding(
+            self.value(element, "padding"), self.value(element, "padding-left"), self.value(element, "padding-right")
+        )
+
+    def _grid(self, element: Element) -> Optional[tuple[float, float]]:
+        """``(min track width, column gap)`` for auto-fit/auto-fill grids."""
+        if self.value(element, "display") != "grid":
+            return None
+        match = _AUTO_GRID.search(self.value(element, "grid-template-columns"))
+        if not match:
+            return None
+        minimum = length(match.group(2))
+        gap_values = self.value(element, "gap").split()
+        gap = self.value(element, "column-gap") or (gap_values[-1] if gap_values else "0")
+        if minimum is None:
+            return None
+        return minimum, length(gap) or 0.0
+
+    def box_width(self, element: Element, viewport: float) -> float:
+        parent = element.parent
+        if element.tag in ("html", "#document") or parent is None or parent.tag == "#document":
+            return viewport
+        position = self.value(element, "position")
+        if position == "fixed":
+            width = viewport
+        elif position == "absolute" and self.value(element, "inset") in ("0", "0px"):
+            width = self.box_width(parent, viewport)
+        else:
+            available = self.box_width(parent, viewport) - self.padding(parent)
+            grid = self._grid(parent)
+            if grid is not None:
+                minimum, gap = grid
+                columns = max(1, int((available + gap) // (minimum + gap)))
+                columns = min(columns, len(parent.element_children))
+                width = (available - (columns - 1) * gap) / columns
+            else:
+                width = available
+        explicit = length(self.value(element, "width"))
+        if explicit is not None:
+            width = explicit
+        maximum = length(self.value(element, "max-width"))
+        if maximum is not None:
+            width = min(width, maximum)
+        return max(width, 0.0)
+
+
+def sizes_attribute(layout: Layout, element: Element, *, low: int = 320, high: int = 2560) -> str:
+    """Build a ``sizes`` value from the element's width at every viewport width.
+
+    Sampling finds the ranges where the width is linear in the viewport
+    (``a * 100vw + b``); each range becomes one ``(max-width: ...)`` entry.
+    """
+    samples = [(vw, layout.box_width(element, vw)) for vw in range(low, high + 1)]
+    segments: list[tuple[int, float, float]] = []  # (last viewport, slope, intercept)
+    start = 0
+    while start < len(samples):
+        vw, width = samples[start]
+        if start + 1 == len(samples):
+            segments.append((vw, 0.0, width))
+            break
+        slope = samples[start + 1][1] - width
+        intercept = width - slope * vw
+        end = start + 1
+        while end + 1 < len(samples) and abs(slope * samples[end + 1][0] + intercept - samples[end + 1][1]) < 0.5:
+            end += 1
+        segments.append((samples[end][0], slope, intercept))
+        start = end + 1
+    entries = []
+    for index, (last, slope, intercept) in enumerate(segments):
+        expression = _expression(slope, intercept)
+        if index == len(segments) - 1:
+            entries.append(expression)
+        else:
+            entries.append(f"(max-width: {last}px) {expression}")
+    # Collapse neighbouring ranges that render the same expression.
+    collapsed: list[str] = []
+    for entry in entries:
+        expression = entry.split(") ", 1)[-1] if entry.startswith("(") else entry
+        if collapsed:
+            previous = collapsed[-1].split(") ", 1)[-1] if collapsed[-1].startswith("(") else collapsed[-1]
+            if previous == expression:
+                collapsed[-1] = entry
+                continue
+        collapsed.append(entry)
+    return ", ".join(collapsed)
+
+
+def _expression(slope: float, intercept: float) -> str:
+    if abs(slope) < 1e-6:
+        return f"{round(intercept)}px"
+    vw = f"{round(slope * 100, 2):g}vw"
+    if abs(intercept) < 0.5:
+        return vw
+    sign = "-" if intercept < 0 else "+"
+    return f"calc({vw} {sign} {round(abs(intercept))}px)"
@@ -0,0 +1,57 @@
+"""Stage ordering and the top-level :func:`build` entry point."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from .config import BuildConfig
+from .context import BuildContext, log
+from .stages import background, bundle, compress, critical, datauri, fonts, governor, hints, images, localize, media, parse, prune, serialize, serviceworker, slides, vendor, video, write
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[[BuildContext], None]
+    enabled: Callable[[BuildConfig], bool] = lambda config: True
+
+
+STAGES: tuple[Stage, ...] = (
+    Stage("parse", parse.run),
+    Stage("vendor", vendor.run, lambda config: config.vendor_dir is not None),
+    Stage("localize", localize.run),
+    Stage("media", media.run, lambda config: config.gif_video),
+    Stage("video", video.run, lambda config: config.background_video is not None),
+    Stage("background", background.run, lambda config: config.background_engine != "css"),
+    Stage("prune", prune.run, lambda config: config.prune_css),
+    Stage("datauri", datauri.run, lambda config: config.extract_data_uris),
+    Stage("fonts", fonts.run, lambda config: config.fonts_dir is not None),
+    Stage("images", images.run, lambda config: config.responsive_images),
+    Stage("slides", slides.run, lambda config: config.defer_slides),
+    Stage("governor", governor.run, lambda config: config.quality_governor),
+    Stage("critical", critical.run, lambda config: config.critical_css),
+    Stage("bundle", bundle.run),
+    Stage("hints", hints.run, lambda config: config.preload_hints),
+    Stage("sw-register", serviceworker.register, lambda config: config.service_worker),
+    Stage("serialize", serialize.run),
+    Stage("serviceworker", serviceworker.run, lambda config: config.service_worker),
+    Stage("compress", compress.run, lambda config: config.precompress),
+    Stage("write", write.run),
+)
+
+
+def build(config: BuildConfig) -> BuildContext:
+    """Run every enabled stage and return the finished context."""
+    ctx = BuildContext(config)
+    started = time.perf_counter()
+    for stage in STAGES:
+        if not stage.enabled(config):
+            continue
+        log.debug("stage %s", stage.name)
+        stage_started = time.perf_counter()
+        stage.run(ctx)
+        ctx.report.timings.append((stage.name, time.perf_counter() - stage_started))
+    ctx.report.elapsed = time.perf_counter() - started
+    return ctx
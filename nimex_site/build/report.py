@@ -0,0 +1,71 @@
+"""Per-asset size accounting printed at the end of a build."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AssetStat:
+    name: str
+    original: int
+    output: int
+
+    @property
+    def saved(self) -> int:
+        return self.original - self.output
+
+    @property
+    def ratio(self) -> float:
+        return self.saved / self.original if self.original else 0.0
+
+
+@dataclass
+class BuildReport:
+    assets: list[AssetStat] = field(default_factory=list)
+    timings: list[tuple[str, float]] = field(default_factory=list)
+    notes: list[str] = field(default_factory=list)
+    stats: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def record(self, name: str, original: int, output: int) -> None:
+        self.assets.append(AssetStat(name, original, output))
+
+    def note(self, message: str) -> None:
+        self.notes.append(message)
+
+    def stat(self, message: str) -> None:
+        self.stats.append(message)
+
+    @property
+    def total_original(self) -> int:
+        return sum(stat.original for stat in self.assets)
+
+    @property
+    def total_output(self) -> int:
+        return sum(stat.output for stat in self.assets)
+
+    def format(self, *, timings: bool = False, stats: bool = False) -> str:
+        width = max([len(stat.name) for stat in self.assets] + [5])
+        lines = [f"{'asset':<{width}}  {'original':>10}  {'output':>10}  {'saved':>10}  {'':>6}"]
+        for stat in self.assets:
+            lines.append(
+                f"{stat.name:<{width}}  {stat.original:>10,}  {stat.output:>10,}  "
+                f"{stat.saved:>10,}  {stat.ratio:>6.1%}"
+            )
+        total = AssetStat("total", self.total_original, self.total_output)
+        lines.append(
+            f"{total.name:<{width}}  {total.original:>10,}  {total.output:>10,}  "
+            f"{total.saved:>10,}  {total.ratio:>6.1%}"
+        )
+        if timings:
+            lines.append("")
+            for name, seconds in self.timings:
+                lines.append(f"  {name:<{width}}  {seconds * 1000:>8.1f} ms")
+        for message in self.notes:
+            lines.append(f"note: {message}")
+        if stats:
+            for message in self.stats:
+                lines.append(f"stats: {message}")
+        lines.append(f"built in {self.elapsed * 1000:.1f} ms")
+        return "\n".join(lines)
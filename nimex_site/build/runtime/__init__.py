@@ -0,0 +1,10 @@
+"""Browser scripts the build stages inject into the page."""
+
+from __future__ import annotations
+
+from importlib import resources
+
+
+def script(name: str) -> str:
+    """Source of ``runtime/<name>``."""
+    return resources.files(__name__).joinpath(name).read_text(encoding="utf-8")
@@ -0,0 +1,106 @@
+// Play the page's animated gradient backdrop in a tiny canvas scaled to the
+// viewport. The build passes the gradient and its keyframes in
+// data-background: {angle, stops, size, frames, duration, timing, zIndex}.
+// The gradient is rendered once at a few dozen pixels tall; each frame only
+// copies the visible window of it. The CSS rule it replaces keeps the first
+// frame as a static background, which is all reduced-motion users get.
+(() => {
+  const config = JSON.parse(document.currentScript.dataset.background);
+  if (matchMedia('(prefers-reduced-motion: reduce)').matches) {
+    return;
+  }
+  // A smooth gradient loses nothing when scaled up this far.
+  const HEIGHT = 48;
+
+  // CSS cubic-bezier() timing: solve x(s) = t, return y(s).
+  const [x1, y1, x2, y2] = config.timing;
+  const curve = (a, b, s) => 3 * a * s * (1 - s) ** 2 + 3 * b * s * s * (1 - s) + s ** 3;
+  const ease = (t) => {
+    let low = 0;
+    let high = 1;
+    for (let i = 0; i < 24; i++) {
+      const mid = (low + high) / 2;
+      if (curve(x1, x2, mid) < t) {
+        low = mid;
+      } else {
+        high = mid;
+      }
+    }
+    return curve(y1, y2, (low + high) / 2);
+  };
+
+  const canvas = document.createElement('canvas');
+  canvas.setAttribute('aria-hidden', 'true');
+  Object.assign(canvas.style, {
+    position: 'fixed',
+    inset: '0',
+    width: '100%',
+    height: '100%',
+    zIndex: config.zIndex,
+    pointerEvents: 'none',
+  });
+  const context = canvas.getContext('2d');
+  let gradient = null;
+  let width = 0;
+
+  // Render the whole stretched gradient once, as the CSS would lay it out.
+  const prepare = () => {
+    width = Math.max(1, Math.round((HEIGHT * innerWidth) / Math.max(1, innerHeight)));
+    canvas.width = width;
+    canvas.height = HEIGHT;
+    const [sizeX, sizeY] = config.size;
+    gradient = document.createElement('canvas');
+    gradient.width = Math.ceil(width * sizeX);
+    gradient.height = Math.ceil(HEIGHT * sizeY);
+    const angle = (config.angle * Math.PI) / 180;
+    const dx = Math.sin(angle);
+    const dy = -Math.cos(angle);
+    const half = (gradient.width * Math.abs(dx) + gradient.height * Math.abs(dy)) / 2;
+    const cx = gradient.width / 2;
+    const cy = gradient.height / 2;
+    const paint = gradient.getContext('2d');
+    const fill = paint.createLinearGradient(cx - dx * half, cy - dy * half, cx + dx * half, cy + dy * half);
+    config.stops.forEach(([color, at]) => fill.addColorStop(Math.min(1, Math.max(0, at)), color));
+    paint.fillStyle = fill;
+    paint.fillRect(0, 0, gradient.width, gradient.height);
+  };
+
+  const position = (time) => {
+    const t = ((time / 1000) % config.duration) / config.duration;
+    const { frames } = config;
+    let index = 0;
+    while (index < frames.length - 2 && t > frames[index + 1][0]) {
+      index++;
+    }
+    const [start, fromX, fromY] = frames[index];
+    const [end, toX, toY] = frames[index + 1];
+    const progress = ease(end > start ? (t - start) / (end - start) : 1);
+    return [fromX + (toX - fromX) * progress, fromY + (toY - fromY) * progress];
+  };
+
+  let resized = true;
+  let last = '';
+  const draw = (time) => {
+    if (resized) {
+      prepare();
+      resized = false;
+      last = '';
+    }
+    const [x, y] = position(time);
+    const sourceX = (gradient.width - width) * x;
+    const sourceY = (gradient.height - HEIGHT) * y;
+    // Skip frames that would not move the picture by a visible amount.
+    const key = `${sourceX.toFixed(1)},${sourceY.toFixed(1)}`;
+    if (key !== last) {
+      last = key;
+      context.drawImage(gradient, sourceX, sourceY, width, HEIGHT, 0, 0, width, HEIGHT);
+    }
+    requestAnimationFrame(draw);
+  };
+
+  addEventListener('resize', () => {
+    resized = true;
+  });
+  document.body.prepend(canvas);
+  requestAnimationFrame(draw);
+})();
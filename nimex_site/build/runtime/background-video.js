@@ -0,0 +1,46 @@
+// Pick a rendition for the fixed background video once the page is up.
+// Small screens, data saver, slow connections and reduced motion keep the
+// poster; everyone else gets the smallest rendition that covers the
+// viewport, WebM where it plays and MP4 otherwise.
+(() => {
+  const videos = document.querySelectorAll('video[data-renditions]');
+  if (!videos.length) {
+    return;
+  }
+
+  const connection = navigator.connection || {};
+  const reducedMotion = matchMedia('(prefers-reduced-motion: reduce)');
+  const slow = /(^|-)2g$/.test(connection.effectiveType || '');
+
+  videos.forEach((video) => {
+    const posterBelow = Number(video.dataset.posterBelow || 0);
+    if (reducedMotion.matches || connection.saveData || slow || innerWidth < posterBelow) {
+      return;
+    }
+
+    const renditions = JSON.parse(video.dataset.renditions);
+    // object-fit: cover fills the viewport in both directions.
+    const aspect = Number(video.getAttribute('width')) / Number(video.getAttribute('height')) || 16 / 9;
+    const needed = Math.max(innerWidth, innerHeight * aspect) * Math.min(devicePixelRatio || 1, 1.5);
+    const choice = renditions.find((rendition) => rendition.w >= needed) || renditions[renditions.length - 1];
+
+    const types = video.canPlayType('video/webm; codecs="vp9"') ? ['webm', 'mp4'] : ['mp4'];
+    types.forEach((type) => {
+      const source = document.createElement('source');
+      source.src = choice[type];
+      source.type = `video/${type}`;
+      video.append(source);
+    });
+    video.load();
+
+    // The quality governor may have frozen it on its poster for good.
+    const play = () => {
+      if (!document.hidden && !reducedMotion.matches && !document.documentElement.classList.contains('quality-poster')) {
+        video.play().catch(() => {});
+      }
+    };
+    document.addEventListener('visibilitychange', () => (document.hidden ? video.pause() : play()));
+    reducedMotion.addEventListener('change', () => (reducedMotion.matches ? video.pause() : play()));
+    play();
+  });
+})();
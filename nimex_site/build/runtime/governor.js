@@ -0,0 +1,127 @@
+// Watch frame times and, when frames keep being dropped, turn the page's
+// most expensive effects off one step at a time by adding a root class per
+// step: quality-no-blur (the header's backdrop blur), quality-no-bubbles,
+// quality-poster (the background video frozen on its poster). The build
+// passes {steps, video, thresholds, endpoint} in data-governor; each
+// downgrade is reported to the endpoint, if there is one.
+(() => {
+  const config = JSON.parse(document.currentScript.dataset.governor);
+  const { steps, thresholds: limits } = config;
+  const root = document.documentElement;
+  let level = 0;
+  let deltas = [];
+  let blocking = 0;
+  let last = null;
+  let windowStart = null;
+  let badWindows = 0;
+  let settleUntil = 0;
+  let observer = null;
+
+  const report = (detail) => {
+    if (!config.endpoint) {
+      return;
+    }
+    const body = JSON.stringify({
+      type: 'quality-downgrade',
+      page: location.pathname,
+      cores: navigator.hardwareConcurrency || null,
+      memory: navigator.deviceMemory || null,
+      ...detail,
+    });
+    if (!(navigator.sendBeacon && navigator.sendBeacon(config.endpoint, body))) {
+      fetch(config.endpoint, { method: 'POST', body, keepalive: true }).catch(() => {});
+    }
+  };
+
+  // Dropping the sources puts a video back on its poster.
+  const freezeVideos = () => {
+    document.querySelectorAll(config.video).forEach((video) => {
+      video.pause();
+      video.querySelectorAll('source').forEach((source) => source.remove());
+      video.removeAttribute('src');
+      video.load();
+    });
+  };
+
+  const downgrade = (stats) => {
+    const step = steps[level];
+    level++;
+    root.classList.add(`quality-${step}`);
+    if (step === 'poster') {
+      freezeVideos();
+    }
+    report({ step, level, at: Math.round(performance.now()), ...stats });
+  };
+
+  const evaluate = (now) => {
+    if (now < settleUntil || deltas.length < 10) {
+      badWindows = 0;
+      return;
+    }
+    const sorted = [...deltas].sort((a, b) => a - b);
+    const stats = {
+      frames: deltas.length,
+      slowRatio: Number((deltas.filter((delta) => delta > limits.slowFrameMs).length / deltas.length).toFixed(3)),
+      p95Ms: Math.round(sorted[Math.floor(sorted.length * 0.95)]),
+      blockingMs: Math.round(blocking),
+    };
+    const bad = stats.slowRatio > limits.slowRatio || blocking > limits.blockingMs;
+    badWindows = bad ? badWindows + 1 : 0;
+    if (badWindows >= limits.windows) {
+      badWindows = 0;
+      // Give the browser time to drop the effect's layers before judging again.
+      settleUntil = now + limits.settleMs;
+      downgrade(stats);
+    }
+  };
+
+  const sample = (now) => {
+    if (last !== null && now - last < 1000) {
+      deltas.push(now - last);
+    }
+    last = now;
+    windowStart ??= now;
+    if (now - windowStart >= limits.windowMs) {
+      evaluate(now);
+      deltas = [];
+      blocking = 0;
+      windowStart = now;
+    }
+    if (level < steps.length) {
+      requestAnimationFrame(sample);
+    } else {
+      observer?.disconnect();
+    }
+  };
+
+  // Frames stop in background tabs; start a fresh window on return.
+  document.addEventListener('visibilitychange', () => {
+    last = null;
+    windowStart = null;
+    deltas = [];
+    blocking = 0;
+  });
+
+  const start = () => {
+    if (window.PerformanceObserver?.supportedEntryTypes?.includes('long-animation-frame')) {
+      observer = new PerformanceObserver((list) => {
+        list.getEntries().forEach((entry) => {
+          blocking += entry.blockingDuration;
+        });
+      });
+      observer.observe({ type: 'long-animation-frame' });
+    }
+    // Loading is janky everywhere; judge the page once it has settled.
+    settleUntil = performance.now() + limits.settleMs;
+    requestAnimationFrame(sample);
+  };
+
+  if (!steps.length) {
+    return;
+  }
+  if (document.readyState === 'complete') {
+    start();
+  } else {
+    addEventListener('load', start, { once: true });
+  }
+})();
@@ -0,0 +1,29 @@
+// Play the muted looping videos that replace animated GIFs only while they
+// are on screen. With reduced motion requested they stay on their poster.
+(() => {
+  const videos = document.querySelectorAll('video[data-inview]');
+  if (!videos.length || matchMedia('(prefers-reduced-motion: reduce)').matches) {
+    return;
+  }
+
+  const play = (video) => {
+    video.play().catch(() => {});
+  };
+
+  if (!('IntersectionObserver' in window)) {
+    videos.forEach(play);
+    return;
+  }
+
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (entry.isIntersecting) {
+        play(entry.target);
+      } else {
+        entry.target.pause();
+      }
+    });
+  }, { threshold: 0.25 });
+
+  videos.forEach((video) => observer.observe(video));
+})();
@@ -0,0 +1,103 @@
+// The build prepends `const BUILD = {version, precache, runtime}`:
+//   precache: [url, hashed] pairs for the page, stylesheets, scripts, fonts
+//             and logo, installed as one versioned cache;
+//   runtime:  gallery and image-block image URLs, served stale-while-revalidate.
+// Video is never touched: range requests and media elements go to the network.
+const PRECACHE = `nimex-precache-${BUILD.version}`;
+const RUNTIME = 'nimex-runtime';
+const PREFIX = 'nimex-precache-';
+
+const absolute = (url) => new URL(url, self.location).href;
+const precached = new Set(BUILD.precache.map(([url]) => absolute(url)));
+const runtime = new Set(BUILD.runtime.map(absolute));
+
+const fetchOk = async (url) => {
+  const response = await fetch(url, { cache: 'no-cache' });
+  if (!response.ok) {
+    throw new Error(`precaching ${url} failed with ${response.status}`);
+  }
+  return response;
+};
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    await Promise.all(BUILD.precache.map(async ([url, hashed]) => {
+      // A hashed URL's content never changes: reuse the copy an earlier
+      // version cached instead of downloading it again.
+      const reused = hashed ? await caches.match(url) : undefined;
+      await cache.put(url, reused || await fetchOk(url));
+    }));
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    if (self.registration.navigationPreload) {
+      await self.registration.navigationPreload.enable();
+    }
+    const names = await caches.keys();
+    await Promise.all(names
+      .filter((name) => name.startsWith(PREFIX) && name !== PRECACHE)
+      .map((name) => caches.delete(name)));
+    // Forget images this build no longer uses.
+    const images = await caches.open(RUNTIME);
+    const requests = await images.keys();
+    await Promise.all(requests
+      .filter((request) => !runtime.has(request.url))
+      .map((request) => images.delete(request)));
+    await self.clients.claim();
+  })());
+});
+
+// Pages: the network first, so a deploy is seen at once; the cached shell offline.
+const page = async (event) => {
+  try {
+    const preloaded = await event.preloadResponse;
+    return preloaded || await fetch(event.request);
+  } catch (error) {
+    const cache = await caches.open(PRECACHE);
+    const shell = await cache.match('/');
+    if (shell) {
+      return shell;
+    }
+    throw error;
+  }
+};
+
+const cacheFirst = async (request) => {
+  const cache = await caches.open(PRECACHE);
+  return (await cache.match(request)) || fetch(request);
+};
+
+const staleWhileRevalidate = async (event) => {
+  const cache = await caches.open(RUNTIME);
+  const cached = await cache.match(event.request);
+  const network = fetch(event.request).then((response) => {
+    // Opaque cross-origin responses are not kept: each one is charged
+    // megabytes of storage quota.
+    if (response.ok) {
+      cache.put(event.request, response.clone());
+    }
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => {}));
+    return cached;
+  }
+  return network;
+};
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  if (request.method !== 'GET' || request.headers.has('range') || request.destination === 'video') {
+    return;
+  }
+  if (request.mode === 'navigate') {
+    event.respondWith(page(event));
+  } else if (precached.has(request.url)) {
+    event.respondWith(cacheFirst(request));
+  } else if (runtime.has(request.url)) {
+    event.respondWith(staleWhileRevalidate(event));
+  }
+});
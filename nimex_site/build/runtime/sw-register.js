@@ -0,0 +1,11 @@
+// Register the generated service worker once the page has finished loading,
+// so its precaching never competes with the first paint.
+(() => {
+  if (!('serviceWorker' in navigator)) {
+    return;
+  }
+  const url = document.currentScript.dataset.sw;
+  addEventListener('load', () => {
+    navigator.serviceWorker.register(url).catch(() => {});
+  });
+})();
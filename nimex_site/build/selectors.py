@@ -0,0 +1,291 @@
+"""Static CSS selector matching against :mod:`nimex_site.build.html` trees.
+
+The build never has a live browser, so matching answers "could this
+selector ever apply to this element?". User-action and form-state
+pseudo-classes (``:hover``, ``:focus`` ...) are assumed satisfiable and
+pseudo-elements are matched against their originating element. Classes
+added at runtime can be declared through ``assume_classes``.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from . import css
+from .html import Element, Text
+
+# Pseudo-classes whose truth depends on runtime state the build cannot see.
+STATE_PSEUDO_CLASSES = frozenset(
+    {
+        "hover", "focus", "focus-visible", "focus-within", "active", "visited",
+        "link", "any-link", "target", "checked", "disabled", "enabled",
+        "invalid", "valid", "required", "optional", "placeholder-shown",
+        "indeterminate", "default", "read-only", "read-write", "fullscreen",
+        "popover-open", "playing", "paused", "autofill", "defined",
+    }
+)
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comb>[>+~])
+  | (?P<universal>\*)
+  | (?P<type>[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[(?P<attr>[^\]]+)\]
+  | ::(?P<element>[\w-]+)(?:\([^)]*\))?
+  | :(?P<pseudo>[\w-]+)
+    """,
+    re.VERBOSE,
+)
+_ATTR = re.compile(r"""^\s*([\w:-]+)\s*(?:([~|^$*]?=)\s*(?:"([^"]*)"|'([^']*)'|([^\s\]]*))\s*([iIsS])?)?\s*$""")
+_NTH = re.compile(r"^([+-]?\d*)n\s*(?:([+-])\s*(\d+))?$")
+
+
+class SelectorError(ValueError):
+    pass
+
+
+@dataclass
+class Compound:
+    tag: Optional[str] = None
+    ids: list[str] = field(default_factory=list)
+    classes: list[str] = field(default_factory=list)
+    attrs: list[tuple[str, Optional[str], Optional[str], bool]] = field(default_factory=list)
+    pseudos: list[tuple[str, Optional[str]]] = field(default_factory=list)
+    pseudo_element: Optional[str] = None
+
+
+@dataclass
+class Selector:
+    """Compounds from left to right; ``combinators[i]`` joins compounds ``i`` and ``i + 1``."""
+
+    compounds: list[Compound]
+    combinators: list[str]
+
+
+def _functional_argument(text: str, pos: int) -> tuple[str, int]:
+    depth = 0
+    for index in range(pos, len(text)):
+        if text[index] == "(":
+            depth += 1
+        elif text[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return text[pos + 1 : index], index + 1
+    raise SelectorError(f"unbalanced parenthesis in {text!r}")
+
+
+@lru_cache(maxsize=4096)
+def parse(text: str) -> Selector:
+    compounds = [Compound()]
+    combinators: list[str] = []
+    pending: Optional[str] = None
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise SelectorError(f"unsupported selector syntax in {text!r} at {pos}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        pos = match.end()
+        if kind in ("ws", "comb"):
+            combinator = value.strip() or " "
+            if pending is None or pending == " ":
+                pending = combinator
+            continue
+        if pending is not None:
+            combinators.append(pending)
+            compounds.append(Compound())
+            pending = None
+        current = compounds[-1]
+        if kind == "type":
+            current.tag = value.lower()
+        elif kind == "id":
+            current.ids.append(value)
+        elif kind == "cls":
+            current.classes.append(value)
+        elif kind == "attr":
+            attr = _ATTR.match(value)
+            if not attr:
+                raise SelectorError(f"bad attribute selector [{value}]")
+            name, op, dq, sq, bare, flag = attr.groups()
+            expected = next((v for v in (dq, sq, bare) if v is not None), None)
+            current.attrs.append((name.lower(), op, expected, (flag or "").lower() == "i"))
+        elif kind == "pseudo":
+            argument = None
+            if pos < len(text) and text[pos] == "(":
+                argument, pos = _functional_argument(text, pos)
+            current.pseudos.append((value.lower(), argument))
+        elif kind == "element":
+            current.pseudo_element = value.lower()
+        # Universal selectors and pseudo-elements do not constrain matching.
+    return Selector(compounds, combinators)
+
+
+def specificity(selector: str) -> tuple[int, int, int]:
+    """``(ids, classes/attributes/pseudo-classes, types)`` for one complex selector."""
+    ids = classes = types = 0
+    for compound in parse(selector).compounds:
+        ids += len(compound.ids)
+        classes += len(compound.classes) + len(compound.attrs)
+        for name, argument in compound.pseudos:
+            if name in ("not", "is", "matches", "has") and argument:
+                inner = max(specificity(part) for part in css.split_top_level(argument, ","))
+                ids, classes, types = ids + inner[0], classes + inner[1], types + inner[2]
+            elif name != "where":
+                classes += 1
+        types += (1 if compound.tag else 0) + (1 if compound.pseudo_element else 0)
+    return ids, classes, types
+
+
+def pseudo_element(selector: str) -> Optional[str]:
+    """``"after"`` for ``.card::after``; ``None`` when the selector targets elements."""
+    return parse(selector).compounds[-1].pseudo_element
+
+
+def has_state(selector: str) -> bool:
+    """True if the selector only applies in a runtime state such as ``:hover``."""
+    return any(
+        name in STATE_PSEUDO_CLASSES for compound in parse(selector).compounds for name, _ in compound.pseudos
+    )
+
+
+def _nth(argument: str, position: int) -> bool:
+    argument = argument.strip().lower()
+    if " of " in argument:
+        argument = argument.split(" of ", 1)[0]
+    if argument == "odd":
+        return position % 2 == 1
+    if argument == "even":
+        return position % 2 == 0
+    if argument.lstrip("+-").isdigit():
+        return position == int(argument)
+    match = _NTH.match(argument.replace(" ", ""))
+    if not match:
+        return True
+    coefficient, sign, offset = match.groups()
+    a = -1 if coefficient == "-" else 1 if coefficient in ("", "+") else int(coefficient)
+    b = int(offset or 0) * (-1 if sign == "-" else 1)
+    if a == 0:
+        return position == b
+    return (position - b) % a == 0 and (position - b) // a >= 0
+
+
+def _siblings(element: Element) -> list[Element]:
+    return element.parent.element_children if element.parent is not None else [element]
+
+
+def _match_compound(element: Element, compound: Compound, assume: frozenset[str]) -> bool:
+    if compound.tag and element.tag != compound.tag:
+        return False
+    if any(element.id != ident for ident in compound.ids):
+        return False
+    classes = element.classes
+    if any(cls not in classes and cls not in assume for cls in compound.classes):
+        return False
+    for name, op, expected, insensitive in compound.attrs:
+        actual = element.get(name)
+        if name not in element.attrs:
+            return False
+        if op is None:
+            continue
+        actual = actual or ""
+        if insensitive:
+            actual, expected = actual.lower(), (expected or "").lower()
+        expected = expected or ""
+        if op == "=" and actual != expected:
+            return False
+        if op == "~=" and expected not in actual.split():
+            return False
+        if op == "|=" and not (actual == expected or actual.startswith(expected + "-")):
+            return False
+        if op == "^=" and not actual.startswith(expected):
+            return False
+        if op == "$=" and not actual.endswith(expected):
+            return False
+        if op == "*=" and expected not in actual:
+            return False
+    for name, argument in compound.pseudos:
+        if name in STATE_PSEUDO_CLASSES:
+            continue
+        if name == "root":
+            if element.tag != "html":
+                return False
+        elif name in ("first-child", "last-child", "only-child", "nth-child", "nth-last-child"):
+            siblings = _siblings(element)
+            index = siblings.index(element)
+            if name == "first-child" and index != 0:
+                return False
+            if name == "last-child" and index != len(siblings) - 1:
+                return False
+            if name == "only-child" and len(siblings) != 1:
+                return False
+            if name == "nth-child" and not _nth(argument or "", index + 1):
+                return False
+            if name == "nth-last-child" and not _nth(argument or "", len(siblings) - index):
+                return False
+        elif name in ("first-of-type", "last-of-type", "nth-of-type"):
+            of_type = [el for el in _siblings(element) if el.tag == element.tag]
+            index = of_type.index(element)
+            if name == "first-of-type" and index != 0:
+                return False
+            if name == "last-of-type" and index != len(of_type) - 1:
+                return False
+            if name == "nth-of-type" and not _nth(argument or "", index + 1):
+                return False
+        elif name == "not":
+            if any(matches(element, part, assume) for part in css.split_top_level(argument or "", ",")):
+                return False
+        elif name in ("is", "where", "matches"):
+            if not any(matches(element, part, assume) for part in css.split_top_level(argument or "", ",")):
+                return False
+        elif name == "has":
+            # Relative selectors are rare here; treat them as satisfiable.
+            continue
+        elif name == "empty":
+            if any(isinstance(c, Element) or (isinstance(c, Text) and c.data) for c in element.children):
+                return False
+        # Anything else (:lang, :dir, vendor prefixes ...) is assumed to match.
+    return True
+
+
+def _match_from(element: Element, selector: Selector, index: int, assume: frozenset[str]) -> bool:
+    if not _match_compound(element, selector.compounds[index], assume):
+        return False
+    if index == 0:
+        return True
+    combinator = selector.combinators[index - 1]
+    if combinator == ">":
+        parent = element.parent
+        return isinstance(parent, Element) and parent.tag != "#document" and _match_from(parent, selector, index - 1, assume)
+    if combinator == " ":
+        return any(
+            ancestor.tag != "#document" and _match_from(ancestor, selector, index - 1, assume)
+            for ancestor in element.ancestors()
+        )
+    siblings = _siblings(element)
+    position = siblings.index(element)
+    if combinator == "+":
+        return position > 0 and _match_from(siblings[position - 1], selector, index - 1, assume)
+    return any(_match_from(sibling, selector, index - 1, assume) for sibling in siblings[:position])
+
+
+def matches(element: Element, selector: str, assume_classes: Iterable[str] = ()) -> bool:
+    parsed = parse(selector)
+    assume = assume_classes if isinstance(assume_classes, frozenset) else frozenset(assume_classes)
+    return _match_from(element, parsed, len(parsed.compounds) - 1, assume)
+
+
+def select(root: Element, selector: str, assume_classes: Iterable[str] = ()) -> list[Element]:
+    assume = frozenset(assume_classes)
+    return [
+        el
+        for el in root.iter()
+        if el.tag != "#document" and any(matches(el, part, assume) for part in css.split_top_level(selector, ","))
+    ]
@@ -0,0 +1,5 @@
+"""Build stages.
+
+Each module exposes ``run(ctx)``; :mod:`nimex_site.build.pipeline` decides
+the order and which stages are enabled for a given config.
+"""
@@ -0,0 +1,278 @@
+"""Animate the page's gradient backdrop without repainting it every frame.
+
+``body::before`` stretches a ``linear-gradient`` to ``300% 300%`` of the
+viewport and animates its ``background-position``. A background position
+is a paint property: the browser repaints the whole fixed layer on every
+frame of the 18 s loop. This stage finds every rule animated that way (a
+single ``linear-gradient`` with an angle, ``background-size`` in
+percentages, keyframes that set nothing but ``background-position``) and,
+by ``background_engine``, rewrites it:
+
+* ``transform`` (default): the element becomes as wide as the stretched
+  gradient and as tall as it was, and the keyframes slide it with
+  ``translate3d``. The gradient is painted once into a compositor layer.
+  The vertical position must be the same in every keyframe; the rows the
+  viewport never shows are cut off by moving the colour stops outwards by
+  the matching distance (in ``vh``), so every visible pixel keeps its
+  colour;
+* ``canvas``: the animation is dropped (the element keeps its first
+  frame as a static fallback) and ``runtime/background-canvas.js`` plays
+  it in a canvas a few dozen pixels tall, scaled to the viewport, drawing
+  each frame from a gradient it renders once;
+* ``css``: left as authored.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from .. import css, html, js, runtime
+from ..context import BuildContext, log
+
+ENGINES = ("transform", "canvas", "css")
+
+# CSS timing keywords as cubic-bezier control points.
+TIMING_FUNCTIONS = {
+    "ease": (0.25, 0.1, 0.25, 1.0),
+    "linear": (0.0, 0.0, 1.0, 1.0),
+    "ease-in": (0.42, 0.0, 1.0, 1.0),
+    "ease-out": (0.0, 0.0, 0.58, 1.0),
+    "ease-in-out": (0.42, 0.0, 0.58, 1.0),
+}
+
+_GRADIENT = re.compile(r"^linear-gradient\((.*)\)$", re.S)
+_ANGLE = re.compile(r"^(-?[\d.]+)deg$")
+_PERCENT = re.compile(r"^(-?[\d.]+)%$")
+_TIME = re.compile(r"^([\d.]+)(m?s)$")
+_BEZIER = re.compile(r"cubic-bezier\(([^)]*)\)")
+
+
+@dataclass
+class Shift:
+    """A rule whose gradient background is animated by ``background-position``."""
+
+    rule: css.StyleRule
+    keyframes: css.AtRule
+    angle: float  # degrees, CSS convention: 0 points up, 90 right
+    stops: list[tuple[str, float]]  # colour, position along the gradient line (0..1)
+    size: tuple[float, float]  # background-size as multiples of the box
+    frames: list[tuple[float, float, float]]  # keyframe offset, x, y (0..1)
+    duration: float  # seconds
+    timing: tuple[float, float, float, float]
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None or ctx.stylesheet is None:
+        return
+    engine = ctx.config.background_engine
+    if engine == "css":
+        return
+    shifts = find_shifts(ctx.stylesheet)
+    for shift in shifts:
+        if engine == "transform":
+            if not _to_transform(ctx.stylesheet, shift):
+                continue
+        else:
+            _to_canvas(ctx, shift)
+        ctx.report.note(f"{', '.join(shift.rule.selectors)}: background-position animation -> {engine}")
+
+
+def find_shifts(sheet: css.Stylesheet) -> list[Shift]:
+    keyframes = {
+        rule.prelude.strip(): rule
+        for rule in sheet.rules
+        if isinstance(rule, css.AtRule) and rule.name == "keyframes" and rule.rules is not None
+    }
+    shifts = []
+    for rule in sheet.rules:
+        if not isinstance(rule, css.StyleRule):
+            continue
+        values = {decl.name: decl.value for decl in rule.declarations}
+        if "animation" not in values or not ({"background", "background-image"} & values.keys()):
+            continue
+        shift = _shift(rule, values, keyframes)
+        if shift is not None:
+            shifts.append(shift)
+    return shifts
+
+
+def _shift(rule: css.StyleRule, values: dict[str, str], keyframes: dict[str, css.AtRule]) -> Optional[Shift]:
+    parts = values["animation"].split()
+    name = next((part for part in parts if part in keyframes), None)
+    if name is None or "infinite" not in parts:
+        return None
+    frames = []
+    for frame in keyframes[name].rules:
+        if not isinstance(frame, css.StyleRule) or {decl.name for decl in frame.declarations} != {"background-position"}:
+            return None
+        position = _percentages(frame.declarations[0].value)
+        if position is None:
+            return None
+        for selector in frame.selectors:
+            offset = {"from": "0%", "to": "100%"}.get(selector.strip(), selector.strip())
+            match = _PERCENT.match(offset)
+            if match is None:
+                return None
+            frames.append((float(match.group(1)) / 100, *position))
+    frames.sort()
+    if not frames or frames[0][0] != 0.0 or frames[-1][0] != 1.0:
+        return None
+    gradient = _gradient(values.get("background-image", values.get("background", "")))
+    size = _percentages(values.get("background-size", "100%"))
+    duration = next((_seconds(part) for part in parts if _TIME.match(part)), None)
+    timing = _timing(values["animation"])
+    if gradient is None or size is None or not duration or timing is None:
+        log.info("%s: animated background not understood; left as is", ", ".join(rule.selectors))
+        return None
+    return Shift(rule, keyframes[name], *gradient, size, frames, duration, timing)
+
+
+def _percentages(value: str) -> Optional[tuple[float, float]]:
+    parts = value.split()
+    if len(parts) == 1:
+        parts *= 2
+    matches = [_PERCENT.match(part) for part in parts]
+    if len(parts) != 2 or not all(matches):
+        return None
+    return float(matches[0].group(1)) / 100, float(matches[1].group(1)) / 100
+
+
+def _seconds(text: str) -> float:
+    number, unit = _TIME.match(text).groups()
+    return float(number) / (1000 if unit == "ms" else 1)
+
+
+def _timing(animation: str) -> Optional[tuple[float, float, float, float]]:
+    bezier = _BEZIER.search(animation)
+    if bezier is not None:
+        points = [float(part) for part in bezier.group(1).split(",")]
+        return tuple(points) if len(points) == 4 else None
+    keyword = next((part for part in animation.split() if part in TIMING_FUNCTIONS), "ease")
+    return TIMING_FUNCTIONS[keyword]
+
+
+def _gradient(value: str) -> Optional[tuple[float, list[tuple[str, float]]]]:
+    match = _GRADIENT.match(value.strip())
+    if match is None:
+        return None
+    parts = [part.strip() for part in css.split_top_level(match.group(1), ",")]
+    angle = _ANGLE.match(parts[0])
+    if angle is None or len(parts) < 3:
+        return None
+    stops: list[tuple[str, Optional[float]]] = []
+    for part in parts[1:]:
+        colour, _, position = part.rpartition(" ")
+        at = _PERCENT.match(position)
+        if colour and at:
+            stops.append((colour.strip(), float(at.group(1)) / 100))
+        elif _PERCENT.match(part) or part.endswith(("px", "em", "vh", "vw")):
+            return None  # hints and length positions are not supported
+        else:
+            stops.append((part, None))
+    return float(angle.group(1)), _fill_positions(stops)
+
+
+def _fill_positions(stops: list[tuple[str, Optional[float]]]) -> list[tuple[str, float]]:
+    """Give unpositioned stops the positions CSS does: evenly between their neighbours."""
+    positions = [at for _colour, at in stops]
+    if positions[0] is None:
+        positions[0] = 0.0
+    if positions[-1] is None:
+        positions[-1] = 1.0
+    index = 1
+    while index < len(positions):
+        if positions[index] is None:
+            end = next(i for i in range(index, len(positions)) if positions[i] is not None)
+            start = positions[index - 1]
+            for offset, i in enumerate(range(index, end), 1):
+                positions[i] = start + (positions[end] - start) * offset / (end - index + 1)
+            index = end
+        index += 1
+    return [(colour, at) for (colour, _), at in zip(stops, positions)]
+
+
+def _number(value: float) -> str:
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def _to_transform(sheet: css.Stylesheet, shift: Shift) -> bool:
+    ys = {y for _offset, _x, y in shift.frames}
+    if len(ys) != 1:
+        log.info("%s: background moves vertically; left as is", ", ".join(shift.rule.selectors))
+        return False
+    y = ys.pop()
+    size_x, size_y = shift.size
+    radians = math.radians(shift.angle)
+    # Keep only the viewport-tall band the animation shows: along the
+    # gradient line, stop positions move by this much per vh of position.
+    cosine = math.cos(radians)
+    stops = []
+    for colour, at in shift.stops:
+        shift_vh = 100 * ((2 * at - 1) * (size_y - 1) * abs(cosine) / 2 + (size_y - 1) * (y - 0.5) * cosine)
+        position = f"{_number(at * 100)}%"
+        if abs(shift_vh) >= 0.0001:
+            sign = "+" if shift_vh > 0 else "-"
+            position = f"calc({position} {sign} {_number(abs(shift_vh))}vh)"
+        stops.append(f"{colour} {position}")
+    gradient = f"linear-gradient({_number(shift.angle)}deg, {', '.join(stops)})"
+
+    name = f"{shift.keyframes.prelude.strip()}Transform"
+    frames = []
+    for offset, x, _y in shift.frames:
+        # translate percentages are of the element's own (stretched) width.
+        moved = (size_x - 1) / size_x * x * 100 if size_x else 0.0
+        frames.append(
+            css.StyleRule(
+                [f"{_number(offset * 100)}%"],
+                [css.Declaration("transform", f"translate3d({_number(-moved)}%, 0, 0)")],
+            )
+        )
+    sheet.rules.insert(sheet.rules.index(shift.keyframes) + 1, css.AtRule("keyframes", name, rules=frames))
+
+    declarations = []
+    for decl in shift.rule.declarations:
+        if decl.name in ("inset", "background", "background-image", "background-size", "background-position"):
+            continue
+        if decl.name == "animation":
+            decl = css.Declaration("animation", decl.value.replace(shift.keyframes.prelude.strip(), name), decl.important)
+        declarations.append(decl)
+    declarations += [
+        css.Declaration("top", "0"),
+        css.Declaration("left", "0"),
+        css.Declaration("width", f"{_number(size_x * 100)}%"),
+        css.Declaration("height", "100%"),
+        css.Declaration("background", gradient),
+        css.Declaration("will-change", "transform"),
+    ]
+    shift.rule.declarations = declarations
+    return True
+
+
+def _to_canvas(ctx: BuildContext, shift: Shift) -> None:
+    _offset, x, y = shift.frames[0]
+    z_index = next((decl.value for decl in shift.rule.declarations if decl.name == "z-index"), "auto")
+    shift.rule.declarations = [decl for decl in shift.rule.declarations if decl.name != "animation"]
+    shift.rule.declarations.append(css.Declaration("background-position", f"{_number(x * 100)}% {_number(y * 100)}%"))
+    data = {
+        "angle": shift.angle,
+        "stops": shift.stops,
+        "size": shift.size,
+        "frames": shift.frames,
+        "duration": shift.duration,
+        "timing": shift.timing,
+        "zIndex": z_index,
+    }
+    source = runtime.script("background-canvas.js")
+    text = js.minify(source) if ctx.config.minify else source
+    path = ctx.emit("background-canvas.js", text.encode(), original_size=len(source.encode()))
+    ctx.document.body.append(
+        html.Element(
+            "script",
+            {"src": ctx.url(path), "defer": None, "data-background": json.dumps(data, separators=(",", ":"))},
+        )
+    )
@@ -0,0 +1,65 @@
+"""Minify the inline stylesheet and scripts and move them into hashed files."""
+
+from __future__ import annotations
+
+from .. import css, html, js
+from ..context import BuildContext
+from ..errors import BuildError
+
+_JS_TYPES = {None, "", "text/javascript", "application/javascript", "module"}
+
+
+def run(ctx: BuildContext) -> None:
+    assert ctx.document is not None
+    _bundle_styles(ctx)
+    _bundle_scripts(ctx)
+
+
+def _bundle_styles(ctx: BuildContext) -> None:
+    if ctx.style_element is None or ctx.stylesheet is None:
+        return
+    original = ctx.style_element.text
+    text = css.serialize(ctx.stylesheet, minify=ctx.config.minify)
+    if ctx.deferred_stylesheet is None:
+        path = ctx.emit("site.css", text.encode(), original_size=len(original.encode()))
+        ctx.style_element.replace_with(html.Element("link", {"rel": "stylesheet", "href": ctx.url(path)}))
+        ctx.style_element = None
+        return
+
+    # Critical rules stay inline; the rest is fetched without blocking render.
+    ctx.style_element.text = text
+    deferred = css.serialize(ctx.deferred_stylesheet, minify=ctx.config.minify)
+    path = ctx.emit("site.css", deferred.encode(), original_size=len(original.encode()) - len(text.encode()))
+    href = ctx.url(path)
+    preload = html.Element(
+        "link",
+        {"rel": "preload", "as": "style", "href": href, "onload": "this.onload=null;this.rel='stylesheet'"},
+    )
+    fallback = html.Element("noscript")
+    fallback.append(html.Element("link", {"rel": "stylesheet", "href": href}))
+    head = ctx.style_element.parent
+    head.insert_after(ctx.style_element, preload)
+    head.insert_after(preload, fallback)
+
+
+def _bundle_scripts(ctx: BuildContext) -> None:
+    inline = [
+        el
+        for el in ctx.document.find_all("script")
+        if el.get("src") is None and el.get("type") in _JS_TYPES and el.text.strip()
+    ]
+    for index, element in enumerate(inline):
+        source = element.text
+        if ctx.config.minify:
+            try:
+                source = js.minify(source)
+            except js.JSSyntaxError as exc:
+                raise BuildError(f"inline script #{index + 1}: {exc}") from exc
+        name = "app.js" if index == 0 else f"app-{index + 1}.js"
+        path = ctx.emit(name, source.encode(), original_size=len(element.text.encode()))
+        attrs = {"src": ctx.url(path)}
+        if element.get("type") == "module":
+            attrs["type"] = "module"
+        else:
+            attrs["defer"] = None
+        element.replace_with(html.Element("script", attrs))
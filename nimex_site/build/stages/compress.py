@@ -0,0 +1,137 @@
+"""Precompress text assets at settings too slow to use per request.
+
+Every compressible asset (HTML, CSS, JS, SVG, JSON...) gets ``.br``
+(Brotli quality 11), ``.gz`` (Zopfli, the slowest and smallest
+gzip-compatible deflate) and ``.zst`` (Zstandard level 19, the highest
+level whose 8 MiB window browsers still accept) siblings. A sibling is
+kept only when it is at most ``precompress_max_ratio`` of the original,
+so small or already-dense files stay identity-only.
+
+``manifest.json`` records what was written under ``"compression"``,
+keyed by asset path: the original size and, per content-coding, the
+sibling's size and ratio. The server negotiates only between the
+representations listed there.
+
+Each codec is optional (the ``compress`` extra): without ``brotli`` or
+``zstandard`` that sibling is skipped, and without ``zopfli`` ``.gz`` falls
+back to zlib level 9. Results go through the build cache.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import time
+from typing import Callable, Optional
+
+from ..cache import cache_key, open_cache
+from ..context import Asset, BuildContext
+
+try:
+    import brotli
+except ImportError:  # optional: no .br siblings
+    brotli = None
+
+try:
+    import zopfli.gzip as zopfli_gzip
+except ImportError:  # optional: .gz falls back to zlib level 9
+    zopfli_gzip = None
+
+try:
+    import zstandard
+except ImportError:  # optional: no .zst siblings
+    zstandard = None
+
+COMPRESSIBLE = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/manifest+json",
+        "application/xml",
+        "image/svg+xml",
+        "image/x-icon",
+        "font/ttf",
+        "font/otf",
+    }
+)
+
+ZSTD_LEVEL = 19
+
+
+def compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or content_type.split(";")[0] in COMPRESSIBLE
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+
+def _gzip(data: bytes) -> bytes:
+    if zopfli_gzip is not None:
+        return zopfli_gzip.compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL, write_content_size=True).compress(data)
+
+
+def codecs() -> list[tuple[str, str, Callable[[bytes], bytes]]]:
+    """``(content-coding, suffix, compress)`` for every available codec."""
+    found = []
+    if brotli is not None:
+        found.append(("br", ".br", _brotli))
+    found.append(("gzip", ".gz", _gzip))
+    if zstandard is not None:
+        found.append(("zstd", ".zst", _zstd))
+    return found
+
+
+def run(ctx: BuildContext) -> None:
+    config = ctx.config
+    cache = open_cache(config)
+    available = codecs()
+    missing = [name for name, module in (("brotli", brotli), ("zopfli", zopfli_gzip), ("zstandard", zstandard)) if module is None]
+    if missing:
+        ctx.report.note(f"precompression without {', '.join(missing)}: pip install 'nimex-site[compress]'")
+
+    started = time.perf_counter()
+    entries: dict[str, dict] = {}
+    totals = {coding: [0, 0] for coding, _suffix, _compress in available}
+    for asset in list(ctx.assets.values()):
+        if not compressible(asset.content_type) or not asset.data:
+            continue
+        digest = hashlib.sha256(asset.data).hexdigest()
+        entry = {"size": len(asset.data), "variants": {}}
+        for coding, suffix, compress in available:
+            data = _compress_cached(cache, compress, coding, digest, asset.data)
+            ratio = len(data) / len(asset.data)
+            totals[coding][0] += len(asset.data)
+            if ratio > config.precompress_max_ratio:
+                totals[coding][1] += len(asset.data)
+                continue
+            totals[coding][1] += len(data)
+            sibling = asset.path + suffix
+            ctx.assets[sibling] = Asset(sibling, data, asset.content_type, asset.hashed, {"encoding": coding})
+            entry["variants"][coding] = {"size": len(data), "ratio": round(ratio, 4)}
+        entries[asset.path] = entry
+
+    ctx.manifest["compression"] = entries
+    for coding, (before, after) in totals.items():
+        if before:
+            ctx.report.note(f"precompressed {coding}: {before:,} B -> {after:,} B ({1 - after / before:.1%} smaller)")
+    ctx.report.stat(f"precompression: {len(entries)} files in {time.perf_counter() - started:.2f} s")
+
+
+def _compress_cached(cache, compress: Callable[[bytes], bytes], coding: str, digest: str, data: bytes) -> bytes:
+    key: Optional[str] = None
+    if cache is not None:
+        key = cache_key(digest, {"transform": "precompress", "coding": coding, "zopfli": zopfli_gzip is not None})
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    started = time.perf_counter()
+    result = compress(data)
+    if cache is not None:
+        cache.put(key, result, seconds=time.perf_counter() - started)
+    return result
@@ -0,0 +1,152 @@
+"""Split the stylesheet into an inline critical block and a deferred remainder.
+
+"Critical" means every rule that can match an element needed for the first
+paint of the hero viewport: the configured root elements, their
+descendants and their ancestors (so ``html``/``body`` styling and ``:root``
+variables come along). Everything else is loaded asynchronously by the
+bundle stage.
+
+Splitting must not change the cascade. A critical rule that also matches
+below-the-fold elements is repeated in the deferred sheet when it
+originally came after a deferred rule, so the deferred sheet alone still
+reproduces the original source order for those elements.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .. import css, selectors
+from ..context import BuildContext
+from ..errors import BuildError
+from ..html import Element
+
+# Chrome DevTools "Slow 3G" preset.
+SLOW_3G_RTT = 2.0
+SLOW_3G_BYTES_PER_SECOND = 500_000 / 8
+
+
+@dataclass
+class _Classification:
+    critical: set[int]
+    shared: set[int]
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.stylesheet is None or ctx.document is None:
+        return
+    config = ctx.config
+    critical_elements = _critical_elements(ctx.document, config.critical_roots)
+    if not critical_elements:
+        raise BuildError(f"critical roots {', '.join(config.critical_roots)} match nothing in the page")
+    other_elements = [
+        el for el in ctx.document.html.iter() if el not in critical_elements
+    ]
+
+    classification = _classify(ctx.stylesheet.rules, critical_elements, other_elements)
+    critical_rules = _filter(ctx.stylesheet.rules, lambda rule: id(rule) in classification.critical)
+    _add_keyframes(ctx.stylesheet.rules, critical_rules)
+    deferred_rules = _deferred(ctx.stylesheet.rules, classification, _keyframe_names(critical_rules))
+
+    critical_bytes = len(css.serialize(critical_rules, minify=True).encode())
+    deferred_bytes = len(css.serialize(deferred_rules, minify=True).encode())
+    full_bytes = len(css.serialize(ctx.stylesheet, minify=True).encode())
+    if config.critical_budget and critical_bytes > config.critical_budget:
+        raise BuildError(
+            f"critical CSS is {critical_bytes:,} bytes, over the {config.critical_budget:,} byte budget; "
+            "move rules out of the above-the-fold roots or raise --critical-budget"
+        )
+
+    ctx.stylesheet = css.Stylesheet(critical_rules)
+    ctx.deferred_stylesheet = css.Stylesheet(deferred_rules)
+
+    html_bytes = len(ctx.source_text.encode())
+    before = estimate_render_blocking(html_bytes, [full_bytes])
+    after = estimate_render_blocking(html_bytes + critical_bytes, [])
+    ctx.manifest["critical_css"] = {
+        "roots": list(config.critical_roots),
+        "bytes": critical_bytes,
+        "budget": config.critical_budget,
+        "deferred_bytes": deferred_bytes,
+        "slow_3g_render_blocking_ms": {"before": round(before * 1000), "after": round(after * 1000)},
+    }
+    ctx.report.note(
+        f"critical CSS {critical_bytes:,} B inline (budget {config.critical_budget:,} B), "
+        f"{deferred_bytes:,} B deferred; est. Slow 3G render-blocking time "
+        f"{before * 1000:,.0f} ms -> {after * 1000:,.0f} ms"
+    )
+
+
+def estimate_render_blocking(html_bytes: int, blocking_stylesheets: list[int]) -> float:
+    """Seconds until first paint is unblocked on Slow 3G, ignoring TCP slow start.
+
+    The document costs one round trip plus its transfer time; every
+    render-blocking stylesheet adds another round trip and its own bytes.
+    """
+    seconds = SLOW_3G_RTT + html_bytes / SLOW_3G_BYTES_PER_SECOND
+    for size in blocking_stylesheets:
+        seconds += SLOW_3G_RTT + size / SLOW_3G_BYTES_PER_SECOND
+    return seconds
+
+
+def _critical_elements(document, roots: tuple[str, ...]) -> set[Element]:
+    found: set[Element] = set()
+    for root in roots:
+        for element in selectors.select(document.html, root):
+            found.update(element.iter())
+            found.update(a for a in element.ancestors() if a.tag != "#document")
+    return found
+
+
+def _classify(rules: list[css.Node], critical: set[Element], other: list[Element]) -> _Classification:
+    result = _Classification(set(), set())
+    for rule, parents in css.Stylesheet(rules).walk():
+        if any(parent.name == "keyframes" for parent in parents):
+            continue
+        if isinstance(rule, css.StyleRule):
+            if any(selectors.matches(el, s) for s in rule.selectors for el in critical):
+                result.critical.add(id(rule))
+                if any(selectors.matches(el, s) for s in rule.selectors for el in other):
+                    result.shared.add(id(rule))
+        elif isinstance(rule, css.AtRule) and rule.rules is None:
+            # @charset, @import, @font-face and friends apply globally.
+            result.critical.add(id(rule))
+    return result
+
+
+def _filter(rules: list[css.Node], keep) -> list[css.Node]:
+    out: list[css.Node] = []
+    for rule in rules:
+        if isinstance(rule, css.AtRule) and rule.rules is not None and rule.name != "keyframes":
+            inner = _filter(rule.rules, keep)
+            if inner:
+                out.append(css.AtRule(rule.name, rule.prelude, rules=inner))
+        elif keep(rule):
+            out.append(rule)
+    return out
+
+
+def _keyframe_names(rules: list[css.Node]) -> set[str]:
+    return {rule.prelude for rule, _ in css.Stylesheet(rules).walk() if isinstance(rule, css.AtRule) and rule.name == "keyframes"}
+
+
+def _add_keyframes(source: list[css.Node], critical: list[css.Node]) -> None:
+    wanted = css.animation_names(critical)
+    critical.extend(
+        rule for rule in source if isinstance(rule, css.AtRule) and rule.name == "keyframes" and rule.prelude in wanted
+    )
+
+
+def _deferred(rules: list[css.Node], classification: _Classification, inlined_keyframes: set[str]) -> list[css.Node]:
+    seen_deferred = False
+
+    def keep(rule: css.Node) -> bool:
+        nonlocal seen_deferred
+        if isinstance(rule, css.AtRule) and rule.name == "keyframes":
+            return rule.prelude not in inlined_keyframes
+        if id(rule) not in classification.critical:
+            seen_deferred = True
+            return True
+        return seen_deferred and id(rule) in classification.shared
+
+    return _filter(rules, keep)
@@ -0,0 +1,112 @@
+"""Move ``url(data:...)`` payloads out of the stylesheet into hashed files.
+
+The inline ``:root`` block carries the logo as a percent-encoded SVG, once
+for ``--logo-mark`` and again for ``--logo-cursor``. Payloads are grouped
+by their decoded bytes so identical images become a single cacheable
+file. Where a payload is used as a cursor (``url(...) x y``) a 32px PNG is
+rendered next to it when ``cairosvg`` is available and listed first, so
+browsers with slow SVG cursor rasterization pick the bitmap.
+"""
+
+from __future__ import annotations
+
+import base64
+import mimetypes
+import re
+from typing import Optional
+from urllib.parse import unquote_to_bytes
+
+from ..context import BuildContext, log
+
+try:
+    import cairosvg
+except ImportError:  # optional: only needed for the PNG cursor fallback
+    cairosvg = None
+
+CURSOR_SIZE = 32
+
+_DATA_URL = re.compile(
+    r"""url\(\s*(?:"(?P<dq>data:[^"]*)"|'(?P<sq>data:[^']*)'|(?P<bare>data:[^)\s]*))\s*\)"""
+    r"""(?P<hotspot>\s+\d+\s+\d+)?""",
+    re.IGNORECASE,
+)
+
+
+def _uri(match: re.Match) -> str:
+    return match.group("dq") or match.group("sq") or match.group("bare")
+
+
+def decode(uri: str) -> tuple[str, bytes]:
+    """Return ``(media_type, payload)`` for a ``data:`` URI."""
+    header, _, data = uri[5:].partition(",")
+    params = header.split(";")
+    media_type = params[0] or "text/plain"
+    if "base64" in params[1:]:
+        return media_type, base64.b64decode(data)
+    return media_type, unquote_to_bytes(data)
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.stylesheet is None:
+        return
+    declarations = [
+        decl
+        for rule, _parents in ctx.stylesheet.walk()
+        for decl in (getattr(rule, "declarations", None) or [])
+        if "data:" in decl.value
+    ]
+    # payload -> (media type, names of the properties using it, inline bytes)
+    payloads: dict[bytes, tuple[str, list[str], list[int]]] = {}
+    for decl in declarations:
+        for match in _DATA_URL.finditer(decl.value):
+            uri = _uri(match)
+            if len(uri) < ctx.config.datauri_min_bytes:
+                continue
+            media_type, payload = decode(uri)
+            entry = payloads.setdefault(payload, (media_type, [], []))
+            entry[1].append(decl.name)
+            entry[2].append(len(uri))
+
+    urls: dict[bytes, str] = {}
+    cursor_urls: dict[bytes, str] = {}
+    for payload, (media_type, users, inline_sizes) in payloads.items():
+        name = _asset_name(users, media_type)
+        path = ctx.emit(name, payload, content_type=media_type, original_size=sum(inline_sizes))
+        urls[payload] = ctx.url(path)
+        if len(users) > 1:
+            ctx.report.note(f"de-duplicated {len(users)} inline copies of {name} ({', '.join(users)})")
+
+    def replace(match: re.Match) -> str:
+        media_type, payload = decode(_uri(match))
+        url = urls.get(payload)
+        if url is None:
+            return match.group(0)
+        hotspot = match.group("hotspot") or ""
+        if not hotspot:
+            return f'url("{url}")'
+        png = cursor_urls.get(payload) or _cursor_png(ctx, payload, media_type, url)
+        if png is None:
+            return f'url("{url}"){hotspot}'
+        cursor_urls[payload] = png
+        return f'url("{png}"){hotspot}, url("{url}"){hotspot}'
+
+    for decl in declarations:
+        decl.value = _DATA_URL.sub(replace, decl.value)
+
+
+def _asset_name(users: list[str], media_type: str) -> str:
+    extension = mimetypes.guess_extension(media_type) or ".bin"
+    for user in users:
+        if user.startswith("--"):
+            return user[2:].split("-")[0] + extension
+    return "inline" + extension
+
+
+def _cursor_png(ctx: BuildContext, payload: bytes, media_type: str, svg_url: str) -> Optional[str]:
+    if media_type != "image/svg+xml" or not ctx.config.cursor_png:
+        return None
+    if cairosvg is None:
+        log.info("cairosvg is not installed; %s stays an SVG-only cursor", svg_url)
+        return None
+    png = cairosvg.svg2png(bytestring=payload, output_width=CURSOR_SIZE, output_height=CURSOR_SIZE)
+    return ctx.url(ctx.emit("cursor.png", png, content_type="image/png"))
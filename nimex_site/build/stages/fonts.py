@@ -0,0 +1,240 @@
+"""Self-host the web font instead of loading it from Google Fonts.
+
+The page asks fonts.googleapis.com for Outfit 300-700, which costs two
+extra connections and a render-blocking stylesheet hop. This stage takes
+the family's font files from ``--fonts-dir``, works out which weights the
+page really renders text in (via the cascade, including user-agent bold
+for headings and ``<strong>``), subsets each weight to the characters set
+in that weight, and writes WOFF2 files with ``font-display: swap``
+``@font-face`` rules. Weights used above the fold are preloaded.
+
+Needs ``fontTools`` and ``brotli`` (the ``fonts`` extra); no network access.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .. import cascade, css, html, selectors
+from ..context import BuildContext, log
+from ..errors import BuildError
+
+try:
+    from fontTools import subset as ft_subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # optional: the stage reports a clear error when enabled
+    ft_subset = None
+    TTFont = None
+
+FONT_SUFFIXES = (".ttf", ".otf", ".woff", ".woff2")
+GOOGLE_FONT_HOSTS = ("fonts.googleapis.com", "fonts.gstatic.com")
+
+# User-agent stylesheet weights for elements the page uses.
+UA_FONT_WEIGHTS = {tag: "bold" for tag in ("h1", "h2", "h3", "h4", "h5", "h6", "strong", "b", "th")}
+
+_NAMED_WEIGHTS = {"normal": 400, "bold": 700, "lighter": 300, "bolder": 700}
+_SKIP_TEXT = frozenset({"script", "style", "noscript", "template", "title"})
+
+
+@dataclass
+class FontFile:
+    path: Path
+    weight_min: int
+    weight_max: int
+
+    @property
+    def variable(self) -> bool:
+        return self.weight_min != self.weight_max
+
+    def distance(self, weight: int) -> int:
+        if self.weight_min <= weight <= self.weight_max:
+            return 0
+        return min(abs(weight - self.weight_min), abs(weight - self.weight_max))
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None or ctx.stylesheet is None:
+        return
+    if ft_subset is None:
+        raise BuildError("font subsetting needs fontTools and brotli: pip install 'nimex-site[fonts]'")
+    family = _google_family(ctx.document) or ctx.config.font_family
+    files = _font_files(ctx.config.fonts_dir, family)
+    if not files:
+        raise BuildError(f"no {family} font files in {ctx.config.fonts_dir}")
+
+    weights = cascade.possible_values(
+        ctx.document.html, ctx.stylesheet, "font-weight", initial="400", defaults=UA_FONT_WEIGHTS
+    )
+    transforms = cascade.possible_values(ctx.document.html, ctx.stylesheet, "text-transform", initial="none")
+    text_by_weight = _text_by_weight(ctx.document, weights, transforms, ctx.config.font_extra_text)
+
+    # Group requested weights by the file that will render them.
+    by_file: dict[Path, tuple[FontFile, set[int], set[str]]] = {}
+    for weight, chars in sorted(text_by_weight.items()):
+        font = min(files, key=lambda f: (f.distance(weight), f.weight_min))
+        entry = by_file.setdefault(font.path, (font, set(), set()))
+        entry[1].add(weight)
+        entry[2].update(chars)
+
+    critical_weights = _critical_weights(ctx, weights)
+    faces: list[css.Node] = []
+    preloads: list[str] = []
+    for font, used_weights, chars in by_file.values():
+        data = _subset(font.path, "".join(sorted(chars)))
+        if font.variable:
+            label = f"{min(used_weights)}-{max(used_weights)}"
+            weight_descriptor = f"{font.weight_min} {font.weight_max}"
+        else:
+            label = weight_descriptor = str(font.weight_min)
+        name = f"{family.lower().replace(' ', '-')}-{label}.woff2"
+        path = ctx.emit(name, data, content_type="font/woff2", original_size=font.path.stat().st_size)
+        url = ctx.url(path)
+        faces.append(
+            css.AtRule(
+                "font-face",
+                declarations=[
+                    css.Declaration("font-family", f'"{family}"'),
+                    css.Declaration("font-style", "normal"),
+                    css.Declaration("font-weight", weight_descriptor),
+                    css.Declaration("font-display", "swap"),
+                    css.Declaration("src", f'url("{url}") format("woff2")'),
+                ],
+            )
+        )
+        if used_weights & critical_weights:
+            preloads.append(url)
+        ctx.report.note(f"{name}: weights {sorted(used_weights)}, {len(chars)} glyphs")
+
+    ctx.stylesheet.rules[:0] = faces
+    _replace_google_fonts(ctx.document, preloads)
+    ctx.manifest["fonts"] = {"family": family, "preload": preloads, "weights": sorted(text_by_weight)}
+
+
+def parse_weight(value: str) -> Optional[int]:
+    value = value.strip().lower()
+    if value in _NAMED_WEIGHTS:
+        return _NAMED_WEIGHTS[value]
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _google_family(document: html.Document) -> Optional[str]:
+    for link in document.head.find_all("link"):
+        href = link.get("href") or ""
+        if urlsplit(href).netloc == "fonts.googleapis.com":
+            families = parse_qs(urlsplit(href).query).get("family", [])
+            if families:
+                return families[0].split(":")[0].replace("+", " ")
+    return None
+
+
+def _font_files(directory: Path, family: str) -> list[FontFile]:
+    found = []
+    key = family.lower().replace(" ", "")
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in FONT_SUFFIXES:
+            continue
+        font = TTFont(path, lazy=True)
+        try:
+            entry = _describe(path, font, key)
+        finally:
+            font.close()
+        if entry is not None:
+            found.append(entry)
+    return found
+
+
+def _describe(path: Path, font, family_key: str) -> Optional[FontFile]:
+    name = (font["name"].getBestFamilyName() or path.stem).lower().replace(" ", "")
+    if not name.startswith(family_key) and not path.stem.lower().replace(" ", "").startswith(family_key):
+        return None
+    if font["OS/2"].fsSelection & 1:
+        return None  # italic; the page never asks for it
+    if "fvar" in font:
+        axis = next((a for a in font["fvar"].axes if a.axisTag == "wght"), None)
+        if axis is not None:
+            return FontFile(path, int(axis.minValue), int(axis.maxValue))
+    weight = font["OS/2"].usWeightClass
+    return FontFile(path, weight, weight)
+
+
+def _text_by_weight(
+    document: html.Document,
+    weights: dict[html.Element, set[str]],
+    transforms: dict[html.Element, set[str]],
+    extra: str,
+) -> dict[int, set[str]]:
+    result: dict[int, set[str]] = {}
+    for element in document.body.iter():
+        if element.tag in _SKIP_TEXT:
+            continue
+        text = "".join(child.data for child in element.children if isinstance(child, html.Text))
+        if element.tag in ("img", "input") and element.get("alt"):
+            text += element.get("alt")  # rendered when the image fails to load
+        if not text.strip():
+            continue
+        chars = set(text)
+        modes = transforms.get(element, set())
+        if "uppercase" in modes or "capitalize" in modes:
+            chars |= set(text.upper())
+        if "lowercase" in modes:
+            chars |= set(text.lower())
+        chars.discard("\n")
+        for value in weights.get(element, {"400"}):
+            weight = parse_weight(value)
+            if weight is not None:
+                result.setdefault(weight, set()).update(chars)
+    if result:
+        for chars in result.values():
+            chars.update(extra + " ")
+    return result
+
+
+def _critical_weights(ctx: BuildContext, weights: dict[html.Element, set[str]]) -> set[int]:
+    found: set[int] = set()
+    for root in ctx.config.critical_roots:
+        for element in selectors.select(ctx.document.html, root):
+            for descendant in element.iter():
+                if descendant.text.strip():
+                    found.update(w for w in map(parse_weight, weights.get(descendant, ())) if w is not None)
+    return found
+
+
+def _subset(path: Path, text: str) -> bytes:
+    options = ft_subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    options.desubroutinize = True
+    font = ft_subset.load_font(str(path), options)
+    subsetter = ft_subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    ft_subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+def _replace_google_fonts(document: html.Document, preloads: list[str]) -> None:
+    head = document.head
+    anchor = None
+    for link in head.find_all("link"):
+        if urlsplit(link.get("href") or "").netloc in GOOGLE_FONT_HOSTS:
+            anchor = anchor or link
+            if link is not anchor:
+                link.remove()
+    for url in preloads:
+        preload = html.Element("link", {"rel": "preload", "as": "font", "type": "font/woff2", "href": url, "crossorigin": None})
+        if anchor is not None:
+            head.insert_before(anchor, preload)
+        else:
+            head.insert(0, preload)
+    if anchor is not None:
+        anchor.remove()
+    else:
+        log.info("no Google Fonts links to replace")
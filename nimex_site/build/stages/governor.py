@@ -0,0 +1,96 @@
+"""Shed the page's heaviest effects on devices that cannot keep up.
+
+The sticky header blurs whatever scrolls under it (``backdrop-filter``)
+while the background video, the bubbles and the gradient backdrop all
+animate beneath it, so every frame re-filters a moving picture. This
+stage injects ``runtime/governor.js``, which samples frame times with
+``requestAnimationFrame`` (and Long Animation Frames where the browser has
+them) and, when frames keep being dropped, downgrades one step at a time
+by adding a class to ``<html>``:
+
+* ``quality-no-blur``: every ``backdrop-filter`` in the stylesheet is
+  switched off (the stage adds the overriding rules);
+* ``quality-no-bubbles``: the ``governor_bubbles`` layer is hidden;
+* ``quality-poster``: the ``governor_video`` video is stopped and left on
+  its poster.
+
+Steps whose target is not in the page are left out. The thresholds come
+from ``governor_thresholds``; each downgrade is reported to
+``rum_endpoint`` with the frame statistics that triggered it.
+
+Runs after pruning: nothing in the page carries these classes, so pruning
+would drop the rules added here.
+"""
+
+from __future__ import annotations
+
+import json
+
+from .. import css, html, js, runtime, selectors
+from ..context import BuildContext
+
+STEPS = ("no-blur", "no-bubbles", "poster")
+
+_BLUR = ("backdrop-filter", "-webkit-backdrop-filter")
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None or ctx.stylesheet is None:
+        return
+    config = ctx.config
+    steps = []
+    if _unblur(ctx.stylesheet):
+        steps.append("no-blur")
+    if config.governor_bubbles and selectors.select(ctx.document.html, config.governor_bubbles):
+        ctx.stylesheet.rules.append(
+            css.StyleRule(
+                [_scoped("no-bubbles", selector) for selector in css.split_top_level(config.governor_bubbles, ",")],
+                [css.Declaration("display", "none")],
+            )
+        )
+        steps.append("no-bubbles")
+    if config.governor_video and selectors.select(ctx.document.html, config.governor_video):
+        steps.append("poster")
+    if not steps:
+        return
+
+    data = {
+        "steps": steps,
+        "video": config.governor_video,
+        "thresholds": config.governor_thresholds,
+        "endpoint": config.rum_endpoint,
+    }
+    source = runtime.script("governor.js")
+    text = js.minify(source) if config.minify else source
+    path = ctx.emit("governor.js", text.encode(), original_size=len(source.encode()))
+    ctx.document.body.append(
+        html.Element("script", {"src": ctx.url(path), "defer": None, "data-governor": json.dumps(data, separators=(",", ":"))})
+    )
+    ctx.report.note(f"quality governor: {' -> '.join(steps)}")
+
+
+def _unblur(sheet: css.Stylesheet) -> bool:
+    """Follow every rule with a backdrop filter by one that turns it off under ``quality-no-blur``."""
+    found = False
+    for rule, parents in list(sheet.walk()):
+        if not isinstance(rule, css.StyleRule) or any(parent.name == "keyframes" for parent in parents):
+            continue
+        if not any(decl.name in _BLUR for decl in rule.declarations):
+            continue
+        siblings = parents[-1].rules if parents else sheet.rules
+        override = css.StyleRule(
+            [_scoped("no-blur", selector) for selector in rule.selectors],
+            [css.Declaration(name, "none") for name in _BLUR],
+        )
+        siblings.insert(siblings.index(rule) + 1, override)
+        found = True
+    return found
+
+
+def _scoped(step: str, selector: str) -> str:
+    """``selector``, matching only while ``<html>`` has the step's class."""
+    selector = selector.strip()
+    for root in (":root", "html"):
+        if selector == root or selector.startswith((f"{root} ", f"{root}.", f"{root}:", f"{root}>")):
+            return f"{root}.quality-{step}{selector[len(root):]}"
+    return f".quality-{step} {selector}"
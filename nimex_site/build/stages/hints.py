@@ -0,0 +1,167 @@
+"""Preload the page's critical resources and publish them as Early Hints.
+
+The hero slide, the self-hosted fonts, the logo and the background video
+poster are all discovered late: the slide and logo sit deep in the body,
+the fonts behind the stylesheet, the poster on a fixed layer. This stage
+collects that critical resource graph and:
+
+* adds ``<link rel=preload>`` tags to the head with a ``fetchpriority``
+  (``high`` for the LCP image and fonts, ``low`` for decorative images),
+  using ``imagesrcset``/``imagesizes`` for responsive images. An image in
+  a ``<picture>`` is preloaded as its first typed ``<source>`` (the format
+  the ``<picture>`` picks wherever it is supported), with that format's own
+  files;
+* marks the LCP ``<img>`` itself ``fetchpriority=high`` and never lazy;
+* records the same set as ``Link`` header values in the manifest's
+  ``"early_hints"`` (and ``_headers``), which the server sends as a
+  ``103 Early Hints`` response before the page.
+
+The build fails if ``lcp_selector`` matches nothing or the first image it
+matches is not hinted, so later markup changes cannot silently drop the
+LCP preload. An empty ``lcp_selector`` preloads no LCP image.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .. import html, selectors, urls
+from ..context import BuildContext, log
+from ..errors import BuildError
+
+
+@dataclass
+class Hint:
+    href: str
+    kind: str  # the ``as`` value
+    priority: Optional[str] = None
+    type: Optional[str] = None
+    srcset: Optional[str] = None
+    sizes: Optional[str] = None
+    crossorigin: bool = False
+
+    def element(self) -> html.Element:
+        attrs: dict[str, Optional[str]] = {"rel": "preload", "as": self.kind, "href": self.href}
+        if self.type:
+            attrs["type"] = self.type
+        if self.srcset:
+            attrs["imagesrcset"] = self.srcset
+            if self.sizes:
+                attrs["imagesizes"] = self.sizes
+        if self.crossorigin:
+            attrs["crossorigin"] = None
+        if self.priority:
+            attrs["fetchpriority"] = self.priority
+        return html.Element("link", attrs)
+
+    def header(self) -> str:
+        """The ``Link`` header value for this hint."""
+        parts = [f"<{self.href}>", "rel=preload", f"as={self.kind}"]
+        if self.type:
+            parts.append(f'type="{self.type}"')
+        if self.srcset:
+            parts.append(f'imagesrcset="{self.srcset}"')
+            if self.sizes:
+                parts.append(f'imagesizes="{self.sizes}"')
+        if self.crossorigin:
+            parts.append("crossorigin")
+        if self.priority:
+            parts.append(f"fetchpriority={self.priority}")
+        return "; ".join(parts)
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    config = ctx.config
+    head = ctx.document.head
+    existing = {
+        link.get("href"): link
+        for link in head.find_all("link")
+        if "preload" in (link.get("rel") or "").split()
+    }
+
+    hints: list[Hint] = []
+    if config.lcp_selector:
+        lcp = next(iter(selectors.select(ctx.document.html, config.lcp_selector)), None)
+        if lcp is None:
+            raise BuildError(f"the LCP selector {config.lcp_selector} matches nothing; fix the markup or --lcp")
+        lcp_hints = _image_hints(lcp, "high")
+        if not lcp_hints:
+            raise BuildError(f"the LCP image ({config.lcp_selector}) is not preloaded with fetchpriority=high")
+        hints += lcp_hints
+        lcp.set("fetchpriority", "high")
+        lcp.attrs.pop("loading", None)
+
+    # Preloads earlier stages added (fonts, the deferred stylesheet).
+    for href, link in existing.items():
+        hints.append(
+            Hint(
+                href,
+                link.get("as") or "fetch",
+                link.get("fetchpriority") or ("high" if link.get("as") == "font" else None),
+                link.get("type"),
+                crossorigin="crossorigin" in link.attrs,
+            )
+        )
+
+    for selector in config.hint_images:
+        for element in selectors.select(ctx.document.html, selector):
+            for hint in _image_hints(element, "low"):
+                if all(hint.href != other.href for other in hints):
+                    hints.append(hint)
+
+    anchor = next((child for child in head.element_children if child.tag in ("link", "style", "script")), None)
+    for hint in hints:
+        link = existing.get(hint.href)
+        if link is not None:
+            if hint.priority and not link.get("fetchpriority"):
+                link.set("fetchpriority", hint.priority)
+            continue
+        preload = hint.element()
+        if anchor is not None:
+            head.insert_before(anchor, preload)
+        else:
+            head.append(preload)
+
+    headers = [hint.header() for hint in hints]
+    ctx.manifest["early_hints"] = {"/": headers}
+    ctx.report.note(f"preloading {len(hints)} critical resources: " + ", ".join(h.href.split("?")[0].rsplit("/", 1)[-1] for h in hints))
+
+
+def _image_hints(element: html.Element, priority: str) -> list[Hint]:
+    """The preload for an ``<img>`` (as its ``<picture>``'s first format) or a ``<video>``'s poster."""
+    if element.tag == "video":
+        poster = element.get("poster")
+        return [Hint(poster, "image", priority)] if poster and not urls.is_local(poster) else []
+    src = element.get("src") or ""
+    if not src:
+        return []
+    if urls.is_local(src):
+        # Still a page-relative path: the localize stage could not find the file.
+        log.debug("not preloading %s: no such asset", src)
+        return []
+    parent = element.parent
+    if isinstance(parent, html.Element) and parent.tag == "picture":
+        source = next(
+            (
+                child
+                for child in parent.element_children
+                if child.tag == "source" and child.get("type") and child.get("srcset") and child.get("media") is None
+            ),
+            None,
+        )
+        if source is not None:
+            # Only the format the <picture> picks first: preloading the other
+            # sources or the <img> fallback as well would fetch a second copy
+            # in every browser that decodes them all.
+            srcset = source.get("srcset")
+            return [Hint(_middle(srcset), "image", priority, source.get("type"), srcset, source.get("sizes"))]
+    return [Hint(src, "image", priority, srcset=element.get("srcset"), sizes=element.get("sizes"))]
+
+
+def _middle(srcset: str) -> str:
+    """The middle candidate of ``srcset``, as the images stage picks the fallback ``src``."""
+    candidates = [entry.split()[0] for entry in srcset.split(",") if entry.strip()]
+    return candidates[len(candidates) // 2]
@@ -0,0 +1,351 @@
+"""Responsive image renditions with generated ``srcset``/``sizes``.
+
+Every ``<img>`` whose source file can be found locally is re-encoded at
+the configured widths (never upscaled) as AVIF, WebP and JPEG, and
+rewritten into a ``<picture>`` with one ``<source>`` per modern format.
+``sizes`` comes from :mod:`nimex_site.build.layout`, so a gallery tile
+advertises a quarter of the content width rather than the full viewport.
+
+The stage runs whenever the page references a local image. Files already
+copied or vendored by earlier stages are used as they are, with or without
+``--images-dir``. Other sources are looked up in ``--images-dir``: first
+through an optional ``images.json`` mapping ``{"<src as written in the
+page>": "file.jpg"}``, then by the file name at the end of the URL path;
+failing that, as a path relative to the page. Needs Pillow (the ``images``
+extra); AVIF output additionally needs a Pillow build with AVIF support and
+is skipped otherwise.
+
+Encoding fans out over a process pool sized to the cores we may run on,
+and every output is stored in the content-addressed build cache keyed by
+the source bytes and the rendition parameters, so a rebuild only encodes
+images that actually changed.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import math
+import os
+import posixpath
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from .. import css, html, layout, urls
+from ..cache import cache_key, file_digest, open_cache
+from ..context import BuildContext, log
+from ..errors import BuildError
+from ..hashing import slugify
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional: the stage reports a clear error when enabled
+    Image = None
+    ImageOps = None
+    features = None
+
+FORMATS = {
+    "avif": ("image/avif", ".avif"),
+    "webp": ("image/webp", ".webp"),
+    "jpeg": ("image/jpeg", ".jpg"),
+}
+
+# (viewport width, device pixel ratio) pairs for the bytes-shipped report.
+REPORT_VIEWPORTS = ((360, 2), (768, 2), (1280, 1), (1920, 1))
+
+# Renditions are generated up to the largest rendered width at this density.
+MAX_DPR = 2
+
+# EXIF Orientation values that turn the picture a quarter turn.
+_ORIENTATION = 0x0112
+_QUARTER_TURNS = {5, 6, 7, 8}
+
+
+@dataclass(frozen=True)
+class Rendition:
+    width: int
+    format: str
+    quality: int
+
+
+def encode(source: Path, rendition: Rendition) -> bytes:
+    """Resize ``source`` to ``rendition.width`` and encode it. Runs in worker processes."""
+    with Image.open(source) as image:
+        # Camera JPEGs store pixels unrotated plus an EXIF Orientation tag.
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if rendition.format != "jpeg" and image.mode in ("RGBA", "LA", "P") else "RGB")
+        if image.width > rendition.width:
+            height = round(image.height * rendition.width / image.width)
+            image = image.resize((rendition.width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if rendition.format == "jpeg":
+            image.save(buffer, "JPEG", quality=rendition.quality, optimize=True, progressive=True)
+        elif rendition.format == "webp":
+            image.save(buffer, "WEBP", quality=rendition.quality, method=6)
+        else:
+            image.save(buffer, "AVIF", quality=rendition.quality, speed=4)
+        return buffer.getvalue()
+
+
+def _encode_timed(source: Path, rendition: Rendition) -> tuple[bytes, float]:
+    started = time.perf_counter()
+    data = encode(source, rendition)
+    return data, time.perf_counter() - started
+
+
+def worker_count(requested: Optional[int] = None) -> int:
+    """``requested``, or the number of cores this process may be scheduled on."""
+    if requested:
+        return max(1, requested)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def available_formats() -> list[str]:
+    formats = ["webp", "jpeg"]
+    if features is not None and features.check("avif"):
+        formats.insert(0, "avif")
+    return formats
+
+
+@dataclass
+class _Job:
+    element: html.Element
+    source: Path
+    width: int
+    height: int
+    sizes: str
+    # Rendered CSS width at each REPORT_VIEWPORTS viewport.
+    slots: dict[int, float]
+    needed: int
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None or ctx.stylesheet is None:
+        return
+    config = ctx.config
+    mapping = load_mapping(config.images_dir)
+    found = []
+    for element in ctx.document.body.find_all("img"):
+        src = element.get("src") or ""
+        if element.get("srcset") or not src:
+            continue
+        source = find_source(ctx, src, mapping)
+        if source is None:
+            log.info("no local source for %s; left as is", src)
+            continue
+        found.append((element, source))
+    if not found:
+        return
+    if Image is None:
+        raise BuildError("the image stage needs Pillow: pip install 'nimex-site[images]'")
+    formats = available_formats()
+    if "avif" not in formats:
+        ctx.report.note("Pillow has no AVIF encoder; shipping WebP and JPEG only")
+    page_layout = layout.Layout(ctx.document.html, ctx.stylesheet)
+
+    jobs: list[_Job] = []
+    for element, source in found:
+        with Image.open(source) as image:
+            if getattr(image, "is_animated", False):
+                continue  # animated GIFs are handled by the media stage
+            width, height = image.size
+            if image.getexif().get(_ORIENTATION) in _QUARTER_TURNS:
+                width, height = height, width
+        slots = {viewport: page_layout.box_width(element, viewport) for viewport, _dpr in REPORT_VIEWPORTS}
+        widest = max(page_layout.box_width(element, viewport) for viewport in range(320, 2561, 8))
+        sizes = layout.sizes_attribute(page_layout, element)
+        jobs.append(_Job(element, source, width, height, sizes, slots, math.ceil(widest * MAX_DPR)))
+
+    renditions = {
+        id(job): [
+            Rendition(w, fmt, config.image_quality[fmt])
+            for fmt in formats
+            for w in _widths(job.width, job.needed, config.image_widths)
+        ]
+        for job in jobs
+    }
+    encoded = _encode_all(ctx, [(job.source, rendition) for job in jobs for rendition in renditions[id(job)]])
+
+    report_rows = []
+    for job in jobs:
+        original = job.element.get("src")
+        candidates: dict[str, list[tuple[int, str, int]]] = {}
+        # The name the files are written under, so the report row matches them.
+        stem = slugify(Path(job.source.name).stem[:24])
+        for rendition in renditions[id(job)]:
+            data = encoded[(job.source, rendition)]
+            content_type, extension = FORMATS[rendition.format]
+            path = ctx.emit(
+                f"{stem}-{rendition.width}w{extension}",
+                data,
+                content_type=content_type,
+                report=False,
+            )
+            candidates.setdefault(rendition.format, []).append((rendition.width, ctx.url(path), len(data)))
+        # One row per source image: its size against every rendition written for it.
+        written = sum(size for files in candidates.values() for _width, _url, size in files)
+        ctx.report.record(
+            f"{config.assets_dir}/{stem}-*w ({len(renditions[id(job)])} renditions)",
+            job.source.stat().st_size,
+            written,
+        )
+        _rewrite(job, candidates)
+        ctx.discard(original)
+        report_rows.append((job, candidates))
+
+    if jobs:
+        _ensure_picture_rule(ctx.stylesheet)
+        ctx.manifest["images"] = _bytes_report(ctx, report_rows)
+
+
+def _encode_all(ctx: BuildContext, work: list[tuple[Path, Rendition]]) -> dict[tuple[Path, Rendition], bytes]:
+    """Encode every ``(source, rendition)`` pair, from the cache where possible."""
+    config = ctx.config
+    cache = open_cache(config)
+    digests: dict[Path, str] = {}
+    encoded: dict[tuple[Path, Rendition], bytes] = {}
+    pending: dict[tuple[Path, Rendition], Optional[str]] = {}
+    for source, rendition in dict.fromkeys(work):
+        key = None
+        if cache is not None:
+            if source not in digests:
+                digests[source] = file_digest(source)
+            key = cache_key(digests[source], {"transform": "image", **asdict(rendition)})
+            data = cache.get(key)
+            if data is not None:
+                encoded[(source, rendition)] = data
+                continue
+        pending[(source, rendition)] = key
+
+    # Widest renditions first, so the pool does not end on one big AVIF.
+    order = sorted(pending, key=lambda item: (-item[1].width, item[1].format != "avif"))
+    workers = min(worker_count(config.jobs), len(order)) or 1
+    busy = 0.0
+    started = time.perf_counter()
+
+    def store(item: tuple[Path, Rendition], data: bytes, seconds: float) -> None:
+        nonlocal busy
+        encoded[item] = data
+        busy += seconds
+        if cache is not None:
+            cache.put(pending[item], data, seconds=seconds)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_encode_timed, *item): item for item in order}
+            for future in as_completed(futures):
+                store(futures[future], *future.result())
+    else:
+        for item in order:
+            store(item, *_encode_timed(*item))
+    wall = time.perf_counter() - started
+
+    if order:
+        ctx.report.stat(f"images: encoded {len(order)} renditions in {wall:.2f} s on {workers} worker(s) ({busy:.2f} s CPU)")
+    if cache is not None:
+        cache.evict()
+        stats = cache.stats
+        # Cached CPU seconds spread over the pool we would otherwise have used.
+        saved = stats.seconds_saved / worker_count(config.jobs)
+        ctx.report.stat(
+            f"image cache: {stats.hits} hits, {stats.misses} misses ({stats.hit_rate:.1%} hit rate), "
+            f"~{saved:.2f} s wall-clock saved"
+        )
+        if stats.evicted:
+            ctx.report.stat(f"image cache: evicted {stats.evicted} entries ({stats.evicted_bytes:,} B)")
+    return encoded
+
+
+def _widths(source_width: int, needed: int, configured: tuple[int, ...]) -> list[int]:
+    """Configured widths below what the layout can use, plus one that covers it."""
+    limit = min(source_width, needed)
+    widths = {w for w in configured if w < limit}
+    widths.add(min(source_width, next((w for w in configured if w >= limit), limit)))
+    return sorted(widths)
+
+
+def load_mapping(directory: Optional[Path]) -> dict[str, str]:
+    if directory is None:
+        return {}
+    index = directory / "images.json"
+    if not index.is_file():
+        return {}
+    try:
+        return json.loads(index.read_text(encoding="utf-8"))
+    except ValueError as exc:
+        raise BuildError(f"{index}: {exc}") from exc
+
+
+def find_source(ctx: BuildContext, src: str, mapping: dict[str, str]) -> Optional[Path]:
+    """The local file behind an ``<img src>``, if there is one."""
+    directory = ctx.config.images_dir
+    candidates = []
+    if src in ctx.sources:
+        candidates.append(ctx.sources[src])
+    if directory is not None:
+        if src in mapping:
+            candidates.append(directory / mapping[src])
+        name = posixpath.basename(urls.local_path(src))
+        if name:
+            candidates.append(directory / name)
+    if urls.is_local(src):
+        candidates.append(ctx.config.source_dir / urls.local_path(src))
+    return next((path for path in candidates if path.is_file()), None)
+
+
+def _srcset(entries: list[tuple[int, str, int]]) -> str:
+    return ", ".join(f"{url} {width}w" for width, url, _size in entries)
+
+
+def _rewrite(job: _Job, candidates: dict[str, list[tuple[int, str, int]]]) -> None:
+    element = job.element
+    picture = html.Element("picture")
+    for fmt in ("avif", "webp"):
+        if fmt in candidates:
+            picture.append(
+                html.Element(
+                    "source",
+                    {"type": FORMATS[fmt][0], "srcset": _srcset(candidates[fmt]), "sizes": job.sizes},
+                )
+            )
+    element.replace_with(picture)
+    fallback = candidates["jpeg"]
+    element.set("src", fallback[len(fallback) // 2][1])
+    element.set("srcset", _srcset(fallback))
+    element.set("sizes", job.sizes)
+    element.set("width", str(job.width))
+    element.set("height", str(job.height))
+    picture.append(element)
+
+
+def _ensure_picture_rule(sheet: css.Stylesheet) -> None:
+    """Keep layout identical by taking the new ``<picture>`` boxes out of it."""
+    for rule, _parents in sheet.walk():
+        if isinstance(rule, css.StyleRule) and rule.selectors == ["picture"]:
+            return
+    sheet.rules.append(css.StyleRule(["picture"], [css.Declaration("display", "contents")]))
+
+
+def _pick(entries: list[tuple[int, str, int]], needed: float) -> int:
+    for width, _url, size in entries:
+        if width >= needed:
+            return size
+    return entries[-1][2]
+
+
+def _bytes_report(ctx: BuildContext, rows) -> dict:
+    breakpoints = []
+    for viewport, dpr in REPORT_VIEWPORTS:
+        before = after = 0
+        for job, candidates in rows:
+            best = candidates.get("avif") or candidates.get("webp") or candidates["jpeg"]
+            before += job.source.stat().st_size
+            after += _pick(best, job.slots[viewport] * dpr)
+        breakpoints.append({"viewport": viewport, "dpr": dpr, "before": before, "after": after})
+        ctx.report.note(f"images @ {viewport}px x{dpr}: {before:,} B -> {after:,} B")
+    return {"count": len(rows), "breakpoints": breakpoints}
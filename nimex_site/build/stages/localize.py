@@ -0,0 +1,24 @@
+"""Copy files referenced by relative URLs into ``dist/`` under hashed names."""
+
+from __future__ import annotations
+
+import posixpath
+
+from .. import urls
+from ..context import BuildContext, log
+
+
+def run(ctx: BuildContext) -> None:
+    assert ctx.document is not None
+    for element, attr in urls.url_attributes(ctx.document):
+        reference = element.get(attr) or ""
+        if not urls.is_local(reference):
+            continue
+        path = ctx.config.source_dir / urls.local_path(reference)
+        if not path.is_file():
+            log.warning("referenced file %s does not exist; leaving %r untouched", path, reference)
+            ctx.report.note(f"missing local asset: {reference}")
+            continue
+        emitted = ctx.emit(posixpath.basename(urls.local_path(reference)), path.read_bytes())
+        element.set(attr, ctx.url(emitted))
+        ctx.sources[ctx.url(emitted)] = path
@@ -0,0 +1,212 @@
+"""Replace animated GIFs with muted looping video.
+
+An animated GIF is one of the most expensive ways to ship motion: it is
+large, and every frame is decoded on the main thread. Each ``<img>`` whose
+source resolves to an animated GIF (vendored, localized, or found in
+``--images-dir``) is transcoded with ffmpeg to VP9 WebM and H.264 MP4 plus a
+JPEG poster of the first frame, and swapped for
+``<video muted loop playsinline preload=none data-inview>``. A small
+runtime script plays those videos only while they are on screen and leaves
+them on the poster when reduced motion is requested. Stylesheet rules that
+styled the ``img`` are extended to the ``video``.
+
+Outputs go through the build cache. A GIF is kept as it is when its MP4
+(the fallback every browser plays) would not be smaller. Needs Pillow and
+an ffmpeg binary: ``--ffmpeg``, ``ffmpeg`` on ``PATH``, or the one bundled
+with imageio-ffmpeg (the ``media`` extra).
+"""
+
+from __future__ import annotations
+
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from .. import css, html, js, runtime, selectors
+from ..cache import BuildCache, cache_key, file_digest, open_cache
+from ..context import BuildContext, log
+from ..errors import BuildError
+from . import images
+
+try:
+    from PIL import Image
+except ImportError:  # optional: the stage reports a clear error when it has work to do
+    Image = None
+
+try:
+    import imageio_ffmpeg
+except ImportError:  # optional: a system ffmpeg works just as well
+    imageio_ffmpeg = None
+
+# kind -> (content type, extension, ffmpeg output arguments; {crf} is filled in)
+ENCODINGS = {
+    "webm": ("video/webm", ".webm", ["-c:v", "libvpx-vp9", "-crf", "{crf}", "-b:v", "0", "-row-mt", "1"]),
+    "mp4": ("video/mp4", ".mp4", ["-c:v", "libx264", "-crf", "{crf}", "-preset", "slow", "-movflags", "+faststart"]),
+}
+
+# yuv420p needs even dimensions.
+_EVEN = ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p"]
+
+_TRAILING_IMG = re.compile(r"(?<![\w.#-])img(?=[^\s>+~]*$)")
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    config = ctx.config
+    mapping = images.load_mapping(config.images_dir)
+    found = []
+    for element in ctx.document.body.find_all("img"):
+        src = element.get("src") or ""
+        source = images.find_source(ctx, src, mapping) if src else None
+        if source is not None and _is_gif(source):
+            found.append((element, source))
+    if not found:
+        return
+    binary = ffmpeg_binary(config.ffmpeg)
+    if binary is None or Image is None:
+        raise BuildError("transcoding GIFs needs Pillow and ffmpeg: pip install 'nimex-site[media]'")
+
+    cache = open_cache(config)
+    rows = []
+    for element, source in found:
+        with Image.open(source) as image:
+            if not getattr(image, "is_animated", False):
+                continue
+            width, height = image.size
+        outputs = {
+            kind: _transcode_cached(cache, binary, source, kind, config.video_crf.get(kind, 0))
+            for kind in ("webm", "mp4", "poster")
+        }
+        original = source.stat().st_size
+        if len(outputs["mp4"]) >= original:
+            ctx.report.note(f"{source.name}: MP4 would be {len(outputs['mp4']):,} B, GIF is {original:,} B; kept the GIF")
+            continue
+        stem = source.stem[:24]
+        urls = {}
+        for kind in ("webm", "mp4"):
+            content_type, extension, _args = ENCODINGS[kind]
+            path = ctx.emit(
+                f"{stem}{extension}",
+                outputs[kind],
+                content_type=content_type,
+                original_size=original,
+                report=kind == "webm",
+            )
+            urls[kind] = ctx.url(path)
+        urls["poster"] = ctx.url(ctx.emit(f"{stem}-poster.jpg", outputs["poster"], report=False))
+        _extend_img_rules(ctx.stylesheet, element)
+        _replace(element, urls, width, height)
+        ctx.discard(element.get("src"))
+        sizes = {kind: len(data) for kind, data in outputs.items()}
+        shipped = sizes["webm"] + sizes["poster"]
+        ctx.report.note(
+            f"{source.name}: GIF {original:,} B -> WebM {sizes['webm']:,} B / MP4 {sizes['mp4']:,} B "
+            f"+ {sizes['poster']:,} B poster ({1 - shipped / original:.0%} smaller)"
+        )
+        rows.append({"source": source.name, "gif": original, **sizes})
+
+    if rows:
+        _add_script(ctx)
+        ctx.manifest["media"] = rows
+
+
+def ffmpeg_binary(explicit: Optional[str] = None) -> Optional[str]:
+    if explicit:
+        return explicit
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    if imageio_ffmpeg is not None:
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    return None
+
+
+def ffmpeg(binary: str, source: Path, arguments: list[str], extension: str) -> bytes:
+    """Run ``ffmpeg -i source <arguments> out<extension>`` and return the output."""
+    with tempfile.TemporaryDirectory(prefix="nimex-media-") as directory:
+        target = Path(directory) / f"out{extension}"
+        command = [binary, "-v", "error", "-y", "-i", str(source), "-an", *arguments, str(target)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0 or not target.is_file():
+            raise BuildError(f"ffmpeg failed on {source.name}: {result.stderr.strip()[-500:]}")
+        return target.read_bytes()
+
+
+def _transcode(binary: str, source: Path, kind: str, crf: int) -> bytes:
+    if kind == "poster":
+        return ffmpeg(binary, source, ["-frames:v", "1", "-q:v", "3"], ".jpg")
+    _content_type, extension, arguments = ENCODINGS[kind]
+    return ffmpeg(binary, source, _EVEN + [arg.format(crf=crf) for arg in arguments], extension)
+
+
+def _transcode_cached(cache: Optional[BuildCache], binary: str, source: Path, kind: str, crf: int) -> bytes:
+    key = None
+    if cache is not None:
+        key = cache_key(file_digest(source), {"transform": "gif-video", "kind": kind, "crf": crf})
+        data = cache.get(key)
+        if data is not None:
+            return data
+    started = time.perf_counter()
+    data = _transcode(binary, source, kind, crf)
+    log.info("transcoded %s to %s (%d bytes)", source.name, kind, len(data))
+    if cache is not None:
+        cache.put(key, data, seconds=time.perf_counter() - started)
+    return data
+
+
+def _is_gif(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(6) in (b"GIF87a", b"GIF89a")
+
+
+def _replace(element: html.Element, urls: dict[str, str], width: int, height: int) -> None:
+    video = html.Element(
+        "video",
+        {
+            "muted": None,
+            "loop": None,
+            "playsinline": None,
+            "preload": "none",
+            "poster": urls["poster"],
+            "width": str(width),
+            "height": str(height),
+            "data-inview": None,
+        },
+    )
+    for attr in ("id", "class", "style", "title"):
+        if element.get(attr) is not None:
+            video.set(attr, element.get(attr))
+    if element.get("alt"):
+        video.set("aria-label", element.get("alt"))
+    for kind in ("webm", "mp4"):
+        video.append(html.Element("source", {"src": urls[kind], "type": ENCODINGS[kind][0]}))
+    element.replace_with(video)
+
+
+def _extend_img_rules(sheet: Optional[css.Stylesheet], element: html.Element) -> None:
+    """Give the video every rule that styled the image, e.g. ``.image-block video``."""
+    if sheet is None:
+        return
+    for rule, parents in sheet.walk():
+        if not isinstance(rule, css.StyleRule) or any(p.name == "keyframes" for p in parents):
+            continue
+        added = []
+        for selector in rule.selectors:
+            if selectors.parse(selector).compounds[-1].tag != "img" or not selectors.matches(element, selector):
+                continue
+            variant = _TRAILING_IMG.sub("video", selector)
+            if variant not in rule.selectors and variant not in added:
+                added.append(variant)
+        rule.selectors.extend(added)
+
+
+def _add_script(ctx: BuildContext) -> None:
+    source = runtime.script("inview-video.js")
+    text = js.minify(source) if ctx.config.minify else source
+    path = ctx.emit("inview-video.js", text.encode(), original_size=len(source.encode()))
+    ctx.document.body.append(html.Element("script", {"src": ctx.url(path), "defer": None}))
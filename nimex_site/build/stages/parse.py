@@ -0,0 +1,25 @@
+"""Read the source page and parse its document and inline stylesheet."""
+
+from __future__ import annotations
+
+from .. import css, html
+from ..context import BuildContext
+from ..errors import BuildError
+
+
+def run(ctx: BuildContext) -> None:
+    try:
+        ctx.source_text = ctx.config.source.read_text(encoding="utf-8")
+    except OSError as exc:
+        raise BuildError(f"cannot read {ctx.config.source}: {exc}") from exc
+    ctx.document = html.parse(ctx.source_text)
+
+    styles = [el for el in ctx.document.head.find_all("style")]
+    if len(styles) > 1:
+        raise BuildError("expected at most one inline <style> in <head>")
+    if styles:
+        ctx.style_element = styles[0]
+        try:
+            ctx.stylesheet = css.parse(styles[0].text)
+        except css.CSSSyntaxError as exc:
+            raise BuildError(f"inline stylesheet: {exc}") from exc
@@ -0,0 +1,156 @@
+"""Drop stylesheet rules and custom properties that nothing in the page can use.
+
+Every selector is matched against the parsed document. Classes that only
+appear at runtime are taken from the configured allowlist plus whatever the
+inline scripts pass to ``classList.add/toggle/replace``, so slideshow
+states such as ``.slide.is-active`` survive. A selector list is trimmed to
+the selectors that can match; a rule with none left is removed, as are
+``@keyframes`` nobody animates with and custom properties no ``var()``
+reads.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+
+from .. import css, selectors
+from ..context import BuildContext, log
+
+_CLASS_LIST_CALL = re.compile(r"classList\s*\.\s*(?:add|toggle|replace)\s*\(([^)]*)\)")
+_STRING_LITERAL = re.compile(r"""(["'`])([\w\s-]+)\1""")
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.stylesheet is None or ctx.document is None:
+        return
+    before = css.serialize(ctx.stylesheet, minify=True)
+    dynamic = set(ctx.config.dynamic_classes) | script_classes(ctx)
+    assume = frozenset(dynamic)
+    elements = list(ctx.document.html.iter())
+    removed_selectors: list[str] = []
+
+    def can_match(selector: str) -> bool:
+        try:
+            return any(selectors.matches(el, selector, assume) for el in elements)
+        except selectors.SelectorError:
+            log.warning("keeping selector the matcher does not understand: %s", selector)
+            return True
+
+    ctx.stylesheet.rules = _prune_rules(ctx.stylesheet.rules, can_match, removed_selectors)
+    removed_keyframes = _prune_keyframes(ctx.stylesheet)
+    removed_properties = _prune_custom_properties(ctx)
+
+    after = css.serialize(ctx.stylesheet, minify=True)
+    removed_bytes = len(before.encode()) - len(after.encode())
+    summary = {
+        "bytes_before": len(before.encode()),
+        "bytes_after": len(after.encode()),
+        "bytes_removed": removed_bytes,
+        "selectors": removed_selectors,
+        "keyframes": removed_keyframes,
+        "custom_properties": removed_properties,
+        "dynamic_classes": sorted(dynamic),
+    }
+    ctx.manifest["css_prune"] = summary
+    ctx.report.note(
+        f"pruned {removed_bytes:,} B of unused CSS ({len(removed_selectors)} selectors, "
+        f"{len(removed_keyframes)} keyframes, {len(removed_properties)} custom properties)"
+    )
+    if ctx.config.prune_history is not None:
+        with ctx.config.prune_history.open("a", encoding="utf-8") as history:
+            history.write(json.dumps({"source": str(ctx.config.source), **summary}, sort_keys=True) + "\n")
+
+
+def script_classes(ctx: BuildContext) -> set[str]:
+    """Class names the inline scripts add to elements at runtime."""
+    found: set[str] = set()
+    for script in ctx.document.find_all("script"):
+        for call in _CLASS_LIST_CALL.finditer(script.text):
+            for _quote, names in _STRING_LITERAL.findall(call.group(1)):
+                found.update(names.split())
+    return found
+
+
+def _prune_rules(rules: list[css.Node], can_match, removed: list[str]) -> list[css.Node]:
+    kept: list[css.Node] = []
+    for rule in rules:
+        if isinstance(rule, css.StyleRule):
+            live = [s for s in rule.selectors if can_match(s)]
+            removed.extend(s for s in rule.selectors if s not in live)
+            if live:
+                rule.selectors = live
+                kept.append(rule)
+        elif rule.rules is not None and rule.name != "keyframes":
+            rule.rules = _prune_rules(rule.rules, can_match, removed)
+            if rule.rules:
+                kept.append(rule)
+        else:
+            kept.append(rule)
+    return kept
+
+
+def _prune_keyframes(sheet: css.Stylesheet) -> list[str]:
+    used = css.animation_names(sheet.rules)
+    removed = []
+
+    def keep(rules: list[css.Node]) -> list[css.Node]:
+        out = []
+        for rule in rules:
+            if isinstance(rule, css.AtRule) and rule.name == "keyframes":
+                if rule.prelude not in used:
+                    removed.append(rule.prelude)
+                    continue
+            elif isinstance(rule, css.AtRule) and rule.rules is not None:
+                rule.rules = keep(rule.rules)
+            out.append(rule)
+        return out
+
+    sheet.rules = keep(sheet.rules)
+    return removed
+
+
+def _prune_custom_properties(ctx: BuildContext) -> list[str]:
+    """Remove ``--*`` declarations until every remaining one is referenced."""
+    sheet = ctx.stylesheet
+    # References from outside the stylesheet never go away.
+    external: set[str] = set()
+    for element in ctx.document.iter():
+        if element.get("style"):
+            external |= css.var_references(element.get("style"))
+        if element.tag == "script":
+            external |= set(re.findall(r"""["'`](--[\w-]+)["'`]""", element.text))
+
+    removed: list[str] = []
+    while True:
+        referenced = set(external)
+        for rule, _parents in sheet.walk():
+            for decl in getattr(rule, "declarations", None) or []:
+                referenced |= css.var_references(decl.value)
+        dropped = False
+        for rule, _parents in sheet.walk():
+            declarations = getattr(rule, "declarations", None)
+            if not declarations:
+                continue
+            for decl in list(declarations):
+                if decl.name.startswith("--") and decl.name not in referenced:
+                    declarations.remove(decl)
+                    removed.append(decl.name)
+                    dropped = True
+        if not dropped:
+            break
+    sheet.rules = _drop_empty(sheet.rules)
+    return removed
+
+
+def _drop_empty(rules: list[css.Node]) -> list[css.Node]:
+    out = []
+    for rule in rules:
+        if isinstance(rule, css.StyleRule) and not rule.declarations:
+            continue
+        if isinstance(rule, css.AtRule) and rule.rules is not None and rule.name != "keyframes":
+            rule.rules = _drop_empty(rule.rules)
+            if not rule.rules:
+                continue
+        out.append(rule)
+    return out
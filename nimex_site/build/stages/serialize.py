@@ -0,0 +1,12 @@
+"""Serialize the rewritten document as ``index.html``."""
+
+from __future__ import annotations
+
+from .. import html
+from ..context import BuildContext
+
+
+def run(ctx: BuildContext) -> None:
+    assert ctx.document is not None
+    markup = html.serialize(ctx.document, minify=ctx.config.minify)
+    ctx.emit("index.html", markup.encode(), original_size=len(ctx.source_text.encode()), hashed=False)
@@ -0,0 +1,97 @@
+"""Generate a service worker for the offline shell and instant repeat visits.
+
+Two pipeline stages live here. :func:`register`, before the page is
+serialized, adds the small ``sw-register.js`` that registers ``/sw.js``
+after ``load``. :func:`run`, once ``index.html`` exists, writes ``sw.js``
+itself from ``runtime/service-worker.js`` with the build's data prepended:
+
+* ``version``: the build id (see :func:`..write.build_id`), also recorded
+  as the manifest's ``"build"`` id, so every deploy installs a new
+  precache and deletes the old one when it activates;
+* ``precache``: the page, every stylesheet, script and font, and the
+  images matched by ``service_worker_precache`` (the logo), in all their
+  formats and widths. Hashed URLs are flagged so a new version copies
+  them from the old cache instead of downloading them again;
+* ``runtime``: every candidate URL of the images matched by
+  ``service_worker_runtime`` (``.gallery``/``.image-block``), served
+  stale-while-revalidate.
+
+Video is left to the network. ``sw.js`` is never hashed and is served
+with ``must-revalidate`` so browsers see a new version on the next visit.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Iterator
+
+from .. import html, js, runtime, selectors, urls
+from ..context import BuildContext
+from .write import build_id
+
+SW_NAME = "sw.js"
+
+_SCRIPT_TYPES = ("application/javascript", "text/javascript")
+
+
+def register(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    source = runtime.script("sw-register.js")
+    text = js.minify(source) if ctx.config.minify else source
+    path = ctx.emit("sw-register.js", text.encode(), original_size=len(source.encode()))
+    ctx.document.body.append(html.Element("script", {"src": ctx.url(path), "defer": None, "data-sw": ctx.url(SW_NAME)}))
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    config = ctx.config
+    version = build_id(ctx.assets.values())
+    ctx.manifest["build"] = {"id": version}
+
+    precache: dict[str, bool] = {"/": False}
+    for asset in ctx.assets.values():
+        if asset.meta.get("encoding"):
+            continue
+        kind = asset.content_type.split(";")[0]
+        if kind == "text/css" or kind in _SCRIPT_TYPES or kind.startswith("font/"):
+            precache[ctx.url(asset.path)] = asset.hashed
+    for url in _image_urls(ctx, config.service_worker_precache):
+        precache[url] = ctx.assets[url.lstrip("/")].hashed
+    runtime_urls = sorted(set(_image_urls(ctx, config.service_worker_runtime)) - set(precache))
+
+    data = {"version": version, "precache": sorted(precache.items()), "runtime": runtime_urls}
+    source = runtime.script("service-worker.js")
+    text = js.minify(source) if config.minify else source
+    body = f"const BUILD={json.dumps(data, separators=(',', ':'))};\n{text}"
+    ctx.emit(SW_NAME, body.encode(), content_type="text/javascript", hashed=False)
+    ctx.manifest["service_worker"] = {
+        "path": SW_NAME,
+        "version": version,
+        "precache": len(precache),
+        "runtime": len(runtime_urls),
+    }
+    precache_bytes = sum(len(ctx.assets[url.lstrip("/") or "index.html"].data) for url in precache)
+    ctx.report.note(
+        f"service worker {version}: {len(precache)} precached files ({precache_bytes:,} B), "
+        f"{len(runtime_urls)} image URLs stale-while-revalidate"
+    )
+
+
+def _image_urls(ctx: BuildContext, selector_list: tuple[str, ...]) -> Iterator[str]:
+    """Every emitted URL an ``<img>`` matched by the selectors may load."""
+    for selector in selector_list:
+        for element in selectors.select(ctx.document.html, selector):
+            elements = [element]
+            parent = element.parent
+            if isinstance(parent, html.Element) and parent.tag == "picture":
+                elements += [child for child in parent.element_children if child.tag == "source"]
+            for candidate in elements:
+                values = [candidate.get("src") or ""]
+                values += [item.split()[0] for item in (candidate.get("srcset") or "").split(",") if item.strip()]
+                for value in values:
+                    if urls.is_remote(value) or not value.startswith("/"):
+                        continue
+                    if value.lstrip("/") in ctx.assets:
+                        yield value
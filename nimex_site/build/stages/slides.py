@@ -0,0 +1,45 @@
+"""Load only the slide shown first; leave the others to the slideshow.
+
+Every hero slide is absolutely positioned over the first, so all of them
+are "in the viewport" and ``loading=lazy`` alone would not hold any back.
+This stage moves the ``src``/``srcset`` of every image matched by
+``slide_images`` except the LCP image (``lcp_selector``) into
+``data-src``/``data-srcset``, on the ``<img>`` and its ``<picture>``
+sources alike. The page's slideshow script puts them back and decodes
+each image in idle time shortly before its slide is shown.
+
+Only the LCP image keeps ``fetchpriority=high``; the deferred ones are
+marked ``loading=lazy`` and ``decoding=async``.
+"""
+
+from __future__ import annotations
+
+from .. import html, selectors
+from ..context import BuildContext
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    config = ctx.config
+    lcp = next(iter(selectors.select(ctx.document.html, config.lcp_selector)), None) if config.lcp_selector else None
+    deferred = 0
+    for image in selectors.select(ctx.document.html, config.slide_images):
+        if image is lcp or image.tag != "img":
+            continue
+        elements = [image]
+        parent = image.parent
+        if isinstance(parent, html.Element) and parent.tag == "picture":
+            elements += [child for child in parent.element_children if child.tag == "source"]
+        for element in elements:
+            for attr in ("src", "srcset"):
+                value = element.get(attr)
+                if value is not None:
+                    element.attrs.pop(attr)
+                    element.set(f"data-{attr}", value)
+        image.attrs.pop("fetchpriority", None)
+        image.set("loading", "lazy")
+        image.set("decoding", "async")
+        deferred += 1
+    if deferred:
+        ctx.report.note(f"deferring {deferred} slide image(s) until shortly before their turn")
@@ -0,0 +1,213 @@
+"""Serve hot-linked third-party assets from our own origin.
+
+Every image on the page, the background video and its poster are
+hot-linked from a different host, so a first visit opens around ten
+connections before anything is painted. This stage fetches each remote URL
+the page references exactly once, through one pooled aiohttp session, into
+a local mirror (``--vendor-dir``), and rewrites the references to hashed
+copies under ``/assets/``.
+
+The mirror keeps ``files/<sha256 prefix>/<name>`` plus ``mirror.json``
+mapping every URL to the stored file's hash, content type and size. Later
+builds only fetch URLs the mirror does not have yet (``--vendor-refresh``
+refetches everything), so signed links that have since expired keep
+building. ``--vendor-upstream`` sends every request to a stand-in origin as
+``<upstream>/<host><path>?<query>`` for offline builds and tests.
+
+Google Fonts are left to the fonts stage. Needs aiohttp (the ``vendor``
+extra) whenever something has to be fetched.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import mimetypes
+import posixpath
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+from .. import urls
+from ..context import BuildContext, log
+from ..errors import BuildError
+from .fonts import GOOGLE_FONT_HOSTS
+
+try:
+    import aiohttp
+except ImportError:  # optional: the stage reports a clear error when it has to fetch
+    aiohttp = None
+
+MIRROR_INDEX = "mirror.json"
+USER_AGENT = "nimex-build (asset mirror)"
+
+# Per-origin connection cap on top of the overall pool size.
+CONNECTIONS_PER_HOST = 4
+
+_GENERIC_TYPES = frozenset({"", "application/octet-stream", "binary/octet-stream"})
+
+# (offset, magic bytes, content type) for servers that do not say.
+_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+)
+
+
+@dataclass
+class MirrorEntry:
+    path: str
+    sha256: str
+    content_type: str
+    size: int
+    fetched: str
+
+
+class Mirror:
+    """The on-disk URL -> file mirror and its ``mirror.json`` index."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.entries: dict[str, MirrorEntry] = {}
+        index = root / MIRROR_INDEX
+        if index.is_file():
+            try:
+                raw = json.loads(index.read_text(encoding="utf-8"))
+                self.entries = {url: MirrorEntry(**entry) for url, entry in raw.items()}
+            except (ValueError, TypeError) as exc:
+                raise BuildError(f"{index}: {exc}") from exc
+
+    def get(self, url: str) -> Optional[MirrorEntry]:
+        entry = self.entries.get(url)
+        if entry is None or not (self.root / entry.path).is_file():
+            return None
+        return entry
+
+    def add(self, url: str, data: bytes, content_type: str) -> MirrorEntry:
+        digest = hashlib.sha256(data).hexdigest()
+        path = posixpath.join("files", digest[:16], _file_name(url, content_type))
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        entry = MirrorEntry(
+            path, digest, content_type, len(data), datetime.now(timezone.utc).isoformat(timespec="seconds")
+        )
+        self.entries[url] = entry
+        return entry
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = {url: asdict(entry) for url, entry in sorted(self.entries.items())}
+        (self.root / MIRROR_INDEX).write_text(json.dumps(index, indent=2) + "\n", encoding="utf-8")
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None:
+        return
+    config = ctx.config
+    references = []
+    for element, attr in urls.url_attributes(ctx.document):
+        reference = element.get(attr) or ""
+        if not urls.is_remote(reference):
+            continue
+        url = "https:" + reference if reference.startswith("//") else reference
+        if urlsplit(url).hostname in GOOGLE_FONT_HOSTS:
+            continue
+        references.append((element, attr, url))
+    if not references:
+        return
+
+    mirror = Mirror(config.vendor_dir)
+    wanted = list(dict.fromkeys(url for _element, _attr, url in references))
+    missing = [url for url in wanted if config.vendor_refresh or mirror.get(url) is None]
+    failed: list[str] = []
+    if missing:
+        if aiohttp is None:
+            raise BuildError("fetching remote assets needs aiohttp: pip install 'nimex-site[vendor]'")
+        failed = asyncio.run(_fetch_all(mirror, missing, config.vendor_upstream, config.vendor_concurrency, config.vendor_timeout))
+        mirror.save()
+
+    for element, attr, url in references:
+        entry = mirror.get(url)
+        if entry is None:
+            continue
+        path = mirror.root / entry.path
+        emitted = ctx.emit(posixpath.basename(entry.path), path.read_bytes(), content_type=entry.content_type, source=url)
+        element.set(attr, ctx.url(emitted))
+        ctx.sources[ctx.url(emitted)] = path
+
+    for url in failed:
+        ctx.report.note(f"could not vendor {url}; left hot-linked")
+    hosts = sorted({urlsplit(url).hostname for url in wanted if url not in failed})
+    ctx.report.note(
+        f"vendored {len(wanted) - len(failed)} remote assets from {len(hosts)} origins "
+        f"({len(missing) - len(failed)} fetched, the rest from the mirror)"
+    )
+    ctx.manifest["vendor"] = {
+        "origins": hosts,
+        "fetched": len(missing) - len(failed),
+        "mirrored": len(wanted) - len(failed),
+        "failed": failed,
+    }
+
+
+async def _fetch_all(
+    mirror: Mirror, targets: list[str], upstream: Optional[str], concurrency: int, timeout: float
+) -> list[str]:
+    """Fetch ``targets`` into ``mirror`` over one pooled session; return the URLs that failed."""
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=CONNECTIONS_PER_HOST)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers={"User-Agent": USER_AGENT},
+    ) as session:
+        results = await asyncio.gather(*(_fetch(session, mirror, url, upstream) for url in targets))
+    return [url for url, ok in zip(targets, results) if not ok]
+
+
+async def _fetch(session, mirror: Mirror, url: str, upstream: Optional[str]) -> bool:
+    target = _upstream_url(url, upstream) if upstream else url
+    try:
+        async with session.get(target) as response:
+            response.raise_for_status()
+            data = await response.read()
+            header = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+        log.warning("could not fetch %s: %s", target, exc or type(exc).__name__)
+        return False
+    mirror.add(url, data, _content_type(header, data, url))
+    log.info("fetched %s (%d bytes)", url, len(data))
+    return True
+
+
+def _upstream_url(url: str, upstream: str) -> str:
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{upstream.rstrip('/')}/{parts.netloc}{parts.path}{query}"
+
+
+def _content_type(header: str, data: bytes, url: str) -> str:
+    if header not in _GENERIC_TYPES:
+        return header
+    for offset, magic, content_type in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return content_type
+    if data.lstrip()[:5] in (b"<svg ", b"<?xml"):
+        return "image/svg+xml"
+    return mimetypes.guess_type(urlsplit(url).path)[0] or "application/octet-stream"
+
+
+def _file_name(url: str, content_type: str) -> str:
+    """The URL's file name, with an extension matching ``content_type`` when it lacks one."""
+    name = posixpath.basename(unquote(urlsplit(url).path)) or "asset"
+    if not posixpath.splitext(name)[1]:
+        name += mimetypes.guess_extension(content_type) or ""
+    return name
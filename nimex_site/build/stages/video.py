@@ -0,0 +1,258 @@
+"""Adaptive renditions for the fixed background video.
+
+The page plays a 1080p stock clip behind every section, on every device,
+and dims it with a CSS ``filter`` that the browser re-applies to each
+frame. This stage takes the video matched by ``--background-video``
+(its source must be local, typically vendored), bakes the filter the
+cascade gives it into the pixels, and encodes one WebM and one MP4 per
+configured ``(width, kbps)`` rendition, never upscaling. The poster gets
+the same treatment. The ``filter`` declaration is then dropped.
+
+The markup loses its ``<source>`` children and ``autoplay``. Instead, the
+video carries its renditions in ``data-renditions``, and
+``runtime/background-video.js`` picks one after load from the viewport,
+``navigator.connection`` (``saveData``, 2G) and ``prefers-reduced-motion``.
+Screens narrower than ``video_poster_below`` keep the poster only.
+
+Only ``brightness()``, ``contrast()`` and ``saturate()`` can be baked;
+a video styled with anything else keeps its CSS filter. Needs ffmpeg,
+found like the media stage does.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Optional
+
+from .. import cascade, css, html, js, runtime, selectors
+from ..cache import BuildCache, cache_key, file_digest, open_cache
+from ..context import BuildContext, log
+from ..errors import BuildError
+from .media import ffmpeg, ffmpeg_binary
+
+# Luminance weights the CSS Filter Effects spec uses for saturate().
+_LUMA = (0.213, 0.715, 0.072)
+
+_FUNCTION = re.compile(r"([a-z-]+)\(\s*([^)]*?)\s*\)")
+_STREAM_SIZE = re.compile(r"Stream #.*?Video:.*?, (\d{2,5})x(\d{2,5})")
+
+Matrix = list[list[float]]
+
+
+def run(ctx: BuildContext) -> None:
+    if ctx.document is None or ctx.stylesheet is None:
+        return
+    config = ctx.config
+    videos = selectors.select(ctx.document.html, config.background_video)
+    if not videos:
+        log.info("no element matches %s", config.background_video)
+        return
+    binary = None
+    filters = cascade.possible_values(ctx.document.html, ctx.stylesheet, "filter", inherited=False, states=False)
+    for video in videos:
+        sources = [video] + video.find_all("source")
+        source = next(
+            (ctx.sources[element.get("src")] for element in sources if element.get("src") in ctx.sources), None
+        )
+        if source is None:
+            log.info("background video has no local source; vendor it to get renditions")
+            continue
+        binary = binary or ffmpeg_binary(config.ffmpeg)
+        if binary is None:
+            raise BuildError("background video renditions need ffmpeg: pip install 'nimex-site[media]'")
+
+        css_filter = next(iter(filters.get(video, {""})))
+        transform = color_transform(css_filter) if css_filter not in ("", "none") else None
+        if css_filter not in ("", "none") and transform is None:
+            ctx.report.note(f"background video filter {css_filter!r} cannot be baked; keeping it in CSS")
+            css_filter = ""
+        graph = _filter_graph(transform)
+        _encode_video(ctx, binary, video, source, graph, css_filter)
+        if css_filter:
+            _drop_filter(ctx, video)
+
+
+def color_transform(value: str) -> Optional[tuple[Matrix, list[float]]]:
+    """The affine RGB transform ``(matrix, offset)`` for a CSS filter list.
+
+    Works on 0-1 channel values; returns ``None`` for functions that are not
+    per-pixel colour transforms (``blur()``, ``drop-shadow()``...).
+    """
+    matrix: Matrix = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    offset = [0.0, 0.0, 0.0]
+    consumed = 0
+    for match in _FUNCTION.finditer(value):
+        if value[consumed:match.start()].strip():
+            return None
+        consumed = match.end()
+        name, argument = match.group(1), match.group(2) or "1"
+        if name not in ("brightness", "contrast", "saturate"):
+            return None
+        try:
+            amount = float(argument[:-1]) / 100 if argument.endswith("%") else float(argument)
+        except ValueError:
+            return None
+        if name == "brightness":
+            step, step_offset = _diagonal(amount), [0.0, 0.0, 0.0]
+        elif name == "contrast":
+            step, step_offset = _diagonal(amount), [0.5 - 0.5 * amount] * 3
+        else:
+            step = [
+                [_LUMA[col] + ((1 if col == row else 0) - _LUMA[col]) * amount for col in range(3)] for row in range(3)
+            ]
+            step_offset = [0.0, 0.0, 0.0]
+        # Later functions apply to the output of earlier ones.
+        matrix = _multiply(step, matrix)
+        offset = [sum(step[row][col] * offset[col] for col in range(3)) + step_offset[row] for row in range(3)]
+    if value[consumed:].strip():
+        return None
+    return matrix, offset
+
+
+def _diagonal(amount: float) -> Matrix:
+    return [[amount if row == col else 0.0 for col in range(3)] for row in range(3)]
+
+
+def _multiply(a: Matrix, b: Matrix) -> Matrix:
+    return [[sum(a[row][k] * b[k][col] for k in range(3)) for col in range(3)] for row in range(3)]
+
+
+def _filter_graph(transform: Optional[tuple[Matrix, list[float]]]) -> list[str]:
+    """ffmpeg filters applying ``transform`` (before any scaling)."""
+    if transform is None:
+        return []
+    matrix, offset = transform
+    mixer = ":".join(
+        f"{channel}{source}={matrix[row][col]:.5f}"
+        for row, channel in enumerate("rgb")
+        for col, source in enumerate("rgb")
+    )
+    # lutrgb clips to 0-255, which is where the browser clamps too.
+    lut = ":".join(f"{channel}=val+{offset[row] * 255:.3f}" for row, channel in enumerate("rgb"))
+    return ["format=rgb24", f"colorchannelmixer={mixer}", f"lutrgb={lut}"]
+
+
+def _probe(binary: str, source: Path) -> tuple[int, int]:
+    result = subprocess.run([binary, "-hide_banner", "-i", str(source)], capture_output=True, text=True)
+    match = _STREAM_SIZE.search(result.stderr)
+    if match is None:
+        raise BuildError(f"cannot read video dimensions of {source.name}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def _encode(binary: str, source: Path, kind: str, graph: list[str], width: int, kbps: int) -> bytes:
+    chain = ",".join(graph + [f"scale='min({width},iw)':-2"])
+    if kind == "poster":
+        return ffmpeg(binary, source, ["-vf", chain, "-frames:v", "1", "-q:v", "3"], ".jpg")
+    chain += ",format=yuv420p"
+    rate = ["-b:v", f"{kbps}k", "-maxrate", f"{kbps * 3 // 2}k", "-bufsize", f"{kbps * 2}k"]
+    if kind == "webm":
+        codec = ["-c:v", "libvpx-vp9", "-row-mt", "1", "-deadline", "good", "-cpu-used", "2"]
+        return ffmpeg(binary, source, ["-vf", chain, *codec, *rate], ".webm")
+    codec = ["-c:v", "libx264", "-preset", "slow", "-profile:v", "high", "-movflags", "+faststart"]
+    return ffmpeg(binary, source, ["-vf", chain, *codec, *rate], ".mp4")
+
+
+def _encode_cached(
+    cache: Optional[BuildCache], binary: str, source: Path, kind: str, graph: list[str], width: int, kbps: int
+) -> bytes:
+    key = None
+    if cache is not None:
+        params = {"transform": "background-video", "kind": kind, "filter": graph, "width": width, "kbps": kbps}
+        key = cache_key(file_digest(source), params)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    started = time.perf_counter()
+    data = _encode(binary, source, kind, graph, width, kbps)
+    log.info("encoded %s %s at %dw (%d bytes)", source.name, kind, width, len(data))
+    if cache is not None:
+        cache.put(key, data, seconds=time.perf_counter() - started)
+    return data
+
+
+def _encode_video(
+    ctx: BuildContext, binary: str, video: html.Element, source: Path, graph: list[str], css_filter: str
+) -> None:
+    config = ctx.config
+    cache = open_cache(config)
+    source_width, source_height = _probe(binary, source)
+    stem = source.stem[:24]
+
+    renditions = []
+    for width, kbps in sorted(config.video_renditions):
+        width = min(width, source_width) // 2 * 2
+        if renditions and renditions[-1]["w"] >= width:
+            continue
+        entry = {"w": width}
+        for kind in ("webm", "mp4"):
+            data = _encode_cached(cache, binary, source, kind, graph, width, kbps)
+            path = ctx.emit(f"{stem}-{width}w.{kind}", data, content_type=f"video/{kind}", report=False)
+            entry[kind] = ctx.url(path)
+            entry[f"{kind}_bytes"] = len(data)
+        renditions.append(entry)
+
+    # The poster is baked from the page's own poster image when there is one.
+    poster_source = ctx.sources.get(video.get("poster") or "", source)
+    poster_width = min(config.video_poster_width, source_width)
+    poster = _encode_cached(cache, binary, poster_source, "poster", graph, poster_width, 0)
+    poster_url = ctx.url(ctx.emit(f"{stem}-poster.jpg", poster, report=False))
+
+    replaced = [element.get("src") for element in [video] + video.find_all("source") if element.get("src")]
+    replaced.append(video.get("poster"))
+    for child in list(video.children):
+        child.remove()
+    for attr in ("autoplay", "src"):
+        video.attrs.pop(attr, None)
+    video.set("poster", poster_url)
+    video.set("preload", "none")
+    video.set("width", str(source_width))
+    video.set("height", str(source_height))
+    video.set("data-poster-below", str(config.video_poster_below))
+    public = [{key: value for key, value in r.items() if not key.endswith("_bytes")} for r in renditions]
+    video.set("data-renditions", json.dumps(public, separators=(",", ":")))
+    for url in replaced:
+        if url:
+            ctx.discard(url)
+    _add_script(ctx)
+
+    original = source.stat().st_size
+    sizes = ", ".join(f"{r['w']}w {r['webm_bytes']:,}/{r['mp4_bytes']:,} B" for r in renditions)
+    ctx.report.note(f"background video {source.name} ({original:,} B): {sizes} (WebM/MP4); poster {len(poster):,} B")
+    ctx.report.note(f"background video below {config.video_poster_below}px: {original:,} B -> {len(poster):,} B (poster only)")
+    ctx.manifest["background_video"] = {
+        "source": source.name,
+        "bytes": original,
+        "filter": css_filter or None,
+        "poster": poster_url,
+        "poster_below": config.video_poster_below,
+        "renditions": renditions,
+    }
+
+
+def _drop_filter(ctx: BuildContext, video: html.Element) -> None:
+    """Remove the now-baked ``filter`` from rules that only style the video."""
+    for rule, parents in ctx.stylesheet.walk():
+        if not isinstance(rule, css.StyleRule) or not any(d.name == "filter" for d in rule.declarations):
+            continue
+        if not any(selectors.matches(video, selector) for selector in rule.selectors):
+            continue
+        targets = {el for selector in rule.selectors for el in selectors.select(ctx.document.html, selector)}
+        if targets - {video}:
+            ctx.report.note(f"{', '.join(rule.selectors)} styles more than the video; its filter stays in CSS")
+            video.set("style", ((video.get("style") or "") + ";filter:none").lstrip(";"))
+            continue
+        rule.declarations = [d for d in rule.declarations if d.name != "filter"]
+
+
+def _add_script(ctx: BuildContext) -> None:
+    source = runtime.script("background-video.js")
+    text = js.minify(source) if ctx.config.minify else source
+    path = ctx.emit("background-video.js", text.encode(), original_size=len(source.encode()))
+    url = ctx.url(path)
+    if not any(script.get("src") == url for script in ctx.document.find_all("script")):
+        ctx.document.body.append(html.Element("script", {"src": url, "defer": None}))
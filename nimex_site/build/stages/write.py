@@ -0,0 +1,76 @@
+"""Write every emitted asset, the manifest and ``_headers`` to ``dist/``."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable
+
+from ..context import BuildContext
+from ..errors import BuildError
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+
+def run(ctx: BuildContext) -> None:
+    out_dir = ctx.config.out_dir
+    _prepare(out_dir, ctx.config.source, clean=ctx.config.clean)
+    for asset in ctx.assets.values():
+        _write(out_dir / asset.path, asset.data)
+
+    # The service worker stage fixes the id first: it is the worker's version.
+    build = ctx.manifest.setdefault("build", {})
+    build.setdefault("id", build_id(ctx.assets.values()))
+    build["created"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    _write(out_dir / "manifest.json", (json.dumps(ctx.manifest, indent=2, sort_keys=True) + "\n").encode())
+    _write(out_dir / "_headers", _headers(ctx).encode())
+
+
+def build_id(assets: Iterable) -> str:
+    """A digest of every file's path and content; precompressed copies add nothing."""
+    digest = hashlib.sha256()
+    for asset in sorted(assets, key=lambda asset: asset.path):
+        if not asset.meta.get("encoding"):
+            digest.update(f"{asset.path}:{asset.hash}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _prepare(out_dir: Path, source: Path, *, clean: bool) -> None:
+    out_dir = out_dir.resolve()
+    if source.resolve().is_relative_to(out_dir):
+        raise BuildError(f"refusing to build into {out_dir}: it contains the source page")
+    if clean and out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _write(target: Path, data: bytes) -> None:
+    """Replace ``target`` atomically; a running server may have the old file mapped."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, target)
+
+
+def _headers(ctx: BuildContext) -> str:
+    """Cache rules in the ``_headers`` format understood by most static CDNs.
+
+    The page's preloads go out as one ``Link`` header, which CDNs that
+    support it turn into a ``103 Early Hints`` response.
+    """
+    links = ctx.manifest.get("early_hints", {}).get("/")
+    lines = [f"/{ctx.config.assets_dir}/*", f"  Cache-Control: {IMMUTABLE}", ""]
+    for page in ("/", "/index.html"):
+        lines.append(page)
+        lines.append(f"  Cache-Control: {REVALIDATE}")
+        if links:
+            lines.append(f"  Link: {', '.join(links)}")
+        lines.append("")
+    if "service_worker" in ctx.manifest:
+        lines += [f"/{ctx.manifest['service_worker']['path']}", f"  Cache-Control: {REVALIDATE}", ""]
+    return "\n".join(lines)
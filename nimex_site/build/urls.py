@@ -0,0 +1,49 @@
+"""Helpers for the URL-bearing attributes of the page."""
+
+from __future__ import annotations
+
+from typing import Iterator
+from urllib.parse import unquote, urlsplit
+
+from . import html
+
+# (tag, attribute) pairs whose value is a single URL.
+URL_ATTRIBUTES = (
+    ("img", "src"),
+    ("source", "src"),
+    ("video", "poster"),
+    ("video", "src"),
+    ("audio", "src"),
+    ("script", "src"),
+    ("link", "href"),
+)
+
+# ``<link>`` relations that point at a fetchable resource.
+_LINK_RELS = frozenset({"stylesheet", "icon", "apple-touch-icon", "manifest", "preload"})
+
+
+def is_local(url: str) -> bool:
+    """True for references that resolve against the source directory."""
+    if not url or url.startswith(("#", "//", "/")):
+        return False
+    parts = urlsplit(url)
+    return not parts.scheme and not parts.netloc
+
+
+def is_remote(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") or url.startswith("//")
+
+
+def local_path(url: str) -> str:
+    return unquote(urlsplit(url).path)
+
+
+def url_attributes(root: html.Element) -> Iterator[tuple[html.Element, str]]:
+    """Yield ``(element, attribute)`` for every URL reference below ``root``."""
+    for element in root.iter():
+        for tag, attr in URL_ATTRIBUTES:
+            if element.tag == tag and element.get(attr):
+                if tag == "link" and not _LINK_RELS & set((element.get("rel") or "").split()):
+                    continue
+                yield element, attr
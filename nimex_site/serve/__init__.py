@@ -0,0 +1,6 @@
+"""ASGI server for the ``dist/`` tree written by :mod:`nimex_site.build`."""
+
+from .app import StaticApp
+from .pagecache import PageApp, PageCache
+
+__all__ = ["PageApp", "PageCache", "StaticApp"]
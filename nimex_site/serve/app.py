@@ -0,0 +1,475 @@
+"""The static ASGI application.
+
+:class:`StaticApp` indexes ``dist/`` once at start-up: every file gets a
+strong ETag from the SHA-256 of its bytes, its ``Content-Type``, and the
+headers the build's ``_headers`` file assigns to its URL. Precompressed
+siblings (``site.css.br``, ``site.css.gz``, ``site.css.zst``) become
+alternative representations with their own ETags; when ``manifest.json``
+has the build's ``"compression"`` record, only the siblings it lists are
+used. Each request then only
+picks a representation by ``Accept-Encoding`` and streams the file; nothing
+is compressed or hashed on the request path, and a resource's files are
+stat-ed at most once per ``watch_interval`` to notice a rebuild.
+
+Small files are served from a bounded in-memory LRU cache
+(:mod:`nimex_site.serve.cache`). Larger ones are never read into Python
+buffers: each is memory-mapped the first time it is sent and responses
+are slices of that mapping, or go through ``sendfile`` when the server
+offers the ASGI zero-copy send extension. Single byte ranges (``Range``/``If-Range``) are answered with
+206 or 416; multi-range requests get the whole representation, which the
+spec allows and players never need.
+
+When the build recorded ``"early_hints"`` for a page, a ``GET`` for it is
+preceded by a ``103 Early Hints`` response carrying the preload ``Link``
+headers, provided the server implements the ASGI early-hint extension
+(Hypercorn does); otherwise the same ``Link`` header from ``_headers`` on
+the 200 response is all the client gets.
+
+Only URLs present in the index are served, which also rules out path
+traversal. Files the build replaces are picked up by the polling above;
+deploy a ``dist/`` with new URLs by restarting (or reloading) the server.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mimetypes
+import mmap
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from ..build.hashing import HASH_LENGTH
+from ..build.stages.write import IMMUTABLE, REVALIDATE
+from .cache import DEFAULT_MAX_BYTES, AssetCache, signature
+from .headers import HeaderRule, headers_for, load_headers
+from .metrics import CONTENT_TYPE as METRICS_TYPE
+from .metrics import Metrics
+
+# Content-coding -> sibling suffix, in server preference order.
+ENCODINGS = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+
+CHUNK_SIZE = 256 * 1024
+METRICS_PATH = "/metrics"
+ETAG_LENGTH = 20
+
+_HASHED_NAME = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.[^./]+$")
+_TEXT_TYPES = frozenset({"application/javascript", "application/json", "image/svg+xml", "application/manifest+json"})
+_SKIP = frozenset({"_headers"})
+
+for _type, _extension in (
+    ("image/avif", ".avif"),
+    ("image/webp", ".webp"),
+    ("font/woff2", ".woff2"),
+    ("video/webm", ".webm"),
+    ("text/javascript", ".js"),
+):
+    mimetypes.add_type(_type, _extension)
+
+
+@dataclass
+class Representation:
+    path: Path
+    size: int
+    etag: str
+    encoding: Optional[str] = None
+    # ``(inode, size, mtime)`` when indexed; see :func:`changed`.
+    signature: tuple[int, int, int] = (0, 0, 0)
+    _view: Optional[memoryview] = field(default=None, repr=False, compare=False)
+
+    def view(self) -> memoryview:
+        """The file's bytes, mapped once and shared by every response.
+
+        The build replaces files rather than rewriting them, so a mapping
+        keeps serving the bytes the index was built from until the
+        resource is re-indexed.
+        """
+        if self._view is None:
+            if self.size == 0:
+                self._view = memoryview(b"")
+            else:
+                with self.path.open("rb") as handle:
+                    self._view = memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+        return self._view
+
+
+@dataclass
+class Resource:
+    content_type: str
+    headers: list[tuple[bytes, bytes]]
+    # Keyed by content-coding; None is the identity representation.
+    representations: dict[Optional[str], Representation] = field(default_factory=dict)
+    # ``Link`` header values to send as 103 Early Hints before the response.
+    early_hints: list[bytes] = field(default_factory=list)
+    # time.monotonic() of the last check for changed files.
+    checked: float = 0.0
+    # The asset class metrics are recorded under.
+    kind: str = "other"
+
+    @property
+    def negotiated(self) -> bool:
+        return len(self.representations) > 1
+
+
+def file_etag(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:ETAG_LENGTH]
+
+
+def content_type(path: Path) -> str:
+    guessed = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if guessed.startswith("text/") or guessed in _TEXT_TYPES:
+        return f"{guessed}; charset=utf-8"
+    return guessed
+
+
+def asset_class(content_type: str) -> str:
+    """``html``, ``css``, ``js``, ``font``, ``image``, ``video`` or ``other``."""
+    kind = content_type.split(";")[0].strip()
+    if kind == "text/html":
+        return "html"
+    if kind == "text/css":
+        return "css"
+    if kind in ("text/javascript", "application/javascript"):
+        return "js"
+    major = kind.split("/")[0]
+    if major in ("font", "image", "video"):
+        return major
+    return "other"
+
+
+def default_cache_control(url: str) -> str:
+    return IMMUTABLE if _HASHED_NAME.search(url) else REVALIDATE
+
+
+def load_manifest(root: Path) -> dict:
+    try:
+        return json.loads((root / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_resource(root: Path, path: Path, rules: list[HeaderRule], manifest: dict) -> Resource:
+    """The resource served for ``path``, a file below ``root``, and its siblings."""
+    url = "/" + path.relative_to(root).as_posix()
+    extra = headers_for(rules, url)
+    page = url
+    if url.endswith("/index.html"):
+        # The directory URL is what gets requested; prefer its rules.
+        page = url[: -len("index.html")]
+        extra = {**extra, **headers_for(rules, page)}
+    extra.setdefault("cache-control", default_cache_control(url))
+    etag = file_etag(path)
+    resource = Resource(
+        content_type(path),
+        [(name.encode("latin-1"), value.encode("latin-1")) for name, value in extra.items()],
+        early_hints=[link.encode("latin-1") for link in manifest.get("early_hints", {}).get(page, ())],
+        checked=time.monotonic(),
+        kind=asset_class(content_type(path)),
+    )
+    stat = path.stat()
+    resource.representations[None] = Representation(path, stat.st_size, f'"{etag}"', signature=signature(stat))
+    compression = manifest.get("compression")
+    listed = None
+    if compression is not None:
+        listed = compression.get(url[1:], {}).get("variants", {})
+    for coding, suffix in ENCODINGS:
+        sibling = path.with_name(path.name + suffix)
+        if (listed is None or coding in listed) and sibling.is_file():
+            stat = sibling.stat()
+            resource.representations[coding] = Representation(
+                sibling, stat.st_size, f'"{etag}-{coding}"', coding, signature(stat)
+            )
+    return resource
+
+
+def build_index(root: Path) -> dict[str, Resource]:
+    """Map every servable URL path below ``root`` to its representations."""
+    rules = load_headers(root)
+    manifest = load_manifest(root)
+    sibling_suffixes = {suffix for _coding, suffix in ENCODINGS}
+    index: dict[str, Resource] = {}
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.name in _SKIP:
+            continue
+        if path.suffix in sibling_suffixes and path.with_suffix("").is_file():
+            continue
+        url = "/" + path.relative_to(root).as_posix()
+        index[url] = load_resource(root, path, rules, manifest)
+        if path.name == "index.html":
+            index[url[: -len("index.html")]] = index[url]
+    return index
+
+
+def changed(resource: Resource) -> bool:
+    """Whether any representation's file was replaced, rewritten or removed."""
+    for representation in resource.representations.values():
+        try:
+            if signature(representation.path.stat()) != representation.signature:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def parse_accept_encoding(value: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(resource: Resource, accept_encoding: str) -> Representation:
+    """The representation the client accepts with the highest q, ties in server order."""
+    if not resource.negotiated or not accept_encoding:
+        return resource.representations[None]
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_quality = resource.representations[None], 0.0
+    for coding, _suffix in ENCODINGS:
+        representation = resource.representations.get(coding)
+        if representation is None:
+            continue
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = representation, quality
+    return best
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """``(start, end)`` (inclusive) for a single ``bytes=`` range.
+
+    Returns ``None`` when the header should be ignored (malformed, another
+    unit, several ranges) and ``(size, size)`` when it is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                return size, size
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if last and end < start:
+        return None
+    if start >= size:
+        return size, size
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """``If-None-Match`` uses the weak comparison function."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class StaticApp:
+    """Serve a built ``dist/`` directory.
+
+    ``cache_bytes`` bounds the in-memory :class:`AssetCache` (0 disables
+    it); every ``watch_interval`` seconds a requested resource's files are
+    stat-ed and, if the build replaced them, re-indexed and evicted. With
+    ``metrics``, requests are recorded and served at ``/metrics``, merged
+    with other workers' through ``metrics_dir``
+    (see :mod:`nimex_site.serve.metrics`).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        cache_bytes: int = DEFAULT_MAX_BYTES,
+        watch_interval: float = 1.0,
+        metrics: bool = True,
+        metrics_dir: Optional[Path] = None,
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.index = build_index(self.root)
+        self.cache = AssetCache(cache_bytes) if cache_bytes > 0 else None
+        self.watch_interval = watch_interval
+        self.metrics = Metrics(metrics_dir, self.cache) if metrics else None
+        # Set while another process takes over; clients are told to reconnect.
+        self.draining = False
+
+    def _revalidate(self, resource: Resource) -> Optional[Resource]:
+        """``resource``, or its replacement if its files changed on disk."""
+        now = time.monotonic()
+        if not self.watch_interval or now - resource.checked < self.watch_interval:
+            return resource
+        resource.checked = now
+        if not changed(resource):
+            return resource
+        if self.cache is not None:
+            for representation in resource.representations.values():
+                self.cache.invalidate(representation.path)
+        source = resource.representations[None].path
+        urls = [url for url, other in self.index.items() if other is resource]
+        if not source.is_file():
+            for url in urls:
+                del self.index[url]
+            return None
+        fresh = load_resource(self.root, source, load_headers(self.root), load_manifest(self.root))
+        for url in urls:
+            self.index[url] = fresh
+        return fresh
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send, self.metrics.flush if self.metrics is not None else None)
+            return
+        if scope["type"] != "http":
+            return
+        if self.draining:
+            send = _closing(send)
+        if self.metrics is None:
+            await self._respond(scope, send)
+            return
+        if scope["path"] == METRICS_PATH:
+            await _plain(send, 200, self.metrics.render(), [(b"cache-control", b"no-store")], content_type=METRICS_TYPE)
+            return
+        started = time.perf_counter()
+        status, resource, representation, sent = await self._respond(scope, send)
+        encoding = saved = None
+        if representation is not None:
+            encoding = representation.encoding
+            if encoding is not None and status == 200:
+                saved = resource.representations[None].size - representation.size
+        kind = resource.kind if resource is not None else "other"
+        self.metrics.record(kind, status, encoding, sent, saved or 0, time.perf_counter() - started)
+
+    async def _respond(self, scope, send) -> tuple[int, Optional[Resource], Optional[Representation], int]:
+        """Answer the request; returns the status, what was served and the body length."""
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await _plain(send, 405, b"method not allowed\n", [(b"allow", b"GET, HEAD")])
+            return 405, None, None, 0
+        resource = self.index.get(scope["path"])
+        if resource is not None:
+            resource = self._revalidate(resource)
+        if resource is None:
+            await _plain(send, 404, b"not found\n")
+            return 404, None, None, 0
+        request_headers = _headers(scope)
+        representation = negotiate(resource, request_headers.get("accept-encoding", ""))
+        headers = [(b"etag", representation.etag.encode()), *resource.headers]
+        if resource.negotiated:
+            headers.append((b"vary", b"Accept-Encoding"))
+        if etag_matches(request_headers.get("if-none-match", ""), representation.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return 304, resource, representation, 0
+        headers.append((b"content-type", resource.content_type.encode()))
+        headers.append((b"accept-ranges", b"bytes"))
+        if representation.encoding is not None:
+            headers.append((b"content-encoding", representation.encoding.encode()))
+        size = representation.size
+        byte_range = None
+        if method == "GET" and "range" in request_headers:
+            # If-Range needs a strong match; we send no Last-Modified, so dates never match.
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range.strip() == representation.etag:
+                byte_range = parse_range(request_headers["range"], size)
+        if byte_range is not None and byte_range[0] >= size:
+            await _plain(send, 416, b"range not satisfiable\n", [(b"content-range", f"bytes */{size}".encode())])
+            return 416, resource, representation, 0
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        headers.append((b"content-length", str(length).encode()))
+        if byte_range is not None:
+            headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        if resource.early_hints and method == "GET" and "http.response.early_hint" in (scope.get("extensions") or {}):
+            await send({"type": "http.response.early_hint", "links": resource.early_hints})
+        status = 206 if byte_range else 200
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if method == "HEAD" or length <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return status, resource, representation, 0
+        if self.cache is not None:
+            cached = self.cache.get(representation.path, representation.signature)
+            if cached is not None:
+                await send({"type": "http.response.body", "body": cached[start : start + length]})
+                return status, resource, representation, length
+        await _send_slice(scope, send, representation, start, length)
+        return status, resource, representation, length
+
+
+def _closing(send):
+    """Ask the client to close the connection after this response."""
+
+    async def wrapped(message) -> None:
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message["headers"], (b"connection", b"close")]}
+        await send(message)
+
+    return wrapped
+
+
+def _headers(scope) -> dict[str, str]:
+    return {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+
+
+async def _send_slice(scope, send, representation: Representation, start: int, length: int) -> None:
+    if "http.response.zerocopysend" in (scope.get("extensions") or {}):
+        with representation.path.open("rb") as handle:
+            await send({"type": "http.response.zerocopysend", "file": handle, "offset": start, "count": length})
+        return
+    view = representation.view()
+    end = start + length
+    for offset in range(start, end, CHUNK_SIZE):
+        stop = min(offset + CHUNK_SIZE, end)
+        await send({"type": "http.response.body", "body": view[offset:stop], "more_body": stop < end})
+
+
+async def _plain(
+    send,
+    status: int,
+    body: bytes,
+    extra: Optional[list[tuple[bytes, bytes]]] = None,
+    *,
+    content_type: bytes = b"text/plain; charset=utf-8",
+) -> None:
+    headers = [
+        (b"content-type", content_type),
+        (b"content-length", str(len(body)).encode()),
+        *(extra or []),
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send, on_shutdown=None) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if on_shutdown is not None:
+                on_shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,219 @@
+"""Benchmark :class:`StaticApp` against a naive file server on this machine.
+
+    python -m nimex_site.serve.bench dist --concurrency 32 --duration 10
+
+Both apps run under uvicorn in child processes and are driven by the same
+aiohttp client, one after the other. Every request is a full download
+with the ``Accept-Encoding`` a current browser sends, cycling through the
+page's HTML, CSS, JS, fonts and images. The naive app is what the page
+used to be fronted with: it opens the file on every request, gzips text
+at level 6 each time and sends weak, mtime-based ETags.
+
+Needs uvicorn and aiohttp (the ``bench`` extra).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import multiprocessing
+import socket
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .app import StaticApp, content_type
+
+try:
+    import aiohttp
+    import uvicorn
+except ImportError:  # optional: main() reports a clear error
+    aiohttp = None
+    uvicorn = None
+
+ACCEPT_ENCODING = "gzip, deflate, br, zstd"
+_BENCH_TYPES = ("text/", "font/", "image/", "application/javascript")
+
+
+class NaiveApp:
+    """Read, compress and describe the file from scratch on every request."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root).resolve()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return
+        path = (self.root / scope["path"].lstrip("/")).resolve()
+        if path.is_dir():
+            path = path / "index.html"
+        if not path.is_relative_to(self.root) or not path.is_file():
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        stat = path.stat()
+        body = path.read_bytes()
+        kind = content_type(path)
+        headers = [(b"content-type", kind.encode()), (b"etag", f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'.encode())]
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"")
+        if b"gzip" in accept and (kind.startswith("text/") or "javascript" in kind or "svg" in kind):
+            body = gzip.compress(body, compresslevel=6)
+            headers.append((b"content-encoding", b"gzip"))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+@dataclass
+class LoadResult:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        return percentile(self.latencies, fraction)
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+async def run_load(
+    base_url: str, paths: Sequence[str], *, concurrency: int, duration: float, headers: Optional[dict] = None
+) -> LoadResult:
+    """Keep ``concurrency`` keep-alive clients busy on ``paths`` for ``duration`` seconds."""
+    result = LoadResult()
+    headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector, headers=headers, auto_decompress=False) as session:
+        deadline = time.perf_counter() + duration
+
+        async def client(offset: int) -> None:
+            index = offset
+            while time.perf_counter() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    async with session.get(path) as response:
+                        body = await response.read()
+                        if response.status >= 400:
+                            result.errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    result.errors += 1
+                    continue
+                result.latencies.append(time.perf_counter() - started)
+                result.bytes += len(body)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def _serve(kind: str, root: str, port: int) -> None:
+    app = StaticApp(Path(root)) if kind == "static" else NaiveApp(Path(root))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error", access_log=False, lifespan="off")
+
+
+def start_server(kind: str, root: Path) -> tuple[multiprocessing.Process, int]:
+    port = free_port()
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(kind, str(root), port), daemon=True)
+    process.start()
+    wait_for_port(port)
+    return process, port
+
+
+def page_paths(root: Path) -> list[str]:
+    """The page's URLs, minus media too large to be representative of a page view."""
+    app = StaticApp(root)
+    return [
+        url
+        for url, resource in app.index.items()
+        if url != "/index.html"
+        and resource.content_type.startswith(_BENCH_TYPES)
+        and resource.representations[None].size <= 1 << 20
+    ]
+
+
+def format_result(name: str, result: LoadResult) -> str:
+    return (
+        f"{name:<8} {result.rate:>9,.0f} req/s  p50 {result.percentile(0.50) * 1000:>7.2f} ms  "
+        f"p99 {result.percentile(0.99) * 1000:>7.2f} ms  {result.bytes / result.elapsed / 1e6:>7.1f} MB/s  "
+        f"errors {result.errors}"
+    )
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"))
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds per server (default: 10)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds first (default: 1)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if aiohttp is None or uvicorn is None:
+        print("bench: error: needs uvicorn and aiohttp: pip install 'nimex-site[bench]'", file=sys.stderr)
+        return 1
+    paths = page_paths(args.root)
+    if not paths:
+        print(f"bench: error: nothing to request in {args.root}", file=sys.stderr)
+        return 1
+    print(f"{len(paths)} URLs, {args.concurrency} connections, {args.duration:g} s per server")
+    results = {}
+    for kind in ("naive", "static"):
+        process, port = start_server(kind, args.root)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            asyncio.run(run_load(base, paths, concurrency=args.concurrency, duration=args.warmup))
+            results[kind] = asyncio.run(run_load(base, paths, concurrency=args.concurrency, duration=args.duration))
+        finally:
+            process.terminate()
+            process.join()
+        print(format_result(kind, results[kind]))
+    naive, static = results["naive"], results["static"]
+    if naive.rate:
+        p99 = static.percentile(0.99) / max(naive.percentile(0.99), 1e-9)
+        print(f"static vs naive: {static.rate / naive.rate:.2f}x throughput, {p99:.2f}x p99 latency")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
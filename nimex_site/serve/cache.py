@@ -0,0 +1,106 @@
+"""A size-bounded, least-recently-used cache of whole files in memory.
+
+Hot assets (the page, the hashed stylesheet, the logo, the first slide)
+and their precompressed siblings are small and requested constantly.
+Holding them as immutable ``bytes`` lets a response be a slice of a
+``memoryview`` with no ``open``/``fstat``/page-fault work at all. Large
+files (the video renditions) bypass the cache and keep streaming from
+their memory mappings.
+
+The cache is per process and never shared: each worker caps its own
+memory with ``max_bytes``. Entries are keyed by file and checked against
+the ``(inode, size, mtime)`` signature the index recorded, so a file that
+was replaced before the app noticed is served from disk rather than
+cached; :meth:`AssetCache.invalidate` drops entries once it has.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 64 << 20
+DEFAULT_MAX_ENTRY_BYTES = 4 << 20
+
+
+def signature(stat: os.stat_result) -> tuple[int, int, int]:
+    """What changes when the build replaces or rewrites a file."""
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Requests for files too large to cache.
+    bypassed: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class AssetCache:
+    """Whole files as ``bytes``, evicted least recently used first."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, *, max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.size = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Path, memoryview] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def fits(self, size: int) -> bool:
+        return 0 < size <= self.max_entry_bytes
+
+    def get(self, path: Path, expected: tuple[int, int, int]) -> Optional[memoryview]:
+        """The contents of ``path`` if it still has signature ``expected``.
+
+        Returns ``None`` for files too large to cache and for files that
+        changed since they were indexed; the caller streams those instead.
+        """
+        if not self.fits(expected[1]):
+            self.stats.bypassed += 1
+            return None
+        view = self._entries.get(path)
+        if view is not None:
+            self._entries.move_to_end(path)
+            self.stats.hits += 1
+            return view
+        self.stats.misses += 1
+        try:
+            with path.open("rb") as handle:
+                if signature(os.fstat(handle.fileno())) != expected:
+                    return None
+                data = handle.read()
+        except OSError:
+            return None
+        if len(data) != expected[1]:
+            return None
+        view = memoryview(data)
+        self._entries[path] = view
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _path, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.stats.evictions += 1
+        return view
+
+    def invalidate(self, path: Path) -> None:
+        view = self._entries.pop(path, None)
+        if view is not None:
+            self.size -= len(view)
+            self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
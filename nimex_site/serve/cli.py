@@ -0,0 +1,96 @@
+"""``nimex-serve``: serve a built ``dist/`` tree over HTTP."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .app import StaticApp
+from .cache import DEFAULT_MAX_BYTES
+from .workers import Supervisor, WorkerOptions
+
+try:
+    import uvicorn
+except ImportError:  # optional: main() reports a clear error
+    uvicorn = None
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nimex-serve", description=__doc__)
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"), help="directory to serve (default: dist)")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8000, help="port to bind (default: %(default)s)")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES >> 20,
+        metavar="MB",
+        help="memory for hot files, per process; 0 disables the cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="how often to check served files for changes; 0 never checks (default: %(default)s)",
+    )
+    parser.add_argument("--no-metrics", dest="metrics", action="store_false", help="do not record or serve /metrics")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        metavar="N",
+        help="run N supervised worker processes sharing the port (SO_REUSEPORT), "
+        "reloading gracefully on SIGHUP or a new build",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=10.0,
+        metavar="SECONDS",
+        help="how long a stopping worker may finish requests in flight (default: %(default)s)",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s: %(message)s")
+    if uvicorn is None:
+        print("nimex-serve: error: serving needs uvicorn: pip install 'nimex-site[serve]'", file=sys.stderr)
+        return 1
+    if not (args.root / "index.html").is_file():
+        print(f"nimex-serve: error: {args.root} has no index.html; run nimex-build first", file=sys.stderr)
+        return 1
+    if args.workers is not None:
+        if args.workers < 1:
+            print("nimex-serve: error: --workers must be at least 1", file=sys.stderr)
+            return 1
+        options = WorkerOptions(
+            args.root.resolve(),
+            host=args.host,
+            port=args.port,
+            cache_bytes=args.cache_size << 20,
+            watch_interval=args.watch_interval,
+            graceful_timeout=args.graceful_timeout,
+            metrics=args.metrics,
+            verbose=args.verbose,
+        )
+        return Supervisor(options, args.workers).run()
+    app = StaticApp(
+        args.root, cache_bytes=args.cache_size << 20, watch_interval=args.watch_interval, metrics=args.metrics
+    )
+    logging.getLogger("nimex_site.serve").info("serving %d URLs from %s", len(app.index), app.root)
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        log_level="info" if args.verbose else "warning",
+        access_log=args.verbose,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    return 0
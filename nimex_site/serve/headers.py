@@ -0,0 +1,49 @@
+"""Read the ``_headers`` file the build writes next to the page.
+
+The format is the one most static CDNs understand: an unindented URL
+pattern (``*`` matches any suffix), followed by indented ``Name: value``
+lines. Every matching block applies in file order, so a later block
+overrides an earlier one for the same header.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class HeaderRule:
+    pattern: str
+    headers: list[tuple[str, str]] = field(default_factory=list)
+
+    def matches(self, path: str) -> bool:
+        if self.pattern.endswith("*"):
+            return path.startswith(self.pattern[:-1])
+        return path == self.pattern
+
+
+def parse_headers(text: str) -> list[HeaderRule]:
+    rules: list[HeaderRule] = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if not line[0].isspace():
+            rules.append(HeaderRule(line.strip()))
+        elif rules and ":" in line:
+            name, value = line.split(":", 1)
+            rules[-1].headers.append((name.strip().lower(), value.strip()))
+    return rules
+
+
+def load_headers(root: Path) -> list[HeaderRule]:
+    path = root / "_headers"
+    return parse_headers(path.read_text(encoding="utf-8")) if path.is_file() else []
+
+
+def headers_for(rules: list[HeaderRule], path: str) -> dict[str, str]:
+    result: dict[str, str] = {}
+    for rule in rules:
+        if rule.matches(path):
+            result.update(rule.headers)
+    return result
@@ -0,0 +1,420 @@
+"""Replay realistic page views against a local server.
+
+    python -m nimex_site.serve.loadgen dist --rate 50 --duration 30
+    python -m nimex_site.serve.loadgen dist --url http://127.0.0.1:8000 -c 200
+
+Unlike :mod:`nimex_site.serve.bench`, which cycles through every URL, each
+simulated visitor here behaves like a browser loading the built page:
+
+1. ``GET /``;
+2. in parallel, over at most six connections: the stylesheets, scripts,
+   fonts and the images above the fold (logo, hero slides) at the
+   ``srcset`` candidate and format a desktop or phone would pick;
+3. with probability ``--scroll``, after a short think time, the images
+   further down (``.image-block``, ``.gallery``) and the inline videos;
+4. on desktop, the background video rendition it would choose, as
+   ``--video-ranges`` consecutive 1 MiB ``Range`` requests; phones get the
+   poster instead.
+
+Every visitor opens fresh connections, as a first visit does. With
+``--rate``, visitors arrive as a Poisson process (open loop) and at most
+``--concurrency`` are in flight; arrivals beyond that are counted as shed.
+Without it, ``--concurrency`` visitors load the page back to back (closed
+loop). The plan comes from ``dist/index.html``; unless ``--url`` is given
+a :class:`StaticApp` is started on ``dist/`` in a child process, so the
+whole run is local and fits in CI: the exit status is 1 when the error
+rate exceeds ``--max-error-rate``.
+
+Needs aiohttp (and uvicorn without ``--url``): the ``bench`` extra.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Sequence
+
+from ..build import html, selectors
+from ..build.config import DEFAULT_CRITICAL_ROOTS
+from .app import asset_class
+from .bench import ACCEPT_ENCODING, aiohttp, percentile, start_server
+
+# What a current browser accepts for images; AVIF is preferred in srcsets.
+IMAGE_TYPES = ("image/avif", "image/webp")
+CONNECTIONS_PER_VIEW = 6
+VIDEO_CHUNK = 1 << 20
+
+_FONT_URL = re.compile(r"url\(\s*['\"]?([^'\")]+\.woff2)['\"]?\s*\)")
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    viewport: int
+    dpr: float
+    weight: float
+    video: bool
+
+
+PROFILES = (
+    Profile("desktop", 1440, 1.0, 0.45, True),
+    Profile("phone", 390, 3.0, 0.55, False),
+)
+
+
+@dataclass
+class Image:
+    src: str
+    # (width, url) for the first source a browser would use, narrowest first.
+    candidates: list[tuple[int, str]] = field(default_factory=list)
+
+    def pick(self, profile: Profile) -> str:
+        # Without layout, assume the image spans half the viewport.
+        wanted = profile.viewport * profile.dpr / 2
+        for width, url in self.candidates:
+            if width >= wanted:
+                return url
+        return self.candidates[-1][1] if self.candidates else self.src
+
+
+@dataclass
+class PagePlan:
+    styles: list[str] = field(default_factory=list)
+    scripts: list[str] = field(default_factory=list)
+    fonts: list[str] = field(default_factory=list)
+    above: list[Image] = field(default_factory=list)
+    below: list[Image] = field(default_factory=list)
+    inline_videos: list[str] = field(default_factory=list)
+    # (width, url) per background video rendition, and its poster.
+    renditions: list[tuple[int, str]] = field(default_factory=list)
+    poster: Optional[str] = None
+
+    def video_for(self, profile: Profile) -> Optional[str]:
+        """The rendition ``background-video.js`` would pick."""
+        wanted = profile.viewport * min(profile.dpr, 1.5)
+        for width, url in self.renditions:
+            if width >= wanted:
+                return url
+        return self.renditions[-1][1] if self.renditions else None
+
+
+def _local(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith("/") and not url.startswith("//")
+
+
+def _parse_srcset(value: str) -> list[tuple[int, str]]:
+    candidates = []
+    for item in value.split(","):
+        parts = item.split()
+        if len(parts) == 2 and parts[1].endswith("w") and parts[1][:-1].isdigit():
+            candidates.append((int(parts[1][:-1]), parts[0]))
+    return sorted(candidates)
+
+
+def _image(element: html.Element) -> Image:
+    image = Image(element.get("src") or "")
+    parent = element.parent
+    sources = []
+    if isinstance(parent, html.Element) and parent.tag == "picture":
+        sources = [child for child in parent.element_children if child.tag == "source"]
+    for source in sources:
+        if source.get("type") in IMAGE_TYPES and source.get("srcset"):
+            image.candidates = _parse_srcset(source.get("srcset"))
+            break
+    else:
+        image.candidates = _parse_srcset(element.get("srcset") or "")
+    image.candidates = [(width, url) for width, url in image.candidates if _local(url)]
+    return image
+
+
+def plan_page(root: Path) -> PagePlan:
+    """What a first visit to ``root/index.html`` downloads, by phase."""
+    document = html.parse((root / "index.html").read_text(encoding="utf-8"))
+    plan = PagePlan()
+    css_text = []
+    for link in document.find_all("link"):
+        rel = (link.get("rel") or "").split()
+        href = link.get("href")
+        if not _local(href):
+            continue
+        if "stylesheet" in rel or ("preload" in rel and link.get("as") == "style"):
+            if href not in plan.styles:
+                plan.styles.append(href)
+                path = root / href.lstrip("/")
+                if path.is_file():
+                    css_text.append(path.read_text(encoding="utf-8", errors="replace"))
+    for style in document.find_all("style"):
+        css_text.append(style.text)
+    for url in _FONT_URL.findall("\n".join(css_text)):
+        if _local(url) and url not in plan.fonts:
+            plan.fonts.append(url)
+    plan.scripts = [script.get("src") for script in document.find_all("script") if _local(script.get("src"))]
+
+    above = {
+        id(element) for selector in DEFAULT_CRITICAL_ROOTS for element in selectors.select(document, selector)
+    }
+    for element in document.find_all("img"):
+        image = _image(element)
+        if not _local(image.src) and not image.candidates:
+            continue
+        in_fold = id(element) in above or any(id(ancestor) in above for ancestor in element.ancestors())
+        (plan.above if in_fold else plan.below).append(image)
+
+    for video in document.find_all("video"):
+        if video.get("data-renditions"):
+            renditions = json.loads(video.get("data-renditions"))
+            plan.renditions = sorted((r["w"], r.get("webm") or r.get("mp4")) for r in renditions)
+            plan.poster = video.get("poster") if _local(video.get("poster")) else None
+            continue
+        source = next((child for child in video.element_children if child.tag == "source" and _local(child.get("src"))), None)
+        if source is not None:
+            plan.inline_videos.append(source.get("src"))
+    return plan
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    bytes: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    statuses: Counter = field(default_factory=Counter)
+    # Time to ``load``: the HTML plus everything above the fold.
+    page_loads: list[float] = field(default_factory=list)
+    views: int = 0
+    failed_views: int = 0
+    shed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return sum(len(samples) for samples in self.latencies.values()) + sum(self.errors.values())
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+
+class Visitor:
+    def __init__(
+        self,
+        base_url: str,
+        plan: PagePlan,
+        profile: Profile,
+        recorder: Recorder,
+        rng: random.Random,
+        scroll: float,
+        video_ranges: int,
+    ) -> None:
+        self.base_url = base_url
+        self.plan = plan
+        self.profile = profile
+        self.recorder = recorder
+        self.rng = rng
+        self.scroll = scroll
+        self.video_ranges = video_ranges
+
+    async def fetch(self, session, path: str, headers: Optional[dict] = None):
+        """The response headers, or ``None`` on an error status or failure."""
+        started = time.perf_counter()
+        try:
+            async with session.get(path, headers=headers) as response:
+                body = await response.read()
+                kind = asset_class(response.headers.get("Content-Type", ""))
+                self.recorder.statuses[response.status] += 1
+                if response.status >= 400:
+                    self.recorder.errors[kind] += 1
+                    return None
+                self.recorder.latencies[kind].append(time.perf_counter() - started)
+                self.recorder.bytes[kind] += len(body)
+                return response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.recorder.errors["network"] += 1
+            return None
+
+    async def view(self) -> None:
+        plan, profile = self.plan, self.profile
+        connector = aiohttp.TCPConnector(limit=CONNECTIONS_PER_VIEW)
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        started = time.perf_counter()
+        async with aiohttp.ClientSession(self.base_url, connector=connector, headers=headers, auto_decompress=False) as session:
+            if await self.fetch(session, "/", {"Accept": "text/html"}) is None:
+                self.recorder.failed_views += 1
+                return
+            above = [*plan.styles, *plan.scripts, *plan.fonts, *(image.pick(profile) for image in plan.above)]
+            if not profile.video and plan.poster:
+                above.append(plan.poster)
+            results = await asyncio.gather(*(self.fetch(session, path) for path in above))
+            self.recorder.page_loads.append(time.perf_counter() - started)
+            ok = all(result is not None for result in results)
+
+            tasks = []
+            if profile.video:
+                tasks.append(self.stream(session))
+            if self.rng.random() < self.scroll:
+                await asyncio.sleep(self.rng.uniform(0.2, 1.5))
+                below = [image.pick(profile) for image in plan.below] + plan.inline_videos
+                tasks.extend(self.fetch(session, path) for path in below)
+            for result in await asyncio.gather(*tasks):
+                ok = ok and result is not None
+        self.recorder.views += 1
+        if not ok:
+            self.recorder.failed_views += 1
+
+    async def stream(self, session):
+        """Buffer the start of the background video the way a player does."""
+        url = self.plan.video_for(self.profile)
+        if url is None:
+            return {}
+        headers = None
+        etag = None
+        for chunk in range(self.video_ranges):
+            request = {"Range": f"bytes={chunk * VIDEO_CHUNK}-{(chunk + 1) * VIDEO_CHUNK - 1}"}
+            if etag:
+                request["If-Range"] = etag
+            headers = await self.fetch(session, url, request)
+            if headers is None or "Content-Range" not in headers:
+                # An error, or the whole file: nothing left to buffer.
+                return headers
+            etag = headers.get("ETag")
+            total = int(headers["Content-Range"].rpartition("/")[2])
+            if (chunk + 1) * VIDEO_CHUNK >= total:
+                break
+        return headers
+
+
+async def run(
+    base_url: str,
+    plan: PagePlan,
+    *,
+    concurrency: int,
+    duration: float,
+    rate: Optional[float] = None,
+    scroll: float = 0.6,
+    video_ranges: int = 2,
+    seed: Optional[int] = None,
+) -> Recorder:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    weights = [profile.weight for profile in PROFILES]
+
+    def visitor() -> Visitor:
+        profile = rng.choices(PROFILES, weights)[0]
+        return Visitor(base_url, plan, profile, recorder, rng, scroll, video_ranges)
+
+    started = time.perf_counter()
+    deadline = started + duration
+    if rate is None:
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                await visitor().view()
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    else:
+        in_flight: set[asyncio.Task] = set()
+        while True:
+            await asyncio.sleep(rng.expovariate(rate))
+            if time.perf_counter() >= deadline:
+                break
+            if len(in_flight) >= concurrency:
+                recorder.shed += 1
+                continue
+            task = asyncio.ensure_future(visitor().view())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    recorder.elapsed = time.perf_counter() - started
+    return recorder
+
+
+def format_report(recorder: Recorder) -> str:
+    elapsed = recorder.elapsed or 1.0
+    lines = [
+        f"{recorder.views:,} page views ({recorder.views / elapsed:,.1f}/s), {recorder.failed_views} failed, "
+        f"{recorder.shed} arrivals shed",
+        f"{recorder.requests:,} requests ({recorder.requests / elapsed:,.0f}/s), "
+        f"{sum(recorder.bytes.values()) / elapsed / 1e6:,.1f} MB/s, error rate {recorder.error_rate:.2%}",
+        f"page load  p50 {percentile(recorder.page_loads, 0.5) * 1000:>8.1f} ms  "
+        f"p95 {percentile(recorder.page_loads, 0.95) * 1000:>8.1f} ms  "
+        f"p99 {percentile(recorder.page_loads, 0.99) * 1000:>8.1f} ms",
+    ]
+    for kind in sorted(set(recorder.latencies) | set(recorder.errors)):
+        samples = recorder.latencies.get(kind, [])
+        lines.append(
+            f"{kind:<9}  p50 {percentile(samples, 0.5) * 1000:>8.1f} ms  p95 {percentile(samples, 0.95) * 1000:>8.1f} ms  "
+            f"p99 {percentile(samples, 0.99) * 1000:>8.1f} ms  {len(samples):>8,} ok  {recorder.errors.get(kind, 0):>5} errors  "
+            f"{recorder.bytes.get(kind, 0) / 1e6:>9,.1f} MB"
+        )
+    if recorder.statuses:
+        lines.append("statuses: " + ", ".join(f"{status} x{count:,}" for status, count in sorted(recorder.statuses.items())))
+    return "\n".join(lines)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.loadgen", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"), help="the built tree to plan page views from")
+    parser.add_argument("--url", help="server to load (default: start one on ROOT)")
+    parser.add_argument("-c", "--concurrency", type=int, default=50, help="page views in flight at most (default: 50)")
+    parser.add_argument("-r", "--rate", type=float, metavar="VIEWS/S", help="open-loop arrival rate (default: closed loop)")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds (default: 10)")
+    parser.add_argument("--scroll", type=float, default=0.6, help="fraction of visitors who scroll down (default: 0.6)")
+    parser.add_argument("--video-ranges", type=int, default=2, help="1 MiB ranges a desktop visitor buffers (default: 2)")
+    parser.add_argument("--seed", type=int, help="random seed for a repeatable mix")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit 1 above this (default: 0.01)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if aiohttp is None:
+        print("loadgen: error: needs aiohttp: pip install 'nimex-site[bench]'", file=sys.stderr)
+        return 1
+    if not (args.root / "index.html").is_file():
+        print(f"loadgen: error: {args.root} has no index.html; run nimex-build first", file=sys.stderr)
+        return 1
+    plan = plan_page(args.root)
+    print(
+        f"plan: {len(plan.styles)} stylesheets, {len(plan.scripts)} scripts, {len(plan.fonts)} fonts, "
+        f"{len(plan.above)} images above the fold, {len(plan.below)} below, {len(plan.inline_videos)} inline videos, "
+        f"{len(plan.renditions)} background video renditions"
+    )
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, port = start_server("static", args.root)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        recorder = asyncio.run(
+            run(
+                base_url,
+                plan,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                rate=args.rate,
+                scroll=args.scroll,
+                video_ranges=args.video_ranges,
+                seed=args.seed,
+            )
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+    print(format_report(recorder))
+    if recorder.error_rate > args.max_error_rate:
+        print(f"loadgen: error rate {recorder.error_rate:.2%} is above {args.max_error_rate:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Request metrics in the Prometheus text format, served at ``/metrics``.
+
+Every response is recorded by asset class (``html``, ``css``, ``js``,
+``font``, ``image``, ``video``, ``other``):
+
+* ``nimex_requests_total{class,status}``;
+* ``nimex_request_duration_seconds{class}``, a histogram with log-linear
+  buckets in the manner of HdrHistogram: :data:`SUB_BUCKETS` per power of
+  two from ~61 µs to 8 s, so every bucket is within 19% of its neighbours
+  at any scale and recording is a ``frexp`` and a list increment;
+* ``nimex_response_bytes_total{class,encoding}`` and
+  ``nimex_responses_total{class,encoding}``, by content-coding (``identity``,
+  ``br``, ``zstd``, ``gzip``), plus ``nimex_compression_saved_bytes_total``;
+* the asset cache's hits, misses, bypasses, evictions, invalidations and
+  size.
+
+Recording takes no locks: a worker runs one event loop, and each worker
+records only its own requests. With ``--workers`` the supervisor gives the
+workers a shared directory; each one writes its totals there at most once
+a second (and on shutdown, and when it serves ``/metrics``), and a scrape,
+whichever worker it reaches, adds its own live totals to the other
+workers' latest files. Files of workers that exited are kept, so counters
+never go backwards when a worker is restarted.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from .cache import AssetCache
+
+CLASSES = ("html", "css", "js", "font", "image", "video", "other")
+SUB_BUCKETS = 4
+# Powers of two spanned by the buckets: 2**-14 s (61 µs) to 2**3 s (8 s).
+MIN_EXPONENT = -13
+MAX_EXPONENT = 3
+BUCKETS = (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS
+FLUSH_INTERVAL = 1.0
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+_GAUGES = frozenset({"bytes", "entries"})
+
+
+def bucket_bounds() -> list[float]:
+    """Upper bound of every bucket, in seconds."""
+    bounds = []
+    for exponent in range(MIN_EXPONENT, MAX_EXPONENT + 1):
+        for sub in range(SUB_BUCKETS):
+            bounds.append(math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent))
+    return bounds
+
+
+BOUNDS = bucket_bounds()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "overflow")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.sum = 0.0
+        # Observations above the last bucket; they only land in +Inf.
+        self.overflow = 0
+
+    def record(self, seconds: float) -> None:
+        self.sum += seconds
+        mantissa, exponent = math.frexp(seconds)
+        # frexp(0.0) is (0.0, 0): zero goes in the first bucket too.
+        if exponent < MIN_EXPONENT or mantissa <= 0:
+            self.counts[0] += 1
+        elif exponent > MAX_EXPONENT:
+            self.overflow += 1
+        else:
+            # mantissa is in [0.5, 1): split that octave into equal steps.
+            sub = min(SUB_BUCKETS - 1, int((mantissa - 0.5) * 2 * SUB_BUCKETS))
+            self.counts[(exponent - MIN_EXPONENT) * SUB_BUCKETS + sub] += 1
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts) + self.overflow
+
+
+class Metrics:
+    """One worker's request metrics."""
+
+    def __init__(self, directory: Optional[Path] = None, cache: Optional[AssetCache] = None) -> None:
+        self.directory = directory
+        self.cache = cache
+        self.requests: Counter = Counter()  # (class, status)
+        self.responses: Counter = Counter()  # (class, encoding)
+        self.bytes: Counter = Counter()  # (class, encoding)
+        self.saved: Counter = Counter()  # class
+        self.latency = {kind: Histogram() for kind in CLASSES}
+        self._flushed = time.monotonic()
+
+    def record(self, kind: str, status: int, encoding: Optional[str], sent: int, saved: int, seconds: float) -> None:
+        self.requests[kind, status] += 1
+        if sent:
+            coding = encoding or "identity"
+            self.responses[kind, coding] += 1
+            self.bytes[kind, coding] += sent
+            if saved:
+                self.saved[kind] += saved
+        self.latency[kind].record(seconds)
+        if self.directory is not None and time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self) -> dict:
+        cache = self.cache.stats if self.cache is not None else None
+        return {
+            "requests": [[kind, status, n] for (kind, status), n in self.requests.items()],
+            "responses": [[kind, coding, n] for (kind, coding), n in self.responses.items()],
+            "bytes": [[kind, coding, n] for (kind, coding), n in self.bytes.items()],
+            "saved": dict(self.saved),
+            "latency": {
+                kind: {"counts": h.counts, "sum": h.sum, "overflow": h.overflow} for kind, h in self.latency.items()
+            },
+            "cache": {
+                "hits": cache.hits if cache else 0,
+                "misses": cache.misses if cache else 0,
+                "bypassed": cache.bypassed if cache else 0,
+                "evictions": cache.evictions if cache else 0,
+                "invalidations": cache.invalidations if cache else 0,
+                "bytes": self.cache.size if self.cache is not None else 0,
+                "entries": len(self.cache) if self.cache is not None else 0,
+            },
+        }
+
+    def flush(self) -> None:
+        """Publish this worker's totals for the other workers' scrapes."""
+        self._flushed = time.monotonic()
+        if self.directory is None:
+            return
+        target = self.directory / f"{os.getpid()}.json"
+        temporary = target.with_name(f".{target.name}.tmp")
+        temporary.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(temporary, target)
+
+    def collect(self) -> dict:
+        """This worker's live totals plus every other worker's latest file."""
+        merged = self.snapshot()
+        if self.directory is None:
+            return merged
+        self.flush()
+        own = f"{os.getpid()}.json"
+        for path in self.directory.glob("*.json"):
+            if path.name == own:
+                continue
+            try:
+                other = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            _merge(merged, other, alive=_alive(path.stem))
+        return merged
+
+    def render(self) -> bytes:
+        return exposition(self.collect()).encode()
+
+
+def _alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(into: dict, other: dict, *, alive: bool) -> None:
+    """Add ``other``'s counters to ``into``; its gauges too if it is still running."""
+    for name in ("requests", "responses", "bytes"):
+        totals = Counter({tuple(row[:2]): row[2] for row in into[name]})
+        for row in other.get(name, []):
+            totals[tuple(row[:2])] += row[2]
+        into[name] = [[*key, n] for key, n in totals.items()]
+    for kind, n in other.get("saved", {}).items():
+        into["saved"][kind] = into["saved"].get(kind, 0) + n
+    for kind, histogram in other.get("latency", {}).items():
+        mine = into["latency"].setdefault(kind, {"counts": [0] * BUCKETS, "sum": 0.0, "overflow": 0})
+        mine["counts"] = [a + b for a, b in zip(mine["counts"], histogram["counts"])]
+        mine["sum"] += histogram["sum"]
+        mine["overflow"] += histogram.get("overflow", 0)
+    for name, value in other.get("cache", {}).items():
+        if alive or name not in _GAUGES:
+            into["cache"][name] = into["cache"].get(name, 0) + value
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+def exposition(data: dict) -> str:
+    lines = [
+        "# HELP nimex_requests_total Requests served, by asset class and status.",
+        "# TYPE nimex_requests_total counter",
+    ]
+    for kind, status, n in sorted(data["requests"]):
+        lines.append(f"nimex_requests_total{_labels(**{'class': kind, 'status': status})} {n}")
+
+    lines += [
+        "# HELP nimex_request_duration_seconds Time from request to last body byte handed to the server.",
+        "# TYPE nimex_request_duration_seconds histogram",
+    ]
+    for kind in CLASSES:
+        histogram = data["latency"].get(kind)
+        if histogram is None or not (any(histogram["counts"]) or histogram["overflow"]):
+            continue
+        cumulative = 0
+        for bound, n in zip(BOUNDS, histogram["counts"]):
+            cumulative += n
+            lines.append(f"nimex_request_duration_seconds_bucket{_labels(**{'class': kind, 'le': f'{bound:.6g}'})} {cumulative}")
+        total = cumulative + histogram["overflow"]
+        lines.append(f"nimex_request_duration_seconds_bucket{_labels(**{'class': kind, 'le': '+Inf'})} {total}")
+        lines.append(f"nimex_request_duration_seconds_sum{_labels(**{'class': kind})} {histogram['sum']:.6f}")
+        lines.append(f"nimex_request_duration_seconds_count{_labels(**{'class': kind})} {total}")
+
+    lines += [
+        "# HELP nimex_responses_total Responses with a body, by asset class and content-coding.",
+        "# TYPE nimex_responses_total counter",
+    ]
+    for kind, coding, n in sorted(data["responses"]):
+        lines.append(f"nimex_responses_total{_labels(**{'class': kind, 'encoding': coding})} {n}")
+    lines += [
+        "# HELP nimex_response_bytes_total Body bytes sent, by asset class and content-coding.",
+        "# TYPE nimex_response_bytes_total counter",
+    ]
+    for kind, coding, n in sorted(data["bytes"]):
+        lines.append(f"nimex_response_bytes_total{_labels(**{'class': kind, 'encoding': coding})} {n}")
+    lines += [
+        "# HELP nimex_compression_saved_bytes_total Bytes not sent thanks to precompressed representations.",
+        "# TYPE nimex_compression_saved_bytes_total counter",
+    ]
+    for kind, n in sorted(data["saved"].items()):
+        lines.append(f"nimex_compression_saved_bytes_total{_labels(**{'class': kind})} {n}")
+
+    cache = data["cache"]
+    for name, help_text in (
+        ("hits", "Responses served from the in-memory asset cache."),
+        ("misses", "Cacheable responses read from disk into the cache."),
+        ("bypassed", "Responses for files too large to cache."),
+        ("evictions", "Files evicted to stay within the cache size."),
+        ("invalidations", "Cached files dropped because they changed on disk."),
+    ):
+        lines += [
+            f"# HELP nimex_cache_{name}_total {help_text}",
+            f"# TYPE nimex_cache_{name}_total counter",
+            f"nimex_cache_{name}_total {cache[name]}",
+        ]
+    lines += [
+        "# HELP nimex_cache_bytes Bytes held in the asset cache, summed over workers.",
+        "# TYPE nimex_cache_bytes gauge",
+        f"nimex_cache_bytes {cache['bytes']}",
+        "# HELP nimex_cache_entries Files held in the asset cache, summed over workers.",
+        "# TYPE nimex_cache_entries gauge",
+        f"nimex_cache_entries {cache['entries']}",
+    ]
+    return "\n".join(lines) + "\n"
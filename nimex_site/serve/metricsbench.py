@@ -0,0 +1,84 @@
+"""Measure what recording metrics costs per request.
+
+    python -m nimex_site.serve.metricsbench dist --requests 200000
+
+Drives :class:`StaticApp` in-process, without sockets or an HTTP server,
+through the page's URLs (as :mod:`nimex_site.serve.bench` picks them),
+once with metrics off and once with them on, alternating rounds so drift
+affects both alike. Without the network in the way, the difference is the
+whole recording cost: it reports microseconds per request for each, the
+overhead, and the cost of :meth:`Metrics.record` alone.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .app import StaticApp
+from .bench import ACCEPT_ENCODING, page_paths
+from .metrics import Metrics
+
+_HEADERS = [(b"accept-encoding", ACCEPT_ENCODING.encode())]
+
+
+async def _drive(app: StaticApp, paths: list[str], requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message) -> None:
+        pass
+
+    scopes = [{"type": "http", "method": "GET", "path": path, "headers": _HEADERS} for path in paths]
+    started = time.perf_counter()
+    for number in range(requests):
+        await app(scopes[number % len(scopes)], receive, send)
+    return time.perf_counter() - started
+
+
+def time_record(samples: int) -> float:
+    """Seconds per :meth:`Metrics.record` call."""
+    metrics = Metrics()
+    started = time.perf_counter()
+    for number in range(samples):
+        metrics.record("image", 200, None, 48_213, 0, 0.0004 + number % 97 * 1e-5)
+    return (time.perf_counter() - started) / samples
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.metricsbench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"))
+    parser.add_argument("-n", "--requests", type=int, default=100_000, help="requests per configuration (default: 100000)")
+    parser.add_argument("--rounds", type=int, default=5, help="alternating rounds (default: 5)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    paths = page_paths(args.root)
+    if not paths:
+        print(f"metricsbench: error: nothing to request in {args.root}", file=sys.stderr)
+        return 1
+    apps = {"off": StaticApp(args.root, metrics=False), "on": StaticApp(args.root, metrics=True)}
+    per_round = max(1, args.requests // args.rounds)
+    totals = {name: 0.0 for name in apps}
+    for name, app in apps.items():
+        asyncio.run(_drive(app, paths, len(paths)))  # warm the asset caches
+    for _round in range(args.rounds):
+        for name, app in apps.items():
+            totals[name] += asyncio.run(_drive(app, paths, per_round))
+    count = per_round * args.rounds
+    off, on = (totals[name] / count * 1e6 for name in ("off", "on"))
+    print(f"{len(paths)} URLs, {count:,} requests per configuration")
+    print(f"metrics off  {off:7.2f} µs/request")
+    print(f"metrics on   {on:7.2f} µs/request  (+{on - off:.2f} µs, {(on - off) / off:+.1%})")
+    print(f"Metrics.record alone: {time_record(count) * 1e6:.2f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
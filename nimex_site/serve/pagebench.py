@@ -0,0 +1,154 @@
+"""Show that a burst of requests for an expired page renders it once.
+
+    python -m nimex_site.serve.pagebench dist --requests 1000
+
+Puts :class:`PageApp` in front of :class:`StaticApp` with a stand-in
+renderer: it reads the built page and takes ``--render-ms`` to do so, the
+cost a template render would have. Driving the app in-process, it renders
+the page once, lets the page expire and then:
+
+* **stale**: sends ``--requests`` concurrent requests inside the
+  stale-while-revalidate window. All are answered with the old page at
+  once and one background render replaces it;
+* **expired**: lets the page expire past the stale window too and sends
+  the same burst. Every request waits for the same single render;
+* **deploy**: rewrites ``manifest.json`` with a new build id, as a deploy
+  does, and sends the burst again: the cache purges and renders once.
+
+Each phase reports renders, latency percentiles and how many responses
+were identical to the rendered page. The exit status is 1 if any phase
+rendered more than once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .app import StaticApp
+from .pagecache import Key, PageApp, PageCache
+
+LOCALES = ("en-GB", "en-US")
+
+
+class Clock:
+    """time.monotonic(), plus however far the benchmark has skipped ahead."""
+
+    def __init__(self) -> None:
+        self.skipped = 0.0
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.skipped
+
+
+async def burst(app: PageApp, requests: int) -> tuple[list[float], list[bytes]]:
+    """``requests`` concurrent GETs for ``/``; their latencies and bodies."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-language", b"en-GB,en;q=0.8")],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def one() -> tuple[float, bytes]:
+        body = bytearray()
+
+        async def send(message) -> None:
+            if message["type"] == "http.response.body":
+                body.extend(message["body"])
+
+        started = time.perf_counter()
+        await app(dict(scope), receive, send)
+        return time.perf_counter() - started, bytes(body)
+
+    results = await asyncio.gather(*(one() for _ in range(requests)))
+    return [latency for latency, _body in results], [body for _latency, body in results]
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _run(root: Path, requests: int, render_seconds: float, ttl: float, stale: float) -> bool:
+    page = (root / "index.html").read_bytes()
+    clock = Clock()
+
+    async def render(key: Key) -> bytes:
+        if key[0] != "/":
+            raise LookupError(key[0])
+        await asyncio.sleep(render_seconds)
+        return page
+
+    cache = PageCache(render, ttl=ttl, stale=stale, root=root, watch_interval=0.0, clock=clock)
+    app = PageApp(cache, StaticApp(root, metrics=False), locales=LOCALES)
+    await burst(app, 1)
+
+    ok = True
+    for phase in ("stale", "expired", "deploy"):
+        if phase == "stale":
+            clock.skipped += ttl + stale / 2
+        elif phase == "expired":
+            clock.skipped += ttl + stale
+        else:
+            manifest = json.loads((root / "manifest.json").read_text(encoding="utf-8"))
+            manifest.setdefault("build", {})["id"] = f"bench-{time.time_ns():x}"
+            (root / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+        renders = cache.stats.renders
+        latencies, bodies = await burst(app, requests)
+        # The background render of the stale phase finishes after the burst.
+        await asyncio.sleep(render_seconds * 2)
+        rendered = cache.stats.renders - renders
+        ok = ok and rendered == 1
+        print(
+            f"{phase:<8} {requests} requests  renders {rendered}  "
+            f"p50 {_percentile(latencies, 0.5) * 1000:7.2f} ms  p99 {_percentile(latencies, 0.99) * 1000:7.2f} ms  "
+            f"max {max(latencies) * 1000:7.2f} ms  mean {statistics.fmean(latencies) * 1000:7.2f} ms  "
+            f"identical {sum(body == page for body in bodies)}"
+        )
+    stats = cache.stats
+    print(
+        f"hits {stats.hits}, stale {stats.stale}, misses {stats.misses}, coalesced {stats.coalesced}, "
+        f"renders {stats.renders}, purges {stats.purges}"
+    )
+    return ok
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.pagebench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"))
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="concurrent requests per phase (default: 1000)")
+    parser.add_argument("--render-ms", type=float, default=50.0, help="simulated render time (default: 50)")
+    parser.add_argument("--ttl", type=float, default=1.0, help="seconds a page is fresh (default: 1)")
+    parser.add_argument("--stale", type=float, default=30.0, help="seconds it is then served stale (default: 30)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if not (args.root / "index.html").is_file():
+        print(f"pagebench: error: no index.html in {args.root}", file=sys.stderr)
+        return 1
+    # The deploy phase rewrites manifest.json: work on a copy.
+    with tempfile.TemporaryDirectory() as scratch:
+        root = Path(scratch) / "dist"
+        shutil.copytree(args.root, root)
+        ok = asyncio.run(_run(root, args.requests, args.render_ms / 1000, args.ttl, args.stale))
+    if not ok:
+        print("pagebench: error: a burst rendered the page more than once", file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""A micro-cache for HTML rendered per request.
+
+Today ``index.html`` is written once by the build and served as a file.
+If pages are instead rendered from templates or content data, a render
+per request would be wasted work: the output changes once per deploy or
+content edit, not per visitor. :class:`PageCache` keeps each rendered page
+for a short time, keyed by ``(path, locale, variant)``:
+
+* within ``ttl`` seconds of its render a page is served as is;
+* for ``stale`` seconds after that it is still served at once, while one
+  background render replaces it (stale-while-revalidate). If that render
+  fails, the old page keeps being served until the stale window ends;
+* after that, or for a page not rendered yet, the request waits for a
+  render. Concurrent requests for the same key wait for the same render,
+  so a burst after expiry renders once, however many requests it holds;
+* with ``root``, the build id in ``manifest.json`` is checked at most once
+  per ``watch_interval``; a new deploy purges every page, and renders that
+  started before the purge are handed to their waiters but not kept.
+
+:class:`PageApp` puts this in front of an ASGI app: ``GET``/``HEAD``
+requests for pages (``/``, ``*/`` and ``*.html``) are answered from the
+cache, the locale negotiated from ``Accept-Language``; everything else is
+passed on, typically to :class:`~nimex_site.serve.app.StaticApp`.
+
+Everything runs on the worker's event loop, so no locks are needed; with
+``--workers`` each worker keeps its own cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Sequence
+
+from ..build.stages.write import REVALIDATE
+from .app import _headers, _plain, etag_matches, load_manifest, parse_accept_encoding
+from .cache import signature
+
+Key = tuple[str, str, str]  # (path, locale, variant)
+Render = Callable[[Key], Awaitable[bytes]]
+
+DEFAULT_TTL = 1.0
+DEFAULT_STALE = 30.0
+DEFAULT_MAX_ENTRIES = 1024
+
+
+@dataclass
+class Page:
+    body: bytes
+    etag: str
+    # time.monotonic() when the render finished.
+    rendered: float
+
+
+@dataclass
+class PageCacheStats:
+    hits: int = 0
+    stale: int = 0
+    misses: int = 0
+    # Requests that waited for a render another request had started.
+    coalesced: int = 0
+    renders: int = 0
+    errors: int = 0
+    purges: int = 0
+
+
+@dataclass
+class _Entry:
+    page: Optional[Page] = None
+    # The render in flight for this key, if any.
+    pending: Optional[asyncio.Task] = None
+
+
+class PageCache:
+    """Rendered pages, kept ``ttl`` seconds and served stale ``stale`` more.
+
+    ``render`` is called with the key and returns the page's bytes, or
+    raises :class:`LookupError` for a page that does not exist; failed
+    renders are not kept. At most ``max_entries`` pages are kept; the least
+    recently used go first.
+    """
+
+    def __init__(
+        self,
+        render: Render,
+        *,
+        ttl: float = DEFAULT_TTL,
+        stale: float = DEFAULT_STALE,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        root: Optional[Path] = None,
+        watch_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.render = render
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.root = Path(root) if root is not None else None
+        self.watch_interval = watch_interval
+        self.clock = clock
+        self.stats = PageCacheStats()
+        self.build: Optional[str] = None
+        self._entries: OrderedDict[Key, _Entry] = OrderedDict()
+        self._checked = float("-inf")
+        self._manifest_signature: Optional[tuple[int, int, int]] = None
+        if self.root is not None:
+            self._check_deploy(self.clock())
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.page is not None)
+
+    async def get(self, key: Key) -> Page:
+        """The page for ``key``, rendering it only if no usable copy exists."""
+        now = self.clock()
+        self._check_deploy(now)
+        entry = self._entries.get(key)
+        if entry is None:
+            # Evicts only once the page exists, so a failed render (a 404)
+            # never pushes a real page out.
+            entry = self._entries[key] = _Entry()
+        else:
+            self._entries.move_to_end(key)
+        page = entry.page
+        if page is not None:
+            age = now - page.rendered
+            if age < self.ttl:
+                self.stats.hits += 1
+                return page
+            if age < self.ttl + self.stale:
+                self.stats.stale += 1
+                if entry.pending is None:
+                    self._start(key, entry)
+                return page
+        if entry.pending is None:
+            self.stats.misses += 1
+            self._start(key, entry)
+        else:
+            self.stats.coalesced += 1
+        # shield(): one waiter being cancelled must not cancel everyone's render.
+        return await asyncio.shield(entry.pending)
+
+    def purge(self) -> None:
+        """Drop every page; renders already running are not kept."""
+        self._entries.clear()
+        self.stats.purges += 1
+
+    def _start(self, key: Key, entry: _Entry) -> None:
+        entry.pending = asyncio.ensure_future(self._render(key, entry))
+        # A failed background render has no waiter to see its error.
+        entry.pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _render(self, key: Key, entry: _Entry) -> Page:
+        self.stats.renders += 1
+        try:
+            body = await self.render(key)
+        except Exception:
+            self.stats.errors += 1
+            if entry.page is None and self._entries.get(key) is entry:
+                del self._entries[key]
+            raise
+        finally:
+            entry.pending = None
+        page = Page(body, f'"{hashlib.sha256(body).hexdigest()[:20]}"', self.clock())
+        # Not if the entry was purged or evicted meanwhile: waiters get the
+        # page, but it may be from the previous deploy.
+        if self._entries.get(key) is entry:
+            entry.page = page
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def _check_deploy(self, now: float) -> None:
+        if self.root is None or now - self._checked < self.watch_interval:
+            return
+        self._checked = now
+        try:
+            current = signature((self.root / "manifest.json").stat())
+        except OSError:
+            current = None
+        if current == self._manifest_signature:
+            return
+        self._manifest_signature = current
+        build = load_manifest(self.root).get("build", {}).get("id")
+        if build != self.build:
+            if self.build is not None:
+                self.purge()
+            self.build = build
+
+
+def negotiate_locale(accept_language: str, locales: Sequence[str]) -> str:
+    """The best of ``locales`` for an ``Accept-Language`` header; the first by default.
+
+    A range matches a locale exactly or as its prefix (``en`` matches
+    ``en-GB``), and a locale matches a range's language (``en-GB`` is
+    acceptable for ``en-US``) at a lower rank than an exact match.
+    """
+    if not locales:
+        return ""
+    # The same comma-separated, q-weighted grammar as Accept-Encoding.
+    weights = parse_accept_encoding(accept_language)
+    best, best_rank = locales[0], (0.0, 0)
+    for locale in locales:
+        lowered = locale.lower()
+        for language_range, weight in weights.items():
+            if weight <= 0:
+                continue
+            if language_range == lowered or lowered.startswith(language_range + "-"):
+                rank = (weight, 2)
+            elif lowered.split("-")[0] == language_range.split("-")[0]:
+                rank = (weight, 1)
+            else:
+                continue
+            if rank > best_rank:
+                best, best_rank = locale, rank
+    return best
+
+
+def is_page(path: str) -> bool:
+    return path.endswith("/") or path.endswith(".html")
+
+
+class PageApp:
+    """Serve pages from a :class:`PageCache`; pass other requests to ``app``.
+
+    ``variant``, if given, maps the ASGI scope to the variant part of the
+    key (an experiment arm, say); keep the number of distinct values small.
+    """
+
+    def __init__(
+        self,
+        cache: PageCache,
+        app,
+        *,
+        locales: Sequence[str] = (),
+        variant: Optional[Callable[[dict], str]] = None,
+    ) -> None:
+        self.cache = cache
+        self.app = app
+        self.locales = tuple(locales)
+        self.variant = variant
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not is_page(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        request_headers = _headers(scope)
+        locale = negotiate_locale(request_headers.get("accept-language", ""), self.locales)
+        variant = self.variant(scope) if self.variant is not None else ""
+        try:
+            page = await self.cache.get((scope["path"], locale, variant))
+        except LookupError:
+            await _plain(send, 404, b"not found\n")
+            return
+        age = max(0, int(self.cache.clock() - page.rendered))
+        headers = [
+            (b"etag", page.etag.encode()),
+            (b"cache-control", REVALIDATE.encode()),
+            (b"age", str(age).encode()),
+        ]
+        if self.locales:
+            headers.append((b"vary", b"Accept-Language"))
+            headers.append((b"content-language", locale.encode()))
+        if etag_matches(request_headers.get("if-none-match", ""), page.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers.append((b"content-type", b"text/html; charset=utf-8"))
+        headers.append((b"content-length", str(len(page.body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else page.body})
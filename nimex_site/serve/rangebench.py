@@ -0,0 +1,166 @@
+"""Load-test byte-range streaming the way video players use it.
+
+    python -m nimex_site.serve.rangebench dist --viewers 300 --duration 20
+
+Starts :class:`StaticApp` under uvicorn in a child process and simulates
+``--viewers`` concurrent players, each fetching the largest video in
+``dist/`` (or ``--path``) as consecutive ``Range: bytes=a-b`` requests of
+``--chunk`` bytes with ``If-Range`` set to the ETag, looping at the end.
+Reports range requests per second, payload throughput, latency
+percentiles, failures, and the server's peak resident set size split into
+anonymous memory and file-backed pages (shared page cache from the
+memory-mapped files, not Python buffers).
+
+Needs uvicorn and aiohttp (the ``bench`` extra); RSS sampling needs Linux.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .app import StaticApp
+from .bench import LoadResult, start_server
+
+try:
+    import aiohttp
+except ImportError:  # optional: main() reports a clear error
+    aiohttp = None
+
+
+def read_rss(pid: int) -> dict[str, int]:
+    """``VmRSS``/``RssAnon``/``RssFile`` in bytes from ``/proc``; empty elsewhere."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as status:
+            for line in status:
+                name, _, rest = line.partition(":")
+                if name in ("VmRSS", "RssAnon", "RssFile"):
+                    values[name] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+async def _sample_rss(pid: int, peak: dict[str, int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        for name, value in read_rss(pid).items():
+            peak[name] = max(peak.get(name, 0), value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_viewers(
+    base_url: str, path: str, *, viewers: int, duration: float, chunk: int, pid: Optional[int] = None
+) -> tuple[LoadResult, dict[str, int]]:
+    result = LoadResult()
+    peak: dict[str, int] = {}
+    stop = asyncio.Event()
+    connector = aiohttp.TCPConnector(limit=viewers)
+    async with aiohttp.ClientSession(base_url, connector=connector, auto_decompress=False) as session:
+        async with session.head(path) as response:
+            size = int(response.headers["Content-Length"])
+            etag = response.headers["ETag"]
+            if response.headers.get("Accept-Ranges") != "bytes":
+                raise RuntimeError(f"{path} is not served with Accept-Ranges: bytes")
+        deadline = time.perf_counter() + duration
+
+        async def viewer(number: int) -> None:
+            # Stagger the players through the file.
+            offset = (number * chunk * 7) % size
+            while time.perf_counter() < deadline:
+                end = min(offset + chunk, size) - 1
+                started = time.perf_counter()
+                try:
+                    async with session.get(
+                        path, headers={"Range": f"bytes={offset}-{end}", "If-Range": etag}
+                    ) as response:
+                        body = await response.read()
+                        ok = response.status == 206 and len(body) == end - offset + 1
+                except aiohttp.ClientError:
+                    ok = False
+                if not ok:
+                    result.errors += 1
+                    continue
+                result.latencies.append(time.perf_counter() - started)
+                result.bytes += len(body)
+                offset = end + 1 if end + 1 < size else 0
+
+        sampler = asyncio.ensure_future(_sample_rss(pid, peak, stop)) if pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*(viewer(number) for number in range(viewers)))
+        result.elapsed = time.perf_counter() - started
+        stop.set()
+        if sampler is not None:
+            await sampler
+    return result, peak
+
+
+def largest_video(root: Path) -> Optional[str]:
+    app = StaticApp(root)
+    videos = [
+        (resource.representations[None].size, url)
+        for url, resource in app.index.items()
+        if resource.content_type.startswith("video/")
+    ]
+    return max(videos)[1] if videos else None
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.rangebench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"))
+    parser.add_argument("--path", help="URL to stream (default: the largest video)")
+    parser.add_argument("-n", "--viewers", type=int, default=200)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("--chunk", type=int, default=1 << 20, help="bytes per range request (default: 1 MiB)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if aiohttp is None:
+        print("rangebench: error: needs uvicorn and aiohttp: pip install 'nimex-site[bench]'", file=sys.stderr)
+        return 1
+    path = args.path or largest_video(args.root)
+    if path is None:
+        print(f"rangebench: error: no video in {args.root}; pass --path", file=sys.stderr)
+        return 1
+    process, port = start_server("static", args.root)
+    try:
+        idle = read_rss(process.pid)
+        result, peak = asyncio.run(
+            run_viewers(
+                f"http://127.0.0.1:{port}",
+                path,
+                viewers=args.viewers,
+                duration=args.duration,
+                chunk=args.chunk,
+                pid=process.pid,
+            )
+        )
+    finally:
+        process.terminate()
+        process.join()
+    print(f"{path}: {args.viewers} viewers, {args.chunk:,} B ranges, {args.duration:g} s")
+    print(
+        f"{result.rate:,.0f} range req/s  {result.bytes / result.elapsed / 1e6:,.1f} MB/s  "
+        f"p50 {result.percentile(0.5) * 1000:.1f} ms  p99 {result.percentile(0.99) * 1000:.1f} ms  "
+        f"errors {result.errors}"
+    )
+    if peak:
+        mib = 1 << 20
+        print(
+            f"server RSS: idle {idle.get('VmRSS', 0) / mib:.1f} MiB, peak {peak.get('VmRSS', 0) / mib:.1f} MiB "
+            f"(anon {peak.get('RssAnon', 0) / mib:.1f} MiB, file-backed {peak.get('RssFile', 0) / mib:.1f} MiB)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
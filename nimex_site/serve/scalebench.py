@@ -0,0 +1,140 @@
+"""Measure how throughput scales with ``nimex-serve --workers``.
+
+    python -m nimex_site.serve.scalebench dist --workers 1,2,4 --duration 10
+
+For each worker count, runs ``nimex-serve --workers N`` in a child process
+and drives it with ``--clients`` load-generating processes (the same page
+mix and keep-alive clients as :mod:`nimex_site.serve.bench`, split evenly).
+Reports requests per second, speedup over the first worker count, parallel
+efficiency (speedup divided by the worker ratio) and latency percentiles.
+
+The clients need cores too: on a machine with C cores, keep workers plus
+clients at or below C, or near-linear scaling cannot show.
+
+Needs uvicorn and aiohttp (the ``bench`` extra) and Linux.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .bench import LoadResult, aiohttp, free_port, page_paths, run_load, uvicorn
+
+
+def _client(base_url: str, paths: list[str], concurrency: int, duration: float) -> LoadResult:
+    return asyncio.run(run_load(base_url, paths, concurrency=concurrency, duration=duration))
+
+
+def merge(results: Sequence[LoadResult]) -> LoadResult:
+    merged = LoadResult()
+    for result in results:
+        merged.latencies.extend(result.latencies)
+        merged.errors += result.errors
+        merged.bytes += result.bytes
+        merged.elapsed = max(merged.elapsed, result.elapsed)
+    return merged
+
+
+def start_workers(root: Path, workers: int) -> tuple[subprocess.Popen, int]:
+    """``nimex-serve --workers N`` on a free port, once every worker is up."""
+    port = free_port()
+    log = tempfile.TemporaryFile("w+")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "nimex_site.serve", str(root), "--workers", str(workers), "--port", str(port)],
+        stderr=log,
+    )
+    # The supervisor logs one line once all of them are listening.
+    deadline = time.monotonic() + 120
+    while process.poll() is None and time.monotonic() < deadline:
+        log.seek(0)
+        if "serving" in log.read():
+            return process, port
+        time.sleep(0.1)
+    process.kill()
+    log.seek(0)
+    raise RuntimeError(f"nimex-serve --workers {workers} did not start:\n{log.read()}")
+
+
+def measure(
+    root: Path, paths: list[str], workers: int, *, clients: int, concurrency: int, duration: float, warmup: float
+) -> LoadResult:
+    process, port = start_workers(root, workers)
+    base = f"http://127.0.0.1:{port}"
+    per_client = max(1, concurrency // clients)
+    try:
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            if warmup:
+                pool.starmap(_client, [(base, paths, per_client, warmup)] * clients)
+            return merge(pool.starmap(_client, [(base, paths, per_client, duration)] * clients))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m nimex_site.serve.scalebench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", nargs="?", type=Path, default=Path("dist"))
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=lambda text: [int(n) for n in text.split(",")],
+        metavar="N,N,...",
+        help="worker counts to compare (default: 1, 2, 4 ... up to half the cores)",
+    )
+    parser.add_argument("--clients", type=int, help="load-generating processes (default: half the cores)")
+    parser.add_argument("-c", "--concurrency", type=int, default=64, help="connections in total (default: 64)")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds per worker count (default: 10)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds first (default: 1)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if aiohttp is None or uvicorn is None:
+        print("scalebench: error: needs uvicorn and aiohttp: pip install 'nimex-site[bench]'", file=sys.stderr)
+        return 1
+    cores = len(os.sched_getaffinity(0))
+    half = max(1, cores // 2)
+    counts = args.workers or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= half]
+    clients = args.clients or half
+    if max(counts) + clients > cores:
+        print(f"scalebench: warning: {max(counts)} workers + {clients} clients on {cores} cores; scaling will flatten")
+    paths = page_paths(args.root)
+    if not paths:
+        print(f"scalebench: error: nothing to request in {args.root}", file=sys.stderr)
+        return 1
+    print(f"{len(paths)} URLs, {args.concurrency} connections from {clients} clients, {args.duration:g} s per run")
+    first: Optional[LoadResult] = None
+    for workers in counts:
+        result = measure(
+            args.root,
+            paths,
+            workers,
+            clients=clients,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+        )
+        first = first or result
+        speedup = result.rate / first.rate if first.rate else 0.0
+        efficiency = speedup / (workers / counts[0])
+        print(
+            f"{workers:>3} workers {result.rate:>9,.0f} req/s  {speedup:>5.2f}x  efficiency {efficiency:>4.0%}  "
+            f"p50 {result.percentile(0.5) * 1000:>7.2f} ms  p99 {result.percentile(0.99) * 1000:>7.2f} ms  "
+            f"errors {result.errors}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
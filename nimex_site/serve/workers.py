@@ -0,0 +1,310 @@
+"""Serve with several shared-nothing worker processes on one port.
+
+    nimex-serve dist --workers 4
+
+The supervisor (the process ``nimex-serve`` runs in) never serves requests.
+It starts ``--workers`` child processes that each index ``dist/`` into their
+own :class:`StaticApp`, with their own asset cache, and bind their own
+listening socket to the same address with ``SO_REUSEPORT``. The kernel then
+spreads new connections across the workers; nothing is shared between them
+and there is no accept lock.
+
+The supervisor:
+
+* restarts a worker that exits without being told to, waiting longer
+  (up to :data:`MAX_RESTART_DELAY`) while it keeps dying on start-up;
+* reloads gracefully on ``SIGHUP`` or when ``manifest.json`` in ``dist/``
+  gets a new build id: a new generation of workers is started, and only
+  once every one of them has indexed the tree and is listening are the old
+  workers drained. ``SIGUSR1`` makes a worker close its listening socket
+  and answer with ``Connection: close``, so keep-alive clients move to the
+  new generation on their next request; :data:`DRAIN_PERIOD` later (past
+  the keep-alive timeout) it gets ``SIGTERM`` and finishes the requests in
+  flight, up to ``--graceful-timeout`` seconds. If the new generation fails
+  to start, the old one keeps serving and the same build is tried again
+  after a delay that doubles with each failure (up to
+  :data:`MAX_RESTART_DELAY`), or at once when the manifest changes;
+* stops every worker the same graceful way on ``SIGTERM`` or ``SIGINT``.
+
+Needs Linux (or another system with ``SO_REUSEPORT`` load balancing).
+Connections still in a draining worker's accept queue when it closes its
+socket are reset by the kernel; at the usual accept rates that queue is
+empty.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Optional
+
+from .app import StaticApp, load_manifest
+from .cache import DEFAULT_MAX_BYTES
+
+try:
+    import uvicorn
+except ImportError:  # optional: nimex-serve reports a clear error
+    uvicorn = None
+
+log = logging.getLogger("nimex_site.serve")
+
+POLL_INTERVAL = 0.2
+READY_TIMEOUT = 120.0
+MAX_RESTART_DELAY = 30.0
+# A worker that dies sooner than this after starting is crashing on start-up.
+STARTUP_GRACE = 5.0
+# Longer than uvicorn's keep-alive timeout, so idle connections close first.
+DRAIN_PERIOD = 6.0
+
+
+@dataclass(frozen=True)
+class WorkerOptions:
+    root: Path
+    host: str = "127.0.0.1"
+    port: int = 8000
+    cache_bytes: int = DEFAULT_MAX_BYTES
+    watch_interval: float = 1.0
+    graceful_timeout: float = 10.0
+    metrics: bool = True
+    # Where workers publish their metrics for each other's scrapes.
+    metrics_dir: Optional[Path] = None
+    verbose: bool = False
+
+
+@dataclass
+class Worker:
+    process: multiprocessing.Process
+    ready: object  # multiprocessing.Event
+    started: float = field(default_factory=time.monotonic)
+    # When a draining worker gets SIGTERM, then SIGKILL if it is still running.
+    terminate_at: Optional[float] = None
+    deadline: Optional[float] = None
+    # When a crashed worker is due to be replaced.
+    restart_at: Optional[float] = None
+
+
+def listen(host: str, port: int) -> socket.socket:
+    """A listening socket other processes can bind too."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    return sock
+
+
+if uvicorn is not None:
+
+    class _Server(uvicorn.Server):
+        """A uvicorn server that stops accepting on ``SIGUSR1``."""
+
+        def __init__(self, config: uvicorn.Config, app: StaticApp) -> None:
+            super().__init__(config)
+            self.app = app
+
+        async def startup(self, sockets=None) -> None:
+            await super().startup(sockets)
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.drain)
+
+        def drain(self) -> None:
+            self.app.draining = True
+            for server in self.servers:
+                server.close()
+
+
+def _worker(options: WorkerOptions, ready) -> None:
+    # The supervisor handles SIGHUP; a stray one must not kill a worker.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    app = StaticApp(
+        options.root,
+        cache_bytes=options.cache_bytes,
+        watch_interval=options.watch_interval,
+        metrics=options.metrics,
+        metrics_dir=options.metrics_dir,
+    )
+    sock = listen(options.host, options.port)
+    # Connections queue on the socket from here on; uvicorn accepts them once running.
+    ready.set()
+    config = uvicorn.Config(
+        app,
+        log_level="info" if options.verbose else "warning",
+        access_log=options.verbose,
+        timeout_graceful_shutdown=options.graceful_timeout,
+    )
+    _Server(config, app).run(sockets=[sock])
+
+
+def build_id(root: Path) -> Optional[str]:
+    return load_manifest(root).get("build", {}).get("id")
+
+
+class Supervisor:
+    def __init__(self, options: WorkerOptions, workers: int) -> None:
+        self.options = options
+        self.count = workers
+        self.workers: list[Worker] = []
+        self.retiring: list[Worker] = []
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._reload = False
+        self._failures = 0
+        # The build the workers serve, the one seen at the last poll, and
+        # when a deploy whose workers failed to start may be tried again.
+        self._current: Optional[str] = None
+        self._seen: Optional[str] = None
+        self._reload_failures = 0
+        self._retry_at = 0.0
+
+    def _spawn(self) -> Worker:
+        ready = self._context.Event()
+        process = self._context.Process(target=_worker, args=(self.options, ready), name="nimex-serve-worker")
+        process.start()
+        return Worker(process, ready)
+
+    def _wait_ready(self, workers: list[Worker]) -> bool:
+        deadline = time.monotonic() + READY_TIMEOUT
+        for worker in workers:
+            while not worker.ready.wait(POLL_INTERVAL):
+                if not worker.process.is_alive() or time.monotonic() > deadline or self._stopping:
+                    return False
+        return True
+
+    def _retire(self, workers: list[Worker], *, drain: bool) -> None:
+        """Stop ``workers``, after a drain period if others are taking over."""
+        now = time.monotonic()
+        for worker in workers:
+            if drain and worker.process.is_alive():
+                os.kill(worker.process.pid, signal.SIGUSR1)
+                worker.terminate_at = now + DRAIN_PERIOD
+            else:
+                worker.terminate_at = now
+            self.retiring.append(worker)
+        self._reap()
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        for worker in list(self.retiring):
+            if not worker.process.is_alive():
+                worker.process.join()
+                self.retiring.remove(worker)
+            elif worker.deadline is None and now >= worker.terminate_at:
+                worker.process.terminate()
+                worker.deadline = now + self.options.graceful_timeout + 5
+            elif worker.deadline is not None and now > worker.deadline:
+                log.warning("worker %d did not stop in time; killing it", worker.process.pid)
+                worker.process.kill()
+
+    def reload(self) -> bool:
+        """Replace every worker with a fresh one, old ones draining after."""
+        log.info("reloading %d workers from %s", self.count, self.options.root)
+        fresh = [self._spawn() for _ in range(self.count)]
+        if not self._wait_ready(fresh):
+            log.error("new workers failed to start; still serving the previous generation")
+            for worker in fresh:
+                worker.process.kill()
+                worker.process.join()
+            return False
+        self._retire(self.workers, drain=True)
+        self.workers = fresh
+        return True
+
+    def _restart_crashed(self) -> None:
+        now = time.monotonic()
+        for index, worker in enumerate(self.workers):
+            if worker.process.is_alive():
+                continue
+            if worker.restart_at is None:
+                worker.process.join()
+                if now - worker.started < STARTUP_GRACE:
+                    self._failures += 1
+                else:
+                    self._failures = 0
+                delay = min(MAX_RESTART_DELAY, 0.5 * 2**self._failures) if self._failures > 1 else 0.0
+                log.warning(
+                    "worker %d exited with code %s; restarting%s",
+                    worker.process.pid,
+                    worker.process.exitcode,
+                    f" in {delay:g} s" if delay else "",
+                )
+                worker.restart_at = now + delay
+            if now >= worker.restart_at:
+                self.workers[index] = self._spawn()
+
+    def _signal(self, number, _frame) -> None:
+        if number == signal.SIGHUP:
+            self._reload = True
+        else:
+            self._stopping = True
+
+    def run(self) -> int:
+        if not self.options.metrics:
+            return self._run()
+        with tempfile.TemporaryDirectory(prefix="nimex-metrics-") as directory:
+            self.options = replace(self.options, metrics_dir=Path(directory))
+            return self._run()
+
+    def _run(self) -> int:
+        for number in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(number, self._signal)
+        self._current = self._seen = build_id(self.options.root)
+        self.workers = [self._spawn() for _ in range(self.count)]
+        if not self._wait_ready(self.workers):
+            log.error("workers failed to start")
+            self._retire(self.workers, drain=False)
+            self._drain()
+            return 1
+        log.info(
+            "serving %s on http://%s:%d with %d workers (build %s)",
+            self.options.root, self.options.host, self.options.port, self.count, self._current,
+        )
+        while not self._stopping:
+            time.sleep(POLL_INTERVAL)
+            self._tick(time.monotonic())
+        log.info("stopping %d workers", len(self.workers))
+        for worker in self.retiring:
+            worker.terminate_at = time.monotonic()
+        self._retire(self.workers, drain=False)
+        self.workers = []
+        self._drain()
+        return 0
+
+    def _tick(self, now: float) -> None:
+        """One poll: reap, restart crashed workers, and reload for a new deploy."""
+        self._reap()
+        self._restart_crashed()
+        latest = build_id(self.options.root)
+        if latest != self._seen:
+            # A manifest that changed (again) is tried as soon as it settles.
+            self._reload_failures = 0
+            self._retry_at = 0.0
+        elif latest is not None and latest != self._current and now >= self._retry_at:
+            # A new deploy whose manifest stayed put for a whole poll.
+            self._reload = True
+        self._seen = latest
+        if not self._reload:
+            return
+        self._reload = False
+        if self.reload():
+            self._current = latest if latest is not None else self._current
+            self._reload_failures = 0
+            return
+        # Its workers crash on start-up: back off rather than spawn a
+        # generation every poll, until the manifest changes.
+        self._reload_failures += 1
+        delay = min(MAX_RESTART_DELAY, 0.5 * 2**self._reload_failures)
+        self._retry_at = now + delay
+        log.warning("trying build %s again in %g s unless it changes", latest, delay)
+
+    def _drain(self) -> None:
+        while self.retiring:
+            self._reap()
+            time.sleep(POLL_INTERVAL)
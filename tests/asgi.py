@@ -0,0 +1,39 @@
+"""Call an ASGI app in-process with a fake ``receive``/``send`` pair."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass
+class Response:
+    status: int
+    # Lower-cased names; repeated headers are joined with ", ".
+    headers: dict[str, str]
+    body: bytes
+
+
+async def call(app, path: str, *, method: str = "GET", headers: dict[str, str] | None = None) -> Response:
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()],
+        "extensions": {},
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    response_headers: dict[str, str] = {}
+    for name, value in start["headers"]:
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        response_headers[name] = f"{response_headers[name]}, {value}" if name in response_headers else value
+    body = b"".join(bytes(message.get("body", b"")) for message in messages if message["type"] == "http.response.body")
+    return Response(start["status"], response_headers, body)
@@ -0,0 +1,292 @@
+// Runs the page's inline scripts against a minimal fake DOM with a virtual
+// clock, then checks the slideshow's timing. Usage (see test_slideshow.py):
+//   node slideshow.js <scripts.js>
+// Prints one line per check and exits 1 if any failed.
+'use strict';
+
+const fs = require('fs');
+const vm = require('vm');
+
+const FRAME = 1000 / 60;
+
+// Virtual time: timers and animation frames only run when advance() says so.
+let now = 0;
+let nextId = 1;
+const timers = new Map();
+const frames = new Map();
+let callbacks = 0;
+let inFrame = false;
+let outsideFrames = 0;
+
+const setTimeout = (fn, delay = 0) => {
+  const id = nextId++;
+  timers.set(id, { fn, at: now + Math.max(0, delay), every: null });
+  return id;
+};
+const setInterval = (fn, delay = 0) => {
+  const id = nextId++;
+  timers.set(id, { fn, at: now + Math.max(1, delay), every: Math.max(1, delay) });
+  return id;
+};
+const clearTimer = (id) => timers.delete(id);
+const requestAnimationFrame = (fn) => {
+  const id = nextId++;
+  frames.set(id, fn);
+  return id;
+};
+const cancelAnimationFrame = (id) => frames.delete(id);
+// Idle periods come right after whatever is running now.
+const requestIdleCallback = (fn) => setTimeout(() => fn({ didTimeout: false, timeRemaining: () => 50 }), 0);
+
+// Browsers run animation frames at display refresh, and not in hidden tabs.
+const advance = (ms) => {
+  const end = now + ms;
+  for (;;) {
+    let due = null;
+    for (const [id, timer] of timers) {
+      if (timer.at <= end && (due === null || timer.at < timers.get(due).at)) {
+        due = id;
+      }
+    }
+    const nextFrame = (Math.floor(now / FRAME) + 1) * FRAME;
+    const frameDue = !document.hidden && frames.size && nextFrame <= end;
+    if (due !== null && (!frameDue || timers.get(due).at <= nextFrame)) {
+      const timer = timers.get(due);
+      now = Math.max(now, timer.at);
+      if (timer.every === null) {
+        timers.delete(due);
+      } else {
+        timer.at += timer.every;
+      }
+      callbacks++;
+      timer.fn();
+    } else if (frameDue) {
+      now = nextFrame;
+      const batch = [...frames.values()];
+      frames.clear();
+      inFrame = true;
+      batch.forEach((fn) => {
+        callbacks++;
+        fn(now);
+      });
+      inFrame = false;
+    } else {
+      now = end;
+      return;
+    }
+  }
+};
+
+class ClassList {
+  constructor(names = []) {
+    this.names = new Set(names);
+  }
+  add(name) {
+    outsideFrames += inFrame ? 0 : 1;
+    this.names.add(name);
+  }
+  remove(name) {
+    this.names.delete(name);
+  }
+  contains(name) {
+    return this.names.has(name);
+  }
+}
+
+class FakeElement {
+  constructor(classes = [], children = []) {
+    this.classList = new ClassList(classes);
+    this.listeners = {};
+    this.textContent = '';
+    this.dataset = {};
+    this.attributes = {};
+    this.children = children;
+  }
+  setAttribute(name, value) {
+    this.attributes[name] = value;
+  }
+  getAttribute(name) {
+    return name in this.attributes ? this.attributes[name] : null;
+  }
+  querySelectorAll(selector) {
+    if (selector === '[data-srcset], [data-src]') {
+      return this.children.filter((child) => child.dataset.src || child.dataset.srcset);
+    }
+    return this.children.filter((child) => child.tag === selector);
+  }
+  querySelector(selector) {
+    return this.querySelectorAll(selector)[0] || null;
+  }
+  addEventListener(type, fn) {
+    (this.listeners[type] ||= []).push(fn);
+  }
+  dispatch(type) {
+    (this.listeners[type] || []).forEach((fn) => fn({ type, target: this }));
+  }
+}
+
+// When each image got its URL and was decoded, in virtual ms.
+const loaded = [];
+const decoded = [];
+const fakeImage = (index, deferred) => {
+  const source = new FakeElement();
+  source.tag = 'source';
+  const img = new FakeElement();
+  img.tag = 'img';
+  const urls = { src: `/slide-${index}.jpg`, srcset: `/slide-${index}.avif 640w` };
+  for (const [attr, value] of Object.entries(urls)) {
+    if (deferred) {
+      img.dataset[attr] = value;
+    } else {
+      img.attributes[attr] = value;
+    }
+  }
+  if (deferred) {
+    source.dataset.srcset = urls.srcset;
+  } else {
+    source.attributes.srcset = urls.srcset;
+    loaded[index] = 0;
+  }
+  img.setAttribute = (name, value) => {
+    img.attributes[name] = value;
+    loaded[index] ??= now;
+  };
+  img.decode = () => {
+    decoded[index] ??= now;
+    return { catch: () => {} };
+  };
+  return [source, img];
+};
+
+const COUNT = 3;
+const slideshow = new FakeElement(['slideshow']);
+// The first slide as written; the others as the build's slides stage leaves them.
+const slides = Array.from({ length: COUNT }, (_, i) => new FakeElement(i ? ['slide'] : ['slide', 'is-active'], fakeImage(i, i > 0)));
+const dots = Array.from({ length: COUNT }, (_, i) => new FakeElement(i ? [] : ['active']));
+const generic = new FakeElement();
+
+const document = new FakeElement();
+document.hidden = false;
+document.querySelector = (selector) => (selector === '.slideshow' ? slideshow : null);
+document.querySelectorAll = (selector) => {
+  if (selector === '.slide') return slides;
+  if (selector === '.slider-dots button') return dots;
+  return [];
+};
+document.getElementById = () => generic;
+
+const observers = [];
+class IntersectionObserver {
+  constructor(callback) {
+    this.callback = callback;
+    this.targets = [];
+    observers.push(this);
+  }
+  observe(target) {
+    this.targets.push(target);
+  }
+  unobserve() {}
+  disconnect() {}
+}
+
+const sandbox = {
+  document,
+  setTimeout,
+  clearTimeout: clearTimer,
+  setInterval,
+  clearInterval: clearTimer,
+  requestAnimationFrame,
+  cancelAnimationFrame,
+  requestIdleCallback,
+  IntersectionObserver,
+  performance: { now: () => now },
+  matchMedia: () => ({ matches: false, addEventListener() {} }),
+  navigator: {},
+  console,
+  Date,
+};
+sandbox.window = sandbox;
+vm.createContext(sandbox);
+vm.runInContext(fs.readFileSync(process.argv[2], 'utf8'), sandbox);
+
+const active = () => slides.findIndex((slide) => slide.classList.contains('is-active'));
+const setHidden = (hidden) => {
+  document.hidden = hidden;
+  document.dispatch('visibilitychange');
+};
+const setOnscreen = (isIntersecting) => {
+  observers.forEach((observer) => observer.callback(observer.targets.map((target) => ({ target, isIntersecting }))));
+};
+// Time from now until the active slide changes, to the millisecond.
+const untilChange = (limit = 20000) => {
+  const before = active();
+  const start = now;
+  while (active() === before && now - start < limit) {
+    advance(1);
+  }
+  return active() === before ? Infinity : now - start;
+};
+
+let failed = 0;
+const check = (name, ok, detail) => {
+  console.log(`${ok ? 'ok  ' : 'FAIL'} ${name}: ${detail}`);
+  failed += ok ? 0 : 1;
+};
+
+setOnscreen(true);
+check('observes the slideshow', observers.some((o) => o.targets.includes(slideshow)), `${observers.length} observer(s)`);
+
+advance(1000);
+check('later slides wait for their turn', loaded.filter((at) => at !== undefined).length === 1, `${loaded.filter((at) => at !== undefined).length} image(s) loading after 1 s`);
+
+let elapsed = untilChange();
+check('advances after the interval', elapsed >= 5200 - 1000 && elapsed <= 5200 - 1000 + FRAME + 1, `${(elapsed + 1000).toFixed(1)} ms`);
+const ahead = now - decoded[1];
+check('next slide decoded ahead of its turn', ahead >= 1500 && ahead <= 2500, `decode() ${ahead.toFixed(0)} ms before`);
+check('the slide after waits', loaded[2] === undefined, loaded[2] === undefined ? 'not loading yet' : `loading since ${loaded[2]} ms`);
+
+advance(2000);
+setHidden(true);
+let before = callbacks;
+let slide = active();
+advance(60000);
+check('no callbacks while hidden', callbacks === before && active() === slide, `${callbacks - before} in 60 s`);
+check('nothing armed while hidden', timers.size === 0 && frames.size === 0, `${timers.size} timers, ${frames.size} frames`);
+setHidden(false);
+elapsed = untilChange();
+check('resumes with the time left', Math.abs(elapsed - 3200) <= FRAME + 1, `${elapsed.toFixed(1)} ms (expected ~3200)`);
+
+advance(1000);
+setOnscreen(false);
+before = callbacks;
+slide = active();
+advance(60000);
+check('no callbacks while off screen', callbacks === before && active() === slide, `${callbacks - before} in 60 s`);
+setOnscreen(true);
+elapsed = untilChange();
+check('resumes on screen with the time left', Math.abs(elapsed - 4200) <= FRAME + 1, `${elapsed.toFixed(1)} ms (expected ~4200)`);
+
+// Hidden and off screen together: coming back on screen alone must not resume.
+setHidden(true);
+setOnscreen(false);
+setOnscreen(true);
+before = callbacks;
+advance(30000);
+check('stays paused while still hidden', callbacks === before, `${callbacks - before} callbacks`);
+setHidden(false);
+
+advance(3000);
+const chosen = (active() + 2) % COUNT;
+dots[chosen].dispatch('click');
+check('dot selects its slide', active() === chosen, `slide ${active()}, expected ${chosen}`);
+elapsed = untilChange();
+check('dot restarts the interval', elapsed >= 5200 && elapsed <= 5200 + FRAME + 1, `${elapsed.toFixed(1)} ms`);
+
+// Scheduled changes land in animation frames, never straight from a timer.
+outsideFrames = 0;
+advance(5200 * 4);
+check('transitions run in animation frames', outsideFrames === 0, `${outsideFrames} changes outside a frame`);
+
+check('every slide prepared once shown', decoded.filter((at) => at !== undefined).length === COUNT - 1 && loaded.every((at) => at !== undefined), `${loaded.filter((at) => at !== undefined).length} of ${COUNT} loaded`);
+
+process.exit(failed ? 1 : 0);
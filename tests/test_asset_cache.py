@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from nimex_site.serve.app import StaticApp
+from nimex_site.serve.cache import AssetCache, signature
+
+from .asgi import call
+
+
+class AssetCacheTests(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.root = Path(scratch.name)
+
+    def file(self, name, size):
+        path = self.root / name
+        path.write_bytes(name.encode()[:1] * size)
+        return path, signature(path.stat())
+
+    def test_evicts_least_recently_used(self):
+        cache = AssetCache(250)
+        a, b, c = (self.file(name, 100) for name in "abc")
+        cache.get(*a)
+        cache.get(*b)
+        self.assertEqual(bytes(cache.get(*a)), b"a" * 100)  # a is now the most recent
+        cache.get(*c)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 200)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 3))
+        cache.get(*a)
+        cache.get(*b)
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (2, 4))
+
+    def test_bypasses_large_and_empty_files(self):
+        cache = AssetCache(1000, max_entry_bytes=100)
+        self.assertIsNone(cache.get(*self.file("big", 101)))
+        self.assertIsNone(cache.get(*self.file("empty", 0)))
+        self.assertEqual(cache.stats.bypassed, 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_refuses_a_changed_file(self):
+        cache = AssetCache(1000)
+        path, expected = self.file("page", 10)
+        path.write_bytes(b"rewritten!!")
+        self.assertIsNone(cache.get(path, expected))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = AssetCache(1000)
+        entry = self.file("page", 10)
+        cache.get(*entry)
+        cache.invalidate(entry[0])
+        self.assertEqual((len(cache), cache.size, cache.stats.invalidations), (0, 0, 1))
+
+
+class RebuildTests(unittest.TestCase):
+    def test_serves_a_replaced_file_after_the_watch_interval(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            path = Path(scratch) / "site.css"
+            path.write_bytes(b"old")
+            app = StaticApp(Path(scratch), watch_interval=0.01)
+            first = asyncio.run(call(app, "/site.css"))
+            self.assertEqual(first.body, b"old")
+            self.assertEqual(len(app.cache), 1)
+            replacement = path.with_name("site.css.tmp")
+            replacement.write_bytes(b"newer")
+            os.replace(replacement, path)
+            time.sleep(0.02)
+            second = asyncio.run(call(app, "/site.css"))
+            self.assertEqual(second.body, b"newer")
+            self.assertNotEqual(second.headers["etag"], first.headers["etag"])
+            self.assertEqual(app.cache.stats.invalidations, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.build import html
+from nimex_site.build.config import BuildConfig
+from nimex_site.build.pipeline import build
+
+PAGE = Path(__file__).resolve().parent.parent / "index.html"
+
+# Independent of --critical-budget: raising the flag must not raise this.
+CRITICAL_BUDGET = 10_000
+
+
+class CriticalCSSTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        scratch = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(scratch.cleanup)
+        out_dir = Path(scratch.name) / "dist"
+        build(BuildConfig(source=PAGE, out_dir=out_dir, critical_budget=0))
+        cls.out_dir = out_dir
+        cls.document = html.parse((out_dir / "index.html").read_text(encoding="utf-8"))
+
+    def test_inline_critical_css_within_budget(self):
+        styles = self.document.head.find_all("style")
+        self.assertEqual(len(styles), 1)
+        size = len(styles[0].text.encode())
+        self.assertGreater(size, 0)
+        self.assertLessEqual(size, CRITICAL_BUDGET, f"inline critical CSS is {size:,} bytes")
+
+    def test_rest_of_stylesheet_loads_async(self):
+        preloads = [
+            link
+            for link in self.document.head.find_all("link")
+            if link.get("rel") == "preload" and link.get("as") == "style"
+        ]
+        self.assertEqual(len(preloads), 1)
+        link = preloads[0]
+        self.assertIn("this.rel='stylesheet'", link.get("onload", ""))
+        self.assertTrue((self.out_dir / link.get("href").lstrip("/")).is_file())
+        fallback = self.document.head.find("noscript")
+        self.assertIsNotNone(fallback)
+        self.assertEqual(fallback.find("link").get("href"), link.get("href"))
+
+
+if __name__ == "__main__":
+    unittest.main()
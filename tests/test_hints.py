@@ -0,0 +1,85 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.build import html, selectors
+from nimex_site.build.config import BuildConfig
+from nimex_site.build.errors import BuildError
+from nimex_site.build.pipeline import build
+from nimex_site.build.stages.images import available_formats
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGE = Path(__file__).resolve().parent.parent / "index.html"
+
+LCP = ".slideshow .slide.is-active img"
+
+PICTURE_PAGE = """<!DOCTYPE html>
+<html><head><style>.slide img { width: 100%; }</style></head>
+<body><div class="slideshow"><div class="slide is-active"><img src="hero.jpg" alt="Terminal"></div></div></body></html>
+"""
+
+
+def image_preloads(document: html.Document) -> list[html.Element]:
+    return [
+        link
+        for link in document.head.find_all("link")
+        if link.get("rel") == "preload" and link.get("as") == "image"
+    ]
+
+
+class LcpPreloadTests(unittest.TestCase):
+    def test_active_slide_is_preloaded_with_high_priority(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            out_dir = Path(scratch) / "dist"
+            build(BuildConfig(source=PAGE, out_dir=out_dir))
+            document = html.parse((out_dir / "index.html").read_text(encoding="utf-8"))
+            manifest = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+        image = next(iter(selectors.select(document.html, LCP)), None)
+        self.assertIsNotNone(image)
+        self.assertEqual(image.get("fetchpriority"), "high")
+        self.assertNotIn("loading", image.attrs)
+        preloads = [link for link in image_preloads(document) if link.get("href") == image.get("src")]
+        self.assertEqual(len(preloads), 1)
+        self.assertEqual(preloads[0].get("fetchpriority"), "high")
+        self.assertTrue(
+            any(hint.startswith(f"<{image.get('src')}>;") and "fetchpriority=high" in hint for hint in manifest["early_hints"]["/"])
+        )
+
+    def test_lcp_selector_matching_nothing_fails_the_build(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            config = BuildConfig(source=PAGE, out_dir=Path(scratch) / "dist", lcp_selector=".no-such-slide img")
+            with self.assertRaises(BuildError):
+                build(config)
+
+
+@unittest.skipUnless(Image is not None, "needs Pillow")
+class PicturePreloadTests(unittest.TestCase):
+    def test_only_the_first_format_is_preloaded(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            root = Path(scratch)
+            (root / "index.html").write_text(PICTURE_PAGE, encoding="utf-8")
+            Image.new("RGB", (1200, 800), (20, 60, 120)).save(root / "hero.jpg")
+            out_dir = root / "dist"
+            build(BuildConfig(source=root / "index.html", out_dir=out_dir, image_widths=(320, 640), critical_css=False))
+            document = html.parse((out_dir / "index.html").read_text(encoding="utf-8"))
+        picture = document.body.find("picture")
+        self.assertIsNotNone(picture)
+        expected = "image/avif" if "avif" in available_formats() else "image/webp"
+        self.assertEqual(picture.find("source").get("type"), expected)
+        preloads = image_preloads(document)
+        self.assertEqual(len(preloads), 1)
+        link = preloads[0]
+        extension = {"image/avif": ".avif", "image/webp": ".webp"}[expected]
+        self.assertEqual(link.get("type"), expected)
+        self.assertEqual(link.get("fetchpriority"), "high")
+        self.assertTrue(link.get("href").endswith(extension))
+        for candidate in link.get("imagesrcset").split(","):
+            self.assertTrue(candidate.split()[0].endswith(extension))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.build import html
+from nimex_site.build.config import BuildConfig
+from nimex_site.build.pipeline import build
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGE = """<!DOCTYPE html>
+<html><head><style>img { width: 100%; }</style></head>
+<body><img src="Camera Photo.jpg" alt="Jetty"></body></html>
+"""
+
+# EXIF Orientation 6: the stored pixels must be turned a quarter clockwise.
+ROTATE_90 = 6
+
+
+@unittest.skipUnless(Image is not None, "needs Pillow")
+class RenditionTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        scratch = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(scratch.cleanup)
+        root = Path(scratch.name)
+        (root / "index.html").write_text(PAGE, encoding="utf-8")
+        originals = root / "originals"
+        originals.mkdir()
+        # Stored landscape, left half blue: upright it is portrait, blue on top.
+        photo = Image.new("RGB", (800, 400), (200, 0, 0))
+        photo.paste((0, 0, 200), (0, 0, 400, 400))
+        exif = photo.getexif()
+        exif[0x0112] = ROTATE_90
+        photo.save(originals / "Camera Photo.jpg", exif=exif)
+        cls.out_dir = root / "dist"
+        cls.ctx = build(
+            BuildConfig(
+                source=root / "index.html",
+                out_dir=cls.out_dir,
+                images_dir=originals,
+                image_widths=(320,),
+                critical_css=False,
+                lcp_selector="",
+            )
+        )
+        cls.document = html.parse((cls.out_dir / "index.html").read_text(encoding="utf-8"))
+
+    def test_renditions_follow_exif_orientation(self):
+        image = self.document.body.find("img")
+        self.assertEqual((image.get("width"), image.get("height")), ("400", "800"))
+        with Image.open(self.out_dir / image.get("src").lstrip("/")) as rendition:
+            self.assertGreater(rendition.height, rendition.width)
+            top = rendition.convert("RGB").getpixel((10, 10))
+            bottom = rendition.convert("RGB").getpixel((10, rendition.height - 10))
+        self.assertGreater(top[2], top[0])
+        self.assertGreater(bottom[0], bottom[2])
+
+    def test_report_row_names_the_written_files(self):
+        rows = [stat.name for stat in self.ctx.report.assets if "renditions" in stat.name]
+        self.assertEqual(len(rows), 1)
+        prefix = rows[0].split("*", 1)[0]
+        written = [path for path in (self.out_dir / "assets").iterdir() if path.suffix in (".jpg", ".webp", ".avif")]
+        self.assertTrue(written)
+        for path in written:
+            self.assertTrue(f"assets/{path.name}".startswith(prefix), path.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
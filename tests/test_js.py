@@ -0,0 +1,33 @@
+import unittest
+
+from nimex_site.build.js import minify
+
+
+class MinifyNewlineTests(unittest.TestCase):
+    def test_joins_lines_inside_an_expression(self):
+        self.assertEqual(minify("x = a +\nb\n"), "x=a+b\n")
+        self.assertEqual(minify("f(a,\n  b)\n"), "f(a,b)\n")
+
+    def test_keeps_newline_after_postfix_increment(self):
+        self.assertEqual(minify("i++\nfoo()\n"), "i++\nfoo()\n")
+        self.assertEqual(minify("i--\nfoo()\n"), "i--\nfoo()\n")
+
+    def test_keeps_unary_plus_after_binary_plus(self):
+        self.assertEqual(minify("x = a +\n+b\n"), "x=a+ +b\n")
+
+    def test_keeps_newline_before_prefix_increment(self):
+        self.assertEqual(minify("a = b\n++c\n"), "a=b\n++c\n")
+
+    def test_keeps_newline_after_regex_literal(self):
+        self.assertEqual(minify("const r = /ab/\nfoo()\n"), "const r=/ab/\nfoo()\n")
+        self.assertEqual(minify("const r = /ab/g\nfoo()\n"), "const r=/ab/g\nfoo()\n")
+
+    def test_keeps_space_between_regex_literal_and_word(self):
+        self.assertEqual(minify("x = /a/ instanceof RegExp\n"), "x=/a/ instanceof RegExp\n")
+
+    def test_never_joins_after_string(self):
+        self.assertEqual(minify("a = 'x'\nfoo()\n"), "a='x'\nfoo()\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.build import html
+from nimex_site.build.config import BuildConfig
+from nimex_site.build.pipeline import build
+from nimex_site.build.stages import media
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGE = """<!DOCTYPE html>
+<html><head><style>.image-block img { width: 100%; }</style></head>
+<body><div class="image-block"><img src="anim.gif" alt="Loading terminal"></div></body></html>
+"""
+
+
+def write_gif(path: Path) -> None:
+    """Two 320x240 frames of busy colour, so the MP4 comes out smaller than the GIF."""
+    frames = []
+    for index in range(2):
+        frame = Image.new("RGB", (320, 240))
+        pixels = frame.load()
+        for y in range(240):
+            for x in range(320):
+                pixels[x, y] = ((x + index * 40) % 256, (y * 2) % 256, (x * y // 50 + index * 60) % 256)
+        frames.append(frame)
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=200, loop=0)
+
+
+@unittest.skipUnless(Image is not None and media.ffmpeg_binary(), "needs Pillow and ffmpeg")
+class GifToVideoTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        scratch = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(scratch.cleanup)
+        root = Path(scratch.name)
+        (root / "index.html").write_text(PAGE, encoding="utf-8")
+        write_gif(root / "anim.gif")
+        cls.out_dir = root / "dist"
+        build(BuildConfig(source=root / "index.html", out_dir=cls.out_dir, critical_css=False, lcp_selector=""))
+        cls.document = html.parse((cls.out_dir / "index.html").read_text(encoding="utf-8"))
+
+    def output(self, url: str) -> bytes:
+        return (self.out_dir / url.lstrip("/")).read_bytes()
+
+    def test_gif_replaced_by_muted_looping_video(self):
+        self.assertIsNone(self.document.body.find("img"))
+        video = self.document.body.find("video")
+        self.assertIsNotNone(video)
+        for attr in ("muted", "loop", "playsinline", "data-inview"):
+            self.assertIn(attr, video.attrs)
+        self.assertEqual((video.get("width"), video.get("height")), ("320", "240"))
+        self.assertEqual(video.get("aria-label"), "Loading terminal")
+
+    def test_video_has_poster_and_sources(self):
+        video = self.document.body.find("video")
+        self.assertTrue(self.output(video.get("poster")).startswith(b"\xff\xd8"))
+        sources = {source.get("type"): source.get("src") for source in video.find_all("source")}
+        self.assertEqual(list(sources), ["video/webm", "video/mp4"])
+        self.assertTrue(self.output(sources["video/webm"]).startswith(b"\x1a\x45\xdf\xa3"))
+        self.assertEqual(self.output(sources["video/mp4"])[4:8], b"ftyp")
+
+    def test_video_is_played_by_the_inview_script(self):
+        scripts = [script.get("src") or "" for script in self.document.body.find_all("script")]
+        self.assertTrue(any("inview-video" in src for src in scripts))
+
+
+if __name__ == "__main__":
+    unittest.main()
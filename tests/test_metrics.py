@@ -0,0 +1,100 @@
+import asyncio
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.serve.app import METRICS_PATH, StaticApp
+from nimex_site.serve.metrics import BOUNDS, Histogram, Metrics
+
+from .asgi import call
+
+CSS = b"body{color:red}" * 20
+
+
+def samples(text: str) -> dict[str, float]:
+    return {name: float(value) for name, _, value in (line.rpartition(" ") for line in text.splitlines() if not line.startswith("#"))}
+
+
+class HistogramTests(unittest.TestCase):
+    def test_bucket_bounds_the_value(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            seconds = 2 ** rng.uniform(-13, 3)
+            histogram = Histogram()
+            histogram.record(seconds)
+            index = histogram.counts.index(1)
+            self.assertLessEqual(seconds, BOUNDS[index])
+            if index:
+                self.assertGreater(seconds, BOUNDS[index - 1])
+
+    def test_extremes(self):
+        histogram = Histogram()
+        histogram.record(0.0)
+        histogram.record(1e-9)
+        histogram.record(60.0)
+        self.assertEqual(histogram.counts[0], 2)
+        self.assertEqual(histogram.overflow, 1)
+        self.assertEqual(histogram.count, 3)
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.root = Path(scratch.name)
+        (self.root / "site.css").write_bytes(CSS)
+        (self.root / "site.css.br").write_bytes(b"br bytes")
+
+    def get(self, app, path, **headers):
+        return asyncio.run(call(app, path, headers={k.replace("_", "-"): v for k, v in headers.items()}))
+
+    def test_records_requests_by_class_status_and_encoding(self):
+        app = StaticApp(self.root)
+        etag = self.get(app, "/site.css", accept_encoding="br").headers["etag"]
+        self.get(app, "/site.css", accept_encoding="br")
+        self.get(app, "/site.css", accept_encoding="br", if_none_match=etag)
+        self.get(app, "/missing.png")
+        response = self.get(app, METRICS_PATH)
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertEqual(response.headers["cache-control"], "no-store")
+        metrics = samples(response.body.decode())
+        self.assertEqual(metrics['nimex_requests_total{class="css",status="200"}'], 2)
+        self.assertEqual(metrics['nimex_requests_total{class="css",status="304"}'], 1)
+        self.assertEqual(metrics['nimex_requests_total{class="other",status="404"}'], 1)
+        self.assertEqual(metrics['nimex_responses_total{class="css",encoding="br"}'], 2)
+        self.assertEqual(metrics['nimex_response_bytes_total{class="css",encoding="br"}'], 2 * len(b"br bytes"))
+        self.assertEqual(metrics['nimex_compression_saved_bytes_total{class="css"}'], 2 * (len(CSS) - len(b"br bytes")))
+        self.assertEqual(metrics['nimex_request_duration_seconds_count{class="css"}'], 3)
+        self.assertEqual(metrics['nimex_request_duration_seconds_bucket{class="css",le="+Inf"}'], 3)
+        self.assertEqual(metrics["nimex_cache_hits_total"], 1)
+        self.assertEqual(metrics["nimex_cache_misses_total"], 1)
+        self.assertEqual(metrics["nimex_cache_entries"], 1)
+        self.assertNotIn('nimex_request_duration_seconds_count{class="video"}', metrics)
+
+    def test_adds_other_workers_totals(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exited = Metrics()
+            exited.record("css", 200, "br", 100, 50, 0.001)
+            snapshot = exited.snapshot()
+            snapshot["cache"].update(hits=5, bytes=1000, entries=3)
+            # No process has this pid, so its gauges are left out.
+            (Path(directory) / "999999999.json").write_text(json.dumps(snapshot), encoding="utf-8")
+            app = StaticApp(self.root, metrics_dir=Path(directory))
+            self.get(app, "/site.css", accept_encoding="br")
+            metrics = samples(self.get(app, METRICS_PATH).body.decode())
+        self.assertEqual(metrics['nimex_requests_total{class="css",status="200"}'], 2)
+        self.assertEqual(metrics['nimex_response_bytes_total{class="css",encoding="br"}'], 100 + len(b"br bytes"))
+        self.assertEqual(metrics['nimex_request_duration_seconds_count{class="css"}'], 2)
+        self.assertEqual(metrics["nimex_cache_hits_total"], 5)
+        self.assertEqual(metrics["nimex_cache_entries"], 1)
+
+    def test_disabled(self):
+        app = StaticApp(self.root, metrics=False)
+        self.assertEqual(self.get(app, METRICS_PATH).status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
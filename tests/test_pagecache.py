@@ -0,0 +1,148 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.serve.pagecache import PageApp, PageCache, negotiate_locale
+
+from .asgi import call
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Renderer:
+    """Renders ``<path>#<count>``; paths under /missing/ do not exist."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = None
+
+    async def __call__(self, key):
+        self.calls.append(key)
+        if self.gate is not None:
+            await self.gate.wait()
+        if key[0].startswith("/missing/"):
+            raise LookupError(key[0])
+        return f"{key[0]}#{len(self.calls)}".encode()
+
+
+class PageCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.render = Renderer()
+
+    def cache(self, **options):
+        return PageCache(self.render, ttl=1.0, stale=30.0, clock=self.clock, **options)
+
+    async def test_fresh_stale_and_expired(self):
+        cache = self.cache()
+        key = ("/", "", "")
+        self.assertEqual((await cache.get(key)).body, b"/#1")
+        self.clock.now += 0.5
+        self.assertEqual((await cache.get(key)).body, b"/#1")
+        self.clock.now += 1.0
+        # Stale: served at once while one render replaces it.
+        self.assertEqual((await cache.get(key)).body, b"/#1")
+        self.assertEqual((await cache.get(key)).body, b"/#1")
+        await asyncio.sleep(0)
+        self.assertEqual((await cache.get(key)).body, b"/#2")
+        self.clock.now += 60
+        self.assertEqual((await cache.get(key)).body, b"/#3")
+        stats = cache.stats
+        self.assertEqual((stats.hits, stats.stale, stats.misses, stats.renders), (2, 2, 2, 3))
+
+    async def test_concurrent_misses_render_once(self):
+        cache = self.cache()
+        self.render.gate = asyncio.Event()
+        waiting = [asyncio.ensure_future(cache.get(("/", "", ""))) for _ in range(20)]
+        await asyncio.sleep(0)
+        self.render.gate.set()
+        pages = await asyncio.gather(*waiting)
+        self.assertEqual({page.body for page in pages}, {b"/#1"})
+        self.assertEqual(len(self.render.calls), 1)
+        self.assertEqual((cache.stats.misses, cache.stats.coalesced), (1, 19))
+
+    async def test_failed_renders_are_not_kept(self):
+        cache = self.cache(max_entries=4)
+        await cache.get(("/", "", ""))
+        for number in range(5):
+            with self.assertRaises(LookupError):
+                await cache.get((f"/missing/{number}", "", ""))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(len(cache._entries), 1)
+        self.assertEqual((await cache.get(("/", "", ""))).body, b"/#1")
+        self.assertEqual((cache.stats.errors, cache.stats.renders, cache.stats.hits), (5, 6, 1))
+
+    async def test_evicts_least_recently_used(self):
+        cache = self.cache(max_entries=2)
+        for path in ("/a", "/b", "/a", "/c"):
+            await cache.get((path, "", ""))
+        self.assertEqual(len(cache), 2)
+        await cache.get(("/a", "", ""))
+        await cache.get(("/b", "", ""))
+        self.assertEqual([key[0] for key in self.render.calls], ["/a", "/b", "/c", "/b"])
+
+    async def test_new_deploy_purges(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            manifest = Path(scratch) / "manifest.json"
+            manifest.write_text(json.dumps({"build": {"id": "one"}}), encoding="utf-8")
+            cache = self.cache(root=Path(scratch), watch_interval=5.0)
+            await cache.get(("/", "", ""))
+            manifest.write_text(json.dumps({"build": {"id": "two", "more": True}}), encoding="utf-8")
+            self.clock.now += 0.5
+            self.assertEqual((await cache.get(("/", "", ""))).body, b"/#1")  # not checked yet
+            self.clock.now += 5
+            self.assertEqual((await cache.get(("/", "", ""))).body, b"/#2")
+            self.assertEqual(cache.build, "two")
+            self.assertEqual(cache.stats.purges, 1)
+
+
+class PageAppTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.passed = []
+
+        async def fallback(scope, receive, send):
+            self.passed.append(scope["path"])
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        self.app = PageApp(PageCache(Renderer()), fallback, locales=("en-GB", "fr"))
+
+    async def test_serves_pages_with_validators(self):
+        response = await call(self.app, "/", headers={"accept-language": "fr-CA, en;q=0.5"})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers["content-language"], "fr")
+        self.assertEqual(response.headers["vary"], "Accept-Language")
+        etag = response.headers["etag"]
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(header=header):
+                again = await call(self.app, "/", headers={"accept-language": "fr", "if-none-match": header})
+                self.assertEqual(again.status, 304)
+                self.assertEqual(again.body, b"")
+
+    async def test_missing_page_and_other_requests(self):
+        self.assertEqual((await call(self.app, "/missing/index.html")).status, 404)
+        self.assertEqual((await call(self.app, "/site.css")).status, 204)
+        self.assertEqual((await call(self.app, "/", method="POST")).status, 204)
+        self.assertEqual(self.passed, ["/site.css", "/"])
+
+
+class NegotiateLocaleTests(unittest.TestCase):
+    def test_ranks(self):
+        locales = ("en-GB", "en-US", "fr")
+        self.assertEqual(negotiate_locale("", locales), "en-GB")
+        self.assertEqual(negotiate_locale("en-US", locales), "en-US")
+        self.assertEqual(negotiate_locale("en", locales), "en-GB")
+        self.assertEqual(negotiate_locale("fr-CA, en-US;q=0.8", locales), "fr")
+        self.assertEqual(negotiate_locale("de, fr;q=0", locales), "en-GB")
+
+
+if __name__ == "__main__":
+    unittest.main()
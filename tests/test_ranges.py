@@ -0,0 +1,85 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.serve.app import StaticApp, parse_range
+
+from .asgi import call
+
+DATA = bytes(range(256)) * 4
+
+
+class ParseRangeTests(unittest.TestCase):
+    def test_forms(self):
+        self.assertEqual(parse_range("bytes=0-99", 1024), (0, 99))
+        self.assertEqual(parse_range("bytes=1000-", 1024), (1000, 1023))
+        self.assertEqual(parse_range("bytes=1000-5000", 1024), (1000, 1023))
+        self.assertEqual(parse_range("bytes=-24", 1024), (1000, 1023))
+        self.assertEqual(parse_range("bytes=-5000", 1024), (0, 1023))
+
+    def test_ignored(self):
+        for header in ("items=0-1", "bytes=0-1,4-5", "bytes=5-1", "bytes=x-1", "bytes=7"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1024))
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range("bytes=1024-", 1024), (1024, 1024))
+        self.assertEqual(parse_range("bytes=-0", 1024), (1024, 1024))
+
+
+class RangeRequestTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.TemporaryDirectory()
+        (Path(cls.scratch.name) / "clip.mp4").write_bytes(DATA)
+        cls.app = StaticApp(Path(cls.scratch.name))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scratch.cleanup()
+
+    def get(self, **headers):
+        return asyncio.run(call(self.app, "/clip.mp4", headers={k.replace("_", "-"): v for k, v in headers.items()}))
+
+    def test_partial_content(self):
+        response = self.get(range="bytes=100-199")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.headers["content-range"], "bytes 100-199/1024")
+        self.assertEqual(response.headers["content-length"], "100")
+        self.assertEqual(response.body, DATA[100:200])
+
+    def test_suffix_range(self):
+        response = self.get(range="bytes=-10")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.headers["content-range"], "bytes 1014-1023/1024")
+        self.assertEqual(response.body, DATA[-10:])
+
+    def test_unsatisfiable(self):
+        response = self.get(range="bytes=2000-")
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.headers["content-range"], "bytes */1024")
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertEqual(response.body, DATA)
+        response = self.get(range="bytes=0-1,5-6")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.body, DATA)
+
+    def test_if_range(self):
+        etag = self.get().headers["etag"]
+        response = self.get(range="bytes=0-9", if_range=etag)
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.body, DATA[:10])
+        for stale in ('"older"', f"W/{etag}", "Wed, 21 Oct 2015 07:28:00 GMT"):
+            with self.subTest(if_range=stale):
+                response = self.get(range="bytes=0-9", if_range=stale)
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.body, DATA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""The hero slideshow's scheduling, checked in a fake browser under Node.
+
+``slideshow.js`` runs the page's inline scripts against a minimal fake DOM
+with a virtual clock (no browser, no network, no npm packages) and prints
+one line per check. It checks that the slideshow:
+
+* advances every 5.2 s while visible, in an animation frame;
+* loads no image but the first with the page, and fetches and decodes
+  each later slide's image about 2 s before its turn (the slides are set
+  up as the build's ``slides`` stage leaves them);
+* runs no timer or frame callback at all while the tab is hidden or the
+  slideshow is off screen, and holds nothing armed;
+* resumes with the time that was left, not a fresh interval;
+* restarts the interval when a dot is clicked.
+"""
+
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.build import html, js
+
+HERE = Path(__file__).resolve().parent
+PAGE = HERE.parent / "index.html"
+HARNESS = HERE / "slideshow.js"
+
+# <script type> values the browser runs as JavaScript.
+SCRIPT_TYPES = {None, "", "text/javascript", "application/javascript", "module"}
+
+
+def inline_scripts(page: Path) -> str:
+    """The page's inline scripts, in document order."""
+    document = html.parse(page.read_text(encoding="utf-8"))
+    return "\n;\n".join(
+        element.text
+        for element in document.find_all("script")
+        if element.get("src") is None and element.get("type") in SCRIPT_TYPES and element.text.strip()
+    )
+
+
+@unittest.skipUnless(shutil.which("node"), "needs Node.js")
+class SlideshowTests(unittest.TestCase):
+    def check(self, scripts: str) -> None:
+        with tempfile.TemporaryDirectory() as scratch:
+            path = Path(scratch) / "scripts.js"
+            path.write_text(scripts, encoding="utf-8")
+            result = subprocess.run(["node", str(HARNESS), str(path)], capture_output=True, text=True)
+        lines = result.stdout.splitlines()
+        failures = [line for line in lines if not line.startswith("ok")]
+        self.assertTrue(lines, result.stderr)
+        self.assertEqual(result.returncode, 0, "\n".join(failures) or result.stderr)
+
+    def test_page_scripts(self):
+        self.check(inline_scripts(PAGE))
+
+    def test_minified_page_scripts(self):
+        self.check(js.minify(inline_scripts(PAGE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
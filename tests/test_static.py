@@ -0,0 +1,99 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from nimex_site.serve.app import StaticApp
+
+from .asgi import call
+
+CSS = b"body{color:red}" * 20
+
+
+class StaticAppTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.TemporaryDirectory()
+        root = Path(cls.scratch.name)
+        (root / "index.html").write_bytes(b"<!doctype html><title>x</title>")
+        (root / "site.css").write_bytes(CSS)
+        (root / "site.css.br").write_bytes(b"br bytes")
+        (root / "site.css.gz").write_bytes(b"gzip bytes")
+        (root / "app.0123456789.js").write_bytes(b"void 0")
+        (root / "_headers").write_text("/\n  X-Frame-Options: DENY\n", encoding="utf-8")
+        cls.app = StaticApp(root)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scratch.cleanup()
+
+    def get(self, path, method="GET", **headers):
+        return asyncio.run(call(self.app, path, method=method, headers={k.replace("_", "-"): v for k, v in headers.items()}))
+
+    def test_prefers_brotli(self):
+        response = self.get("/site.css", accept_encoding="gzip, deflate, br")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers["content-encoding"], "br")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["content-length"], str(len(b"br bytes")))
+        self.assertEqual(response.body, b"br bytes")
+
+    def test_honours_q_values(self):
+        response = self.get("/site.css", accept_encoding="br;q=0.5, gzip")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.body, b"gzip bytes")
+
+    def test_q_zero_refuses_a_coding(self):
+        response = self.get("/site.css", accept_encoding="br;q=0, *")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+    def test_identity_without_accept_encoding(self):
+        response = self.get("/site.css")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.body, CSS)
+
+    def test_no_vary_without_siblings(self):
+        response = self.get("/app.0123456789.js", accept_encoding="br")
+        self.assertNotIn("vary", response.headers)
+        self.assertIn("immutable", response.headers["cache-control"])
+
+    def test_each_representation_has_its_own_etag(self):
+        brotli = self.get("/site.css", accept_encoding="br").headers["etag"]
+        identity = self.get("/site.css").headers["etag"]
+        self.assertNotEqual(brotli, identity)
+        self.assertEqual(self.get("/site.css", accept_encoding="gzip", if_none_match=brotli).status, 200)
+
+    def test_not_modified(self):
+        etag = self.get("/site.css", accept_encoding="br").headers["etag"]
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(header=header):
+                response = self.get("/site.css", accept_encoding="br", if_none_match=header)
+                self.assertEqual(response.status, 304)
+                self.assertEqual(response.body, b"")
+                self.assertEqual(response.headers["etag"], etag)
+                self.assertEqual(response.headers["vary"], "Accept-Encoding")
+
+    def test_directory_url_serves_index_with_its_rules(self):
+        response = self.get("/")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/html"))
+        self.assertEqual(response.headers["x-frame-options"], "DENY")
+        self.assertNotIn("immutable", response.headers["cache-control"])
+
+    def test_head_sends_headers_only(self):
+        response = self.get("/site.css", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers["content-length"], str(len(CSS)))
+        self.assertEqual(response.body, b"")
+
+    def test_unknown_path_and_method(self):
+        self.assertEqual(self.get("/nope.css").status, 404)
+        self.assertEqual(self.get("/../etc/passwd").status, 404)
+        response = self.get("/site.css", method="POST")
+        self.assertEqual(response.status, 405)
+        self.assertEqual(response.headers["allow"], "GET, HEAD")
+
+
+if __name__ == "__main__":
+    unittest.main()
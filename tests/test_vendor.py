@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from nimex_site.build import html
+from nimex_site.build.config import BuildConfig
+from nimex_site.build.pipeline import build
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+HERO = "https://example.com/photos/hero.jpg"
+BADGE = "https://cdn.example.net/badge?sig=abc"
+GONE = "https://example.com/photos/gone.jpg"
+
+PAGE = f"""<!doctype html>
+<html><head><title>Vendor</title><style>img{{max-width:100%}}</style></head>
+<body>
+<img src="{HERO}" alt="Hero" width="640" height="480">
+<img src="{BADGE}" alt="Badge">
+<img src="{GONE}" alt="Gone">
+</body></html>
+"""
+
+
+class _Quiet(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _jpeg(size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 40, 40)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@unittest.skipUnless(Image is not None and aiohttp is not None, "needs Pillow and aiohttp")
+class VendorTests(unittest.TestCase):
+    """Builds against a local stand-in origin (``--vendor-upstream``)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.TemporaryDirectory()
+        root = Path(cls.scratch.name)
+        upstream = root / "upstream"
+        (upstream / "example.com" / "photos").mkdir(parents=True)
+        (upstream / "cdn.example.net").mkdir()
+        cls.hero = _jpeg((640, 480))
+        (upstream / "example.com" / "photos" / "hero.jpg").write_bytes(cls.hero)
+        # No extension and the server says octet-stream: sniffed as PNG.
+        buffer = io.BytesIO()
+        Image.new("RGBA", (48, 48), (0, 0, 255, 128)).save(buffer, "PNG")
+        cls.badge = buffer.getvalue()
+        (upstream / "cdn.example.net" / "badge").write_bytes(cls.badge)
+        site = root / "site"
+        site.mkdir()
+        (site / "index.html").write_text(PAGE, encoding="utf-8")
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Quiet, directory=str(upstream)))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        cls.mirror = root / "mirror"
+        cls.config = dict(
+            source=site / "index.html",
+            vendor_dir=cls.mirror,
+            vendor_upstream=f"http://127.0.0.1:{server.server_port}",
+            image_widths=(320,),
+            critical_css=False,
+            lcp_selector="",
+        )
+        try:
+            cls.ctx = build(BuildConfig(out_dir=root / "dist", **cls.config))
+        finally:
+            server.shutdown()
+            server.server_close()
+        cls.out_dir = root / "dist"
+        cls.document = html.parse((cls.out_dir / "index.html").read_text(encoding="utf-8"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scratch.cleanup()
+
+    def test_mirror(self):
+        index = json.loads((self.mirror / "mirror.json").read_text(encoding="utf-8"))
+        self.assertEqual(sorted(index), sorted([HERO, BADGE]))
+        for url, data, content_type in ((HERO, self.hero, "image/jpeg"), (BADGE, self.badge, "image/png")):
+            entry = index[url]
+            self.assertEqual(entry["content_type"], content_type)
+            self.assertEqual(entry["size"], len(data))
+            self.assertEqual(entry["sha256"], hashlib.sha256(data).hexdigest())
+            self.assertEqual((self.mirror / entry["path"]).read_bytes(), data)
+        self.assertTrue(index[BADGE]["path"].endswith("/badge.png"))
+
+    def test_references_rewritten(self):
+        text = (self.out_dir / "index.html").read_text(encoding="utf-8")
+        self.assertNotIn(HERO, text)
+        self.assertNotIn("cdn.example.net", text)
+        # The URL that could not be fetched stays hot-linked.
+        self.assertIn(GONE, text)
+        manifest = json.loads((self.out_dir / "manifest.json").read_text(encoding="utf-8"))
+        self.assertEqual(manifest["vendor"]["origins"], ["cdn.example.net", "example.com"])
+        self.assertEqual(manifest["vendor"]["failed"], [GONE])
+
+    def test_vendored_image_reencoded(self):
+        hero = next(img for img in self.document.find_all("img") if img.get("alt") == "Hero")
+        self.assertEqual(hero.parent.tag, "picture")
+        self.assertTrue(hero.get("src").startswith("/assets/"))
+        self.assertIn("320w", hero.get("srcset"))
+        for source in hero.parent.find_all("source"):
+            for candidate in source.get("srcset").split(","):
+                self.assertTrue((self.out_dir / candidate.split()[0].lstrip("/")).is_file())
+        fallback = self.out_dir / hero.get("src").lstrip("/")
+        self.assertNotEqual(fallback.read_bytes(), self.hero)
+        with Image.open(fallback) as rendition:
+            self.assertEqual(rendition.format, "JPEG")
+            self.assertIn(f"{rendition.width}w", hero.get("srcset"))
+
+    def test_rebuild_uses_the_mirror(self):
+        # The upstream is gone; everything it served comes from the mirror.
+        with tempfile.TemporaryDirectory() as out_dir:
+            build(BuildConfig(out_dir=Path(out_dir), **self.config))
+            manifest = json.loads((Path(out_dir) / "manifest.json").read_text(encoding="utf-8"))
+        self.assertEqual(manifest["vendor"]["mirrored"], 2)
+        self.assertEqual(manifest["vendor"]["fetched"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nimex_site.serve import workers
+from nimex_site.serve.workers import Supervisor, WorkerOptions
+
+
+class FakeSupervisor(Supervisor):
+    """A supervisor whose reloads only record that they were attempted."""
+
+    def __init__(self, succeed: bool) -> None:
+        super().__init__(WorkerOptions(Path("dist")), 2)
+        self.succeed = succeed
+        self.reloads: list[float] = []
+        self._current = self._seen = "a"
+
+    def reload(self) -> bool:
+        self.reloads.append(self.now)
+        return self.succeed
+
+    def poll(self, build: str, now: float) -> None:
+        self.now = now
+        with mock.patch.object(workers, "build_id", return_value=build):
+            self._tick(now)
+
+
+class ReloadTests(unittest.TestCase):
+    def test_reloads_once_the_manifest_settles(self):
+        supervisor = FakeSupervisor(succeed=True)
+        supervisor.poll("b", 0.0)
+        self.assertEqual(supervisor.reloads, [])
+        supervisor.poll("b", 0.2)
+        supervisor.poll("b", 0.4)
+        self.assertEqual(supervisor.reloads, [0.2])
+        self.assertEqual(supervisor._current, "b")
+
+    def test_failed_deploy_backs_off(self):
+        supervisor = FakeSupervisor(succeed=False)
+        now = 0.0
+        while now < 10:
+            supervisor.poll("b", now)
+            now = round(now + 0.2, 1)
+        # Tried after a settled poll, then 1 s, 2 s and 4 s after each failure.
+        self.assertEqual(supervisor.reloads, [0.2, 1.2, 3.2, 7.2])
+        self.assertEqual(supervisor._current, "a")
+
+    def test_new_manifest_is_tried_at_once(self):
+        supervisor = FakeSupervisor(succeed=False)
+        for now in (0.0, 0.2, 0.4, 0.6):
+            supervisor.poll("b", now)
+        self.assertEqual(supervisor.reloads, [0.2])
+        supervisor.poll("c", 0.8)
+        supervisor.poll("c", 1.0)
+        self.assertEqual(supervisor.reloads, [0.2, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()